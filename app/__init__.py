@@ -2,8 +2,9 @@
 from flask import Flask, request
 from flask_cors import CORS
 from .extensions import jwt, socketio
-from .errors import abort_msg
+from .errors import PoolSaturatedError, abort_msg, pool_saturated, shed_saturated_response
 from .database import PostgresDBManager
+from .queries import NAMED_QUERIES
 
 def create_app(config_class=None):
     app = Flask(__name__)
@@ -30,6 +31,7 @@ def create_app(config_class=None):
     jwt.init_app(app)
     socketio.init_app(app, cors_allowed_origins="*", manage_session=False)
     PostgresDBManager.init_app(app)
+    PostgresDBManager.register_queries(NAMED_QUERIES)
     
     # 🎯 添加 JWT 專用調試中間件
     # @app.before_request
@@ -53,6 +55,7 @@ def create_app(config_class=None):
     from .routes.shift_types import shift_types_bp
     from .socket.websocker import websocket_bp
     from .routes.leave import leave_bp
+    from .routes.metrics import metrics_bp
     
     # app.register_blueprint(db_bp)
     app.register_blueprint(auth_bp)
@@ -62,8 +65,16 @@ def create_app(config_class=None):
     app.register_blueprint(schedules_bp)
     app.register_blueprint(shift_types_bp)
     app.register_blueprint(leave_bp)
+    app.register_blueprint(metrics_bp)
+    
+    # 數據庫維護命令（flask db-migrate / flask db-explain）
+    from .cli import register_commands
+    register_commands(app)
     
     # 错误处理
     app.errorhandler(Exception)(abort_msg)
+    # 連線池飽和時快速返回 503 + Retry-After
+    app.errorhandler(PoolSaturatedError)(pool_saturated)
+    app.after_request(shed_saturated_response)
     
     return app
\ No newline at end of file
@@ -0,0 +1,209 @@
+# analytics.py
+# 排班統計（/api/schedules/stats）：日期範圍載入為 用戶 × 天 的班別代碼矩陣（NumPy），
+# 每日各班別人數、每人工時 / 夜班 / 週末負荷、連續上班天數都以整個矩陣的向量化運算得出。
+# 已鎖定的週幾乎不再變更，其排班格子按週版本緩存在進程內，之後的統計只需載入未鎖定的週。
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+
+from app.utils.lock_calendar import week_start
+
+# 矩陣中「當天沒有排班」的代碼；查表時落在查找數組的最後一格（工時 0、非夜班）
+NO_SHIFT = -1
+
+
+def parse_shift_hours(value):
+    """解析 '早班:8,夜班:10' 形式的配置為 {班別: 工時}"""
+    hours = {}
+    for item in (value or '').split(','):
+        name, sep, amount = item.rpartition(':')
+        if sep and name.strip():
+            hours[name.strip()] = float(amount)
+    return hours
+
+
+def parse_shift_names(value):
+    """解析逗號分隔的班別名稱列表"""
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class WeekCellCache:
+    """In-process LRU of locked weeks' schedule cells, keyed by ISO week and its schedule version"""
+
+    def __init__(self, max_weeks=260):
+        self.max_weeks = max_weeks
+        self._lock = threading.Lock()
+        self._weeks = OrderedDict()
+
+    def get(self, monday, version):
+        """Cells cached for the week at this version, or None"""
+        with self._lock:
+            entry = self._weeks.get(monday)
+            if entry is None or entry[0] != version:
+                return None
+            self._weeks.move_to_end(monday)
+            return entry[1]
+
+    def put(self, monday, version, cells):
+        with self._lock:
+            self._weeks[monday] = (version, cells)
+            self._weeks.move_to_end(monday)
+            while len(self._weeks) > self.max_weeks:
+                self._weeks.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._weeks.clear()
+
+
+def week_mondays(start, end):
+    """start 到 end 涉及的每個 ISO 週的週一"""
+    first = week_start(start)
+    return [first + timedelta(weeks=index) for index in range((week_start(end) - first).days // 7 + 1)]
+
+
+def _split_weeks(rows, mondays):
+    """
+    把 (user_id, 相對 mondays[0] 的天數, shift_name) 行（按天數排序）按週拆分為
+    {週一: (user_ids, 週內天數, 班別)}，各週為同一數組的切片
+    """
+    user_ids, offsets, shift_names = (zip(*rows) if rows else ((), (), ()))
+    user_ids = np.array(user_ids, dtype=np.int64)
+    offsets = np.array(offsets, dtype=np.int64)
+    shift_names = np.array(shift_names, dtype=object)
+
+    first_monday = mondays[0]
+    starts = [(monday - first_monday).days for monday in mondays]
+    bounds = np.searchsorted(offsets, starts + [starts[-1] + 7])
+    return {
+        monday: (user_ids[lower:upper], (offsets[lower:upper] - start).astype(np.int16), shift_names[lower:upper])
+        for monday, start, lower, upper in zip(mondays, starts, bounds[:-1], bounds[1:])
+    }
+
+
+def load_week_cells(load_rows, mondays, week_versions, locked_weeks, cache):
+    """
+    返回 {週一: (user_ids, 週內天數, 班別)}。
+    已鎖定且版本未變的週從 cache 取得；其餘的週以 load_rows(起, 訖) 一次載入（取未命中的最早到最晚，
+    返回按日期排序的 (user_id, 相對起始日的天數, shift_name)），其中已鎖定的週寫入 cache。
+    """
+    weeks = {}
+    for monday in mondays:
+        if monday in locked_weeks:
+            cells = cache.get(monday, week_versions.get(monday))
+            if cells is not None:
+                weeks[monday] = cells
+
+    missing = [monday for monday in mondays if monday not in weeks]
+    if not missing:
+        return weeks
+
+    rows = load_rows(missing[0], missing[-1] + timedelta(days=6))
+    span = week_mondays(missing[0], missing[-1])
+    for monday, cells in _split_weeks(rows, span).items():
+        if monday in weeks:
+            continue
+        weeks[monday] = cells
+        if monday in locked_weeks:
+            cache.put(monday, week_versions.get(monday), cells)
+    return weeks
+
+
+def build_matrix(weeks, start, end, user_filter=None):
+    """
+    把各週的格子組裝為 (user_ids, shift_names, matrix)：
+    matrix[用戶下標, 天] 為 shift_names 的下標，沒有排班為 NO_SHIFT；
+    user_filter 為允許的 user_id 數組（None 表示全部）
+    """
+    day_count = (end - start).days + 1
+    first_monday = week_start(start)
+    skip = (start - first_monday).days
+
+    user_parts, day_parts, name_parts = [], [], []
+    for monday, (user_ids, days, shift_names) in weeks.items():
+        user_parts.append(user_ids)
+        day_parts.append(days.astype(np.int64) + ((monday - first_monday).days - skip))
+        name_parts.append(shift_names)
+
+    user_ids = np.concatenate(user_parts) if user_parts else np.empty(0, dtype=np.int64)
+    days = np.concatenate(day_parts) if day_parts else np.empty(0, dtype=np.int64)
+    shift_names = np.concatenate(name_parts) if name_parts else np.empty(0, dtype=object)
+
+    keep = (days >= 0) & (days < day_count)
+    if user_filter is not None:
+        keep &= np.isin(user_ids, user_filter)
+    user_ids, days, shift_names = user_ids[keep], days[keep], shift_names[keep]
+
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    names, name_index = np.unique(shift_names.astype(str), return_inverse=True)
+
+    matrix = np.full((len(users), day_count), NO_SHIFT, dtype=np.int16)
+    matrix[user_index, days] = name_index
+    return users, names, matrix
+
+
+def _summary(values):
+    """分佈摘要：平均、標準差、最小、最大與變異係數（越小越平均）"""
+    if not len(values):
+        return None
+    mean = float(values.mean())
+    std = float(values.std())
+    return {
+        'mean': round(mean, 3),
+        'std': round(std, 3),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'cv': round(std / mean, 3) if mean else None,
+    }
+
+
+def schedule_stats(names, matrix, start, shift_hours, night_shifts, default_hours=8.0):
+    """
+    對 build_matrix 的結果計算：
+    - coverage: 每個班別每天的人數（班別 × 天），headcount: 每天上班人數
+    - 每人的上班天數、工時、夜班數、週末上班天數、最長 / 目前（範圍末尾）連續上班天數
+    - fairness: 工時 / 夜班 / 週末負荷在用戶間的分佈
+    """
+    user_count, day_count = matrix.shape
+    shift_count = len(names)
+
+    # 查找數組多一格給 NO_SHIFT（-1 取到最後一格）
+    hours_of = np.array([shift_hours.get(name, default_hours) for name in names] + [0.0])
+    night_of = np.array([name in night_shifts for name in names] + [False])
+
+    worked = matrix != NO_SHIFT
+    rows, days = np.nonzero(worked)
+    codes = matrix[rows, days].astype(np.int64)
+    coverage = np.bincount(codes * day_count + days, minlength=shift_count * day_count)
+    coverage = coverage.reshape(shift_count, day_count)
+
+    # 1970-01-01 是週四：(天數 + 3) % 7 為週一起算的星期
+    epoch_days = np.arange(day_count) + np.datetime64(start, 'D').astype(np.int64)
+    weekend = (epoch_days + 3) % 7 >= 5
+
+    # 連續上班天數：累計上班天數減去最近一次休息時的累計值
+    worked_so_far = np.cumsum(worked, axis=1)
+    at_last_rest = np.maximum.accumulate(np.where(worked, 0, worked_so_far), axis=1)
+    streak = worked_so_far - at_last_rest
+
+    hours = hours_of[matrix].sum(axis=1)
+    nights = night_of[matrix].sum(axis=1)
+    weekend_days = (worked & weekend).sum(axis=1)
+
+    return {
+        'coverage': coverage,
+        'headcount': worked.sum(axis=0),
+        'days_worked': worked.sum(axis=1),
+        'hours': hours,
+        'nights': nights,
+        'weekend_days': weekend_days,
+        'longest_streak': streak.max(axis=1) if day_count else np.zeros(user_count, dtype=np.int64),
+        'current_streak': streak[:, -1] if day_count else np.zeros(user_count, dtype=np.int64),
+        'fairness': {
+            'hours': _summary(hours),
+            'nights': _summary(nights),
+            'weekend_days': _summary(weekend_days),
+        },
+    }
@@ -0,0 +1,105 @@
+# cli.py
+# Flask 命令：flask db-migrate / flask db-explain / flask db-prune-changes / flask db-partitions / flask db-archive
+import sys
+from datetime import datetime
+
+import click
+
+from app.database import PostgresDBManager
+
+
+def register_commands(app):
+    """Register database maintenance commands on the app"""
+
+    @app.cli.command('db-migrate')
+    @click.option('--target', type=int, default=None, help='只執行到此版本')
+    @click.option('--dry-run', is_flag=True, help='只列出將執行的遷移')
+    def db_migrate(target, dry_run):
+        """執行尚未套用的數據庫遷移"""
+        from app.migrations import apply_migrations
+
+        applied = apply_migrations(PostgresDBManager.get_instance(), target=target, dry_run=dry_run)
+        if not applied:
+            print("✅ 數據庫已是最新版本")
+
+    @app.cli.command('db-explain')
+    @click.option('--min-rows', type=int, default=10000, help='行數估計低於此值的表允許 Seq Scan')
+    def db_explain(min_rows):
+        """對各路由查詢執行 EXPLAIN，大表出現 Seq Scan 時以非零狀態退出"""
+        from app.migrations.explain import check_query_plans
+
+        problems = check_query_plans(PostgresDBManager.get_instance(), min_rows=min_rows)
+        for name, relation, rows in problems:
+            print(f"❌ {name}: Seq Scan on {relation} (~{rows} rows)")
+        if problems:
+            sys.exit(1)
+        print("✅ 所有路由查詢都使用索引")
+
+    @app.cli.command('db-prune-changes')
+    @click.option('--days', type=int, default=None, help='保留天數（默認 SCHEDULE_CHANGES_RETENTION_DAYS）')
+    def db_prune_changes(days):
+        """清理過期的排班變更日誌（早於此的增量同步游標將返回 410）"""
+        days = days if days is not None else app.config['SCHEDULE_CHANGES_RETENTION_DAYS']
+        # execute_returning 會提交（execute_query 把 SELECT 當作只讀，不提交）
+        deleted = PostgresDBManager.get_instance().execute_returning(
+            "SELECT prune_schedule_changes(make_interval(days => %s))", (days,)
+        )[0]
+        print(f"✅ 已清理 {deleted} 條排班變更記錄（保留 {days} 天）")
+
+    @app.cli.command('db-partitions')
+    @click.option('--ahead', type=int, default=None, help='預先建立的月分區數（默認 SCHEDULE_PARTITION_MONTHS_AHEAD）')
+    @click.option('--detach-before', default=None, help='分離整月早於此日期的分區（YYYY-MM-DD）')
+    def db_partitions(ahead, detach_before):
+        """建立未來的排班月分區並分離過期分區（建議每日由 cron 執行）"""
+        ahead = ahead if ahead is not None else app.config['SCHEDULE_PARTITION_MONTHS_AHEAD']
+        db = PostgresDBManager.get_instance()
+
+        created = db.execute_returning(
+            "SELECT array(SELECT ensure_schedule_partitions(%s))", (ahead,)
+        )[0]
+        for name in created:
+            print(f"✅ 已建立分區 {name}")
+
+        if detach_before:
+            try:
+                before = datetime.strptime(detach_before, '%Y-%m-%d').date()
+            except ValueError:
+                raise click.BadParameter('日期格式應為 YYYY-MM-DD', param_hint='--detach-before')
+            detached = db.execute_returning(
+                "SELECT array(SELECT detach_schedule_partitions(%s))", (before,)
+            )[0]
+            for name in detached:
+                print(f"📦 已分離分區 {name}（數據保留在獨立的表中）")
+
+        print(f"✅ 排班分區已覆蓋到 {ahead} 個月後")
+
+    @app.cli.command('db-archive')
+    @click.option('--months', type=int, default=None,
+                  help='排班在熱表保留的月數（默認 SCHEDULE_ARCHIVE_AFTER_MONTHS）')
+    @click.option('--token-days', type=int, default=None,
+                  help='請假令牌保留天數（默認 LEAVE_TOKEN_ARCHIVE_AFTER_DAYS）')
+    def db_archive(months, token_days):
+        """把早於保留期的排班與請假令牌按月搬到 archive_chunks（建議每月由 cron 執行）"""
+        months = months if months is not None else app.config['SCHEDULE_ARCHIVE_AFTER_MONTHS']
+        token_days = token_days if token_days is not None else app.config['LEAVE_TOKEN_ARCHIVE_AFTER_DAYS']
+        db = PostgresDBManager.get_instance()
+
+        # 同一事務：歸檔寫入與熱表刪除一起提交
+        with db:
+            schedules = db.execute_query(
+                """
+                SELECT month, row_count FROM archive_schedules(
+                    (date_trunc('month', current_date) - make_interval(months => %s))::date
+                )
+                """,
+                (months,)
+            )
+            tokens = db.execute_query(
+                "SELECT month, row_count FROM archive_leave_tokens(now() - make_interval(days => %s))",
+                (token_days,)
+            )
+
+        for label, rows in (('schedules', schedules), ('leave_tokens', tokens)):
+            for month, count in rows:
+                print(f"📦 {label} {month:%Y-%m}: 已歸檔 {count} 行")
+        print(f"✅ 歸檔完成（排班保留 {months} 個月，請假令牌保留 {token_days} 天）")
@@ -1,42 +1,127 @@
 # 修改導入部分
 import psycopg
-from psycopg_pool import ConnectionPool  # psycopg 3 的連線池
-from psycopg import errors
-from flask import current_app
+from psycopg_pool import ConnectionPool, PoolTimeout, TooManyRequests  # psycopg 3 的連線池
+from psycopg import errors, sql
+from psycopg.rows import class_row, dict_row, namedtuple_row
+from flask import current_app, g, has_request_context, jsonify, request
+
+from app.errors import PoolSaturatedError
+from app.metrics import PoolMonitor, QueryMetrics
 import threading
 import atexit
+import itertools
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    # eventlet 只在 wsgi.py / gunicorn eventlet worker 下使用，開發環境可能沒有安裝
+    from eventlet import patcher as eventlet_patcher
+    from eventlet import tpool
+except ImportError:
+    eventlet_patcher = None
+    tpool = None
+
+
+def native_lock():
+    """A real OS lock, usable from both the eventlet hub and tpool threads (for short stats updates only)"""
+    if eventlet_patcher is not None:
+        return eventlet_patcher.original('threading').Lock()
+    return threading.Lock()
+
+# row_factory 選項：None 為默認元組；'dict' 直接得到 dict；'record' 為緊湊的 namedtuple；
+# 也可以傳入類（例如帶 __slots__ 的 dataclass），以 class_row 按欄位名構造
+ROW_FACTORIES = {
+    'dict': dict_row,
+    'record': namedtuple_row,
+}
+
+
+def resolve_row_factory(row_factory):
+    """Translate a row_factory option into a psycopg row factory (or None for tuples)"""
+    if row_factory is None:
+        return None
+    if isinstance(row_factory, str):
+        try:
+            return ROW_FACTORIES[row_factory]
+        except KeyError:
+            raise ValueError(f"Unknown row_factory: {row_factory}") from None
+    if isinstance(row_factory, type):
+        return class_row(row_factory)
+    return row_factory
+
 
 class PostgresDBManager:
     _instance = None
     _lock = threading.Lock()
     _pool_initialized = False
+    # 命名查詢註冊表：key -> SQL（見 app/queries.py）
+    _named_queries = {}
     
     def __init__(self, app=None):
         """Initialize the database connection parameters"""
         self.connection_pool = None
         self._shutting_down = False
-        self._current_conn = None
-        self._current_cursor = None
+        # 每個線程 / greenlet 各自的連線，避免單例共享 _current_conn
+        self._local = threading.local()
+        self.cooperative_mode = 'off'
+        self.request_scoped = True
+        self.retry_after = 1
+        # 只讀副本：每個副本一個連線池，輪詢分配
+        self.replica_pools = []
+        self._replica_cycle = itertools.count()
+        self._replica_conns = {}
+        # 讀寫一致性：寫入過的客戶端在此期間內的讀取仍走主庫
+        self.replica_sticky_seconds = 5
+        self._recent_writers = {}
+        # 命名查詢統計：key -> {calls, prepared, reused}；連線 -> 已 prepare 的 key（LRU）
+        # 以弱引用為鍵：連線關閉並被回收後記錄自動消失，不會因 backend pid 重用而誤記為重用
+        self._stats_lock = native_lock()
+        self._named_stats = {}
+        self._prepared_keys = weakref.WeakKeyDictionary()
+        self.metrics = QueryMetrics(self._stats_lock)
+        self.pool_monitor = PoolMonitor(self._stats_lock)
         if app is not None:
             self.init_app(app)
     
+    @property
+    def _current_conn(self):
+        return getattr(self._local, 'conn', None)
+    
+    @_current_conn.setter
+    def _current_conn(self, conn):
+        self._local.conn = conn
+    
+    @property
+    def _current_cursor(self):
+        return getattr(self._local, 'cursor', None)
+    
+    @_current_cursor.setter
+    def _current_cursor(self, cursor):
+        self._local.cursor = cursor
+    
     def __enter__(self):
-        """Enter the context manager - get connection from pool"""
+        """Enter the context manager - bind a pooled connection to the current thread/greenlet"""
         self._current_conn = self.get_connection()
         self._current_cursor = self._current_conn.cursor()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exit the context manager - handle cleanup"""
+        callbacks = getattr(self._local, 'on_commit', [])
+        self._local.on_commit = []
         try:
             if exc_type is not None:
                 # Exception occurred, rollback
                 if self._current_conn:
-                    self._current_conn.rollback()
+                    self._call(self._current_conn.rollback)
             else:
                 # No exception, commit
                 if self._current_conn:
-                    self._current_conn.commit()
+                    self._call(self._current_conn.commit)
+                self._run_on_commit(callbacks)
         finally:
             # Always clean up
             if self._current_cursor:
@@ -65,15 +150,47 @@ class PostgresDBManager:
                 
                 # ✅ 初始化 psycopg 3 連接池
                 cls._instance._init_connection_pool(
-                    min_conn=app.config.get('POSTGRES_MIN_CONN', 1),
-                    max_conn=app.config.get('POSTGRES_MAX_CONN', 20)
+                    min_conn=int(app.config.get('POSTGRES_MIN_CONN', 1)),
+                    max_conn=int(app.config.get('POSTGRES_MAX_CONN', 20)),
+                    checkout_timeout=float(app.config.get('POSTGRES_CHECKOUT_TIMEOUT', 5)),
+                    max_waiting=int(app.config.get('POSTGRES_MAX_WAITING', 0))
+                )
+                cls._instance.retry_after = int(app.config.get('POSTGRES_RETRY_AFTER', 1))
+                
+                # 🎯 只讀副本（可選）：標記 read_only 的查詢分流到副本
+                replica_hosts = app.config.get('POSTGRES_REPLICA_HOSTS') or ''
+                if replica_hosts:
+                    cls._instance._init_replica_pools(
+                        replica_hosts,
+                        app,
+                        min_conn=int(app.config.get('POSTGRES_REPLICA_MIN_CONN', 1)),
+                        max_conn=int(app.config.get('POSTGRES_REPLICA_MAX_CONN', 10)),
+                        checkout_timeout=float(app.config.get('POSTGRES_CHECKOUT_TIMEOUT', 5))
+                    )
+                cls._instance.replica_sticky_seconds = float(app.config.get('POSTGRES_REPLICA_STICKY_SECONDS', 5))
+                
+                # 🎯 協作模式：避免阻塞的 libpq 呼叫卡住 eventlet hub
+                cls._instance._init_cooperative_mode(
+                    app.config.get('POSTGRES_COOPERATIVE_MODE', 'auto')
                 )
                 
                 # 註冊關閉鉤子
                 atexit.register(cls._instance._close_pool)
                 cls._pool_initialized = True
+        
+        # 🎯 查詢指標：慢查詢閾值（毫秒）
+        cls._instance.metrics.slow_query_ms = float(app.config.get('POSTGRES_SLOW_QUERY_MS', 500))
+        # 🎯 連線洩漏偵測：持有超過此秒數的連線會被標記並輸出取得時的調用棧
+        cls._instance.pool_monitor.leak_threshold_seconds = float(
+            app.config.get('POSTGRES_LEAK_THRESHOLD_SECONDS', 30)
+        )
+        
+        # 🎯 請求級連線：同一請求內的所有查詢共用一條連線和一個事務
+        cls._instance.request_scoped = bool(app.config.get('POSTGRES_REQUEST_SCOPED', True))
+        app.after_request(cls._instance._finish_request_scope)
+        app.teardown_request(cls._instance._teardown_request_scope)
     
-    def _init_connection_pool(self, min_conn=1, max_conn=20):
+    def _init_connection_pool(self, min_conn=1, max_conn=20, checkout_timeout=5, max_waiting=0):
         """Initialize the connection pool (psycopg 3 version)"""
         try:
             # ✅ psycopg 3 的 ConnectionPool API 不同
@@ -81,14 +198,70 @@ class PostgresDBManager:
                 conninfo=self.dsn,
                 min_size=min_conn,
                 max_size=max_conn,
+                timeout=checkout_timeout,  # 取得連線的最長等待秒數
+                max_waiting=max_waiting,   # 等待隊列上限，0 表示不限制
                 open=True  # 立即開啟連線池
             )
             self._shutting_down = False
-            print(f"✅ PostgreSQL connection pool initialized (min: {min_conn}, max: {max_conn})")
+            print(f"✅ PostgreSQL connection pool initialized (min: {min_conn}, max: {max_conn}, "
+                  f"timeout: {checkout_timeout}s, max_waiting: {max_waiting})")
         except psycopg.Error as e:
             print(f"❌ Error initializing connection pool: {e}")
             raise
     
+    def _init_replica_pools(self, replica_hosts, app, min_conn=1, max_conn=10, checkout_timeout=5):
+        """Create one pool per read replica; replica_hosts is 'host[:port],host[:port]'"""
+        for entry in replica_hosts.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            host, _, port = entry.partition(':')
+            dsn = f"dbname={app.config.get('POSTGRES_DB', 'creation')} " \
+                  f"user={app.config.get('POSTGRES_USER', 'chipang')} " \
+                  f"password={app.config.get('POSTGRES_PASSWORD', 'root')} " \
+                  f"host={host} " \
+                  f"port={port or app.config.get('POSTGRES_PORT', '5432')}"
+            try:
+                self.replica_pools.append(ConnectionPool(
+                    conninfo=dsn,
+                    min_size=min_conn,
+                    max_size=max_conn,
+                    timeout=checkout_timeout,
+                    open=True
+                ))
+                print(f"✅ PostgreSQL replica pool initialized ({host}, min: {min_conn}, max: {max_conn})")
+            except psycopg.Error as e:
+                # 副本不可用時不影響啟動，所有查詢走主庫
+                print(f"❌ Error initializing replica pool {entry}: {e}")
+    
+    def _init_cooperative_mode(self, mode='auto'):
+        """Choose how blocking database calls are run (off / tpool / auto)"""
+        mode = (mode or 'auto').lower()
+        if mode not in ('off', 'tpool', 'auto'):
+            raise ValueError(f"Invalid POSTGRES_COOPERATIVE_MODE: {mode}")
+        
+        if mode == 'auto':
+            # 只有在 eventlet 已 monkey patch 的情況下才需要把查詢丟到線程池
+            patched = eventlet_patcher is not None and eventlet_patcher.is_monkey_patched('socket')
+            mode = 'tpool' if patched else 'off'
+        
+        if mode == 'tpool' and tpool is None:
+            raise RuntimeError("POSTGRES_COOPERATIVE_MODE=tpool requires eventlet")
+        
+        self.cooperative_mode = mode
+        print(f"✅ Database cooperative mode: {mode}")
+    
+    def _call(self, func, *args, **kwargs):
+        """Run a blocking database call, offloading it to eventlet's thread pool when cooperative
+
+        Used for every call that waits on the network or the pool: statements, commit / rollback,
+        savepoints, pool checkout / return, server-side cursor fetches / close and COPY.
+        """
+        if self.cooperative_mode == 'tpool':
+            # 在真實 OS 線程中執行，其他 greenlet（HTTP / Socket.IO）可以繼續運行
+            return tpool.execute(func, *args, **kwargs)
+        return func(*args, **kwargs)
+    
     @classmethod
     def get_instance(cls):
         """Get the singleton instance"""
@@ -104,92 +277,540 @@ class PostgresDBManager:
         if self.connection_pool is None:
             raise RuntimeError("Connection pool not initialized")
         
+        started = time.perf_counter()
         try:
-            # ✅ psycopg 3 的連線池直接使用，不需 getconn/putconn
-            conn = self.connection_pool.getconn()
+            # ✅ psycopg 3 的連線池直接使用；等待空閒連線（最長 checkout timeout）時不阻塞 eventlet hub
+            conn = self._call(self.connection_pool.getconn)
+            self.pool_monitor.on_checkout(conn, (time.perf_counter() - started) * 1000)
             return conn
+        except (PoolTimeout, TooManyRequests) as e:
+            # 🎯 連線池飽和：快速拒絕，由 app/errors.py 統一返回 503 + Retry-After
+            reason = 'wait queue full' if isinstance(e, TooManyRequests) else 'checkout timed out'
+            print(f"❌ Connection pool saturated ({reason}): {e}")
+            error = PoolSaturatedError(f"Database connection pool saturated: {reason}", self.retry_after)
+            if has_request_context():
+                g._db_saturated = error
+            raise error from e
         except psycopg.Error as e:
             print(f"❌ Error getting connection from pool: {e}")
             # 如果連線池出問題，創建臨時連線
             if "pool is closed" in str(e):
                 print("Connection pool closed, creating temporary connection...")
-                return psycopg.connect(self.dsn)
+                conn = self._call(psycopg.connect, self.dsn)
+                self.pool_monitor.on_checkout(conn, (time.perf_counter() - started) * 1000, pooled=False)
+                return conn
             raise
     
     def return_connection(self, conn):
         """Return a connection to the pool"""
-        if self._shutting_down or self.connection_pool is None:
+        pooled = self.pool_monitor.on_return(conn) if conn else True
+        # 副本連線歸還到各自的連線池（先取出，關閉時也不會留下記錄）
+        pool = self._replica_conns.pop(id(conn), self.connection_pool) if conn else self.connection_pool
+        
+        if self._shutting_down or pool is None or not pooled:
+            # 臨時連線不屬於連線池，直接關閉
             if conn:
-                conn.close()
+                self._forget_prepared(conn)
+                self._call(conn.close)
             return
             
         try:
-            # ✅ psycopg 3 使用 putconn
-            self.connection_pool.putconn(conn)
+            # ✅ psycopg 3 使用 putconn（歸還時連線池可能需要回滾 / 重置連線）
+            self._call(pool.putconn, conn)
         except psycopg.Error as e:
             print(f"❌ Error returning connection to pool: {e}")
+            self._forget_prepared(conn)
             try:
                 conn.close()
             except:
                 pass
+    
+    def pool_stats(self):
+        """Pool size, idle and waiting counts plus checkout wait / hold time statistics and suspected leaks"""
+        stats = self.pool_monitor.snapshot(self.connection_pool)
+        stats['replicas'] = [pool.get_stats() for pool in self.replica_pools]
+        return stats
+    
+    def _client_key(self):
+        """Identify the calling client (JWT cookie / Authorization header / IP) for read-your-writes"""
+        cookie_name = current_app.config.get('JWT_ACCESS_COOKIE_NAME', 'access_token_cookie')
+        return request.cookies.get(cookie_name) or request.headers.get('Authorization') or request.remote_addr
+    
+    def _use_replica(self, read_only):
+        """Whether a read-only statement may go to a replica"""
+        if not read_only or not self.replica_pools or self._current_conn is not None:
+            return False
+        
+        if has_request_context():
+            # 請求級連線已開啟（例如 savepoint / 事務中）：之後的讀取留在同一個事務裡
+            if g.get('_db_conn') is not None:
+                return False
+            # 本請求已寫入，或該客戶端剛寫入過：讀主庫，保證讀到自己的寫入
+            if g.get('_db_wrote'):
+                return False
+            sticky_until = self._recent_writers.get(self._client_key())
+            if sticky_until is not None and sticky_until > time.monotonic():
+                return False
+        return True
+    
+    def _mark_write(self):
+        """Remember that the current request / client wrote to the primary"""
+        if not (self.replica_pools and has_request_context()):
+            return
+        
+        g._db_wrote = True
+        now = time.monotonic()
+        self._recent_writers[self._client_key()] = now + self.replica_sticky_seconds
+        # 避免字典無限增長：定期清掉已過期的記錄
+        if len(self._recent_writers) > 10000:
+            self._recent_writers = {
+                key: until for key, until in self._recent_writers.items() if until > now
+            }
+    
+    def _get_replica_connection(self):
+        """Check out a connection from the next replica, or None to fall back to the primary"""
+        pool = self.replica_pools[next(self._replica_cycle) % len(self.replica_pools)]
+        started = time.perf_counter()
+        try:
+            conn = self._call(pool.getconn)
+        except psycopg.Error as e:
+            print(f"⚠️ Replica unavailable, reading from primary: {e}")
+            return None
+        
+        self.pool_monitor.on_checkout(conn, (time.perf_counter() - started) * 1000)
+        self._replica_conns[id(conn)] = pool
+        return conn
 
-    def execute_query(self, query, params=None, fetch=True):
-        """Execute a query using connection pool"""
-        conn = None
-        cursor = None
+    def _bound_connection(self):
+        """Return the connection shared by the current `with` block or request, if any"""
+        if self._current_conn is not None:
+            return self._current_conn
+        
+        if not (self.request_scoped and has_request_context()):
+            return None
+        
+        # 延遲取得：只有真正用到數據庫的請求才佔用連線
+        if g.get('_db_conn') is None:
+            g._db_conn = self.get_connection()
+            g.setdefault('_db_failed', False)
+        return g._db_conn
+    
+    def _release_request_scope(self, commit):
+        """Commit or roll back the request transaction and return its connection"""
+        conn = g.pop('_db_conn', None)
+        failed = g.pop('_db_failed', False)
+        if conn is None:
+            return
+        
+        callbacks = g.pop('_db_on_commit', [])
+        try:
+            if commit and not failed:
+                self._call(conn.commit)
+                self._run_on_commit(callbacks)
+            else:
+                self._call(conn.rollback)
+        except psycopg.Error:
+            try:
+                self._call(conn.rollback)
+            except psycopg.Error:
+                pass
+            raise
+        finally:
+            self.return_connection(conn)
+    
+    def _finish_request_scope(self, response):
+        """after_request hook: commit unless the response is a 5xx or the route called rollback_request()"""
+        if g.get('_db_conn') is None:
+            return response
+        
+        try:
+            # 4xx 照常提交：部分失敗的響應（例如帶 failed 列表）已寫入的部分要保留；
+            # 需要放棄寫入的路由明確呼叫 rollback_request()
+            self._release_request_scope(commit=response.status_code < 500)
+        except psycopg.Error as e:
+            print(f"❌ Error committing request transaction: {e}")
+            response = jsonify({
+                'success': False,
+                'error': f'數據庫提交失敗: {str(e)}'
+            })
+            response.status_code = 500
+        return response
+    
+    def _teardown_request_scope(self, exc):
+        """teardown_request hook: release a connection left by an unhandled error or a Socket.IO event"""
+        if g.get('_db_conn') is None:
+            return
+        
         try:
+            self._release_request_scope(commit=exc is None)
+        except psycopg.Error as e:
+            print(f"❌ Error releasing request connection: {e}")
+    
+    def rollback_request(self):
+        """Roll back the request transaction when the request ends, whatever the response status"""
+        if has_request_context():
+            g._db_failed = True
+    
+    @contextmanager
+    def transaction(self):
+        """Run a block atomically: a SAVEPOINT on the request connection, or its own transaction without one"""
+        if self._bound_connection() is not None:
+            with self.savepoint():
+                yield self
+        else:
+            # POSTGRES_REQUEST_SCOPED=false：自己取一條連線，區塊結束時提交（set_config(..., true) 等事務內設置有效）
+            with self:
+                yield self
+    
+    def on_commit(self, callback):
+        """Run callback once the current transaction commits (immediately when no transaction is open)"""
+        if self._current_conn is not None:
+            if not getattr(self._local, 'on_commit', None):
+                self._local.on_commit = []
+            self._local.on_commit.append(callback)
+        elif self.request_scoped and has_request_context() and g.get('_db_conn') is not None:
+            g.setdefault('_db_on_commit', []).append(callback)
+        else:
+            self._run_on_commit([callback])
+    
+    def _run_on_commit(self, callbacks):
+        """提交後的回調（例如推送變更）失敗不影響已提交的事務"""
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ on_commit callback failed: {e}")
+    
+    def snapshot_connection(self, read_only=True):
+        """Check out a dedicated connection whose transaction reads one REPEATABLE READ snapshot"""
+        conn = self._get_replica_connection() if self._use_replica(read_only) else None
+        if conn is None:
             conn = self.get_connection()
-            # ✅ psycopg 3 的 cursor 使用方式相同
-            cursor = conn.cursor()
-            
-            cursor.execute(query, params)
-            
-            if fetch:
-                if query.strip().upper().startswith('SELECT'):
-                    result = cursor.fetchall()
-                    return result
-                else:
-                    conn.commit()
-                    return cursor.rowcount
+        try:
+            # 事務的第一條語句：之後所有查詢（含串流游標）看到同一個快照
+            self._call(conn.execute, "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        except psycopg.Error:
+            self.release_snapshot(conn)
+            raise
+        return conn
+    
+    def release_snapshot(self, conn):
+        """Roll back and return a connection from snapshot_connection()"""
+        try:
+            self._call(conn.rollback)
+        except psycopg.Error:
+            pass
+        self.return_connection(conn)
+    
+    @contextmanager
+    def using(self, conn):
+        """Temporarily bind conn so execute_* calls in the block run on it (no commit on exit)"""
+        previous = self._current_conn
+        self._current_conn = conn
+        try:
+            yield self
+        finally:
+            self._current_conn = previous
+    
+    @contextmanager
+    def savepoint(self):
+        """Run a block inside a SAVEPOINT so its failure does not abort the shared transaction"""
+        conn = self._bound_connection()
+        if conn is None:
+            yield
+            return
+        
+        self._local.savepoints = getattr(self._local, 'savepoints', 0) + 1
+        try:
+            # psycopg 3 在已開啟的事務中使用 transaction() 會建立 SAVEPOINT；
+            # SAVEPOINT / RELEASE / ROLLBACK TO 都要往返數據庫，進入和離開經由 _call
+            transaction = conn.transaction()
+            self._call(transaction.__enter__)
+            try:
+                yield
+            except BaseException as e:
+                if not self._call(transaction.__exit__, type(e), e, e.__traceback__):
+                    raise
             else:
+                self._call(transaction.__exit__, None, None, None)
+        finally:
+            self._local.savepoints -= 1
+    
+    def _observe(self, query, params, started, result=None, error=None):
+        """Record latency, row count and errors for one statement"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if isinstance(result, list):
+            rows = len(result)
+        elif isinstance(result, int):
+            rows = max(result, 0)
+        elif isinstance(result, tuple):
+            rows = 1
+        else:
+            rows = 0
+        self.metrics.record(query, params, elapsed_ms, rows=rows, error=error)
+    
+    def _run(self, func, commit=True, query=None, params=None, read_only=False, row_factory=None,
+             mark_write=True):
+        """Run func(cursor) on the bound connection, or on a one-off pooled (or replica) connection"""
+        # 副本連線（只讀）> 共用連線（with 區塊 / 請求）> 臨時從主庫連線池取得
+        conn = self._get_replica_connection() if self._use_replica(read_only) else None
+        if conn is None:
+            conn = self._bound_connection()
+            owned = conn is None
+        else:
+            owned = True
+        cursor = None
+        started = None
+        
+        def run(conn, cursor):
+            result = func(cursor)
+            # 共用連線由 with 區塊 / 請求結束時統一提交
+            if owned and commit:
                 conn.commit()
-                return None
+            return result
+        
+        try:
+            if conn is None:
+                conn = self.get_connection()
+            # ✅ psycopg 3 的 cursor 使用方式相同
+            factory = resolve_row_factory(row_factory)
+            cursor = conn.cursor(row_factory=factory) if factory else conn.cursor()
+            
+            started = time.perf_counter()
+            result = self._call(run, conn, cursor)
+            if query is not None:
+                self._observe(query, params, started, result)
+            if commit and mark_write:
+                self._mark_write()
+            return result
                 
         except psycopg.Error as e:
+            if query is not None and started is not None:
+                self._observe(query, params, started, error=type(e).__name__)
             if conn:
-                conn.rollback()
+                if owned:
+                    self._call(conn.rollback)
+                elif self._current_conn is None and not getattr(self._local, 'savepoints', 0):
+                    # 請求事務已失效，結束時整體回滾
+                    g._db_failed = True
             print(f"❌ Database error: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
-            if conn:
+            if owned and conn:
                 self.return_connection(conn)
 
+    def execute_query(self, query, params=None, fetch=True, read_only=False, row_factory=None,
+                      mark_write=True):
+        """Execute a query using connection pool (read_only=True allows routing to a replica)
+
+        mark_write=False is for writes that only refresh cache data: they do not pin the client to the primary.
+        """
+        is_select = query.strip().upper().startswith('SELECT')
+        
+        def run(cursor):
+            cursor.execute(query, params)
+            
+            if fetch:
+                if is_select:
+                    return cursor.fetchall()
+                return cursor.rowcount
+            return None
+        
+        return self._run(run, commit=not (fetch and is_select), query=query, params=params,
+                         read_only=read_only, row_factory=row_factory, mark_write=mark_write)
+
+    @classmethod
+    def register_query(cls, key, query):
+        """Register a hot query under a key so routes can run it prepared"""
+        cls._named_queries[key] = query
+    
+    @classmethod
+    def register_queries(cls, queries):
+        """Register several named queries at once"""
+        for key, query in queries.items():
+            cls.register_query(key, query)
+    
+    def get_named_query(self, key):
+        """Return the SQL registered under key"""
+        try:
+            return self._named_queries[key]
+        except KeyError:
+            raise KeyError(f"Unknown named query: {key}") from None
+    
+    def execute_named(self, key, params=None, fetch=True, read_only=False, row_factory=None):
+        """Execute a registered query as a server-side prepared statement on the pooled connection"""
+        query = self.get_named_query(key)
+        is_select = query.strip().upper().startswith('SELECT')
+        
+        def run(cursor):
+            # ✅ prepare=True：每條連線第一次執行時 PREPARE，之後直接重用執行計劃
+            cursor.execute(query, params, prepare=True)
+            # 執行成功後才計入（失敗的語句不會留在連線的 prepared 緩存中）
+            self._record_prepare(key, cursor.connection)
+            
+            if fetch:
+                # SELECT 以及帶 RETURNING 的寫入（例如 WITH ... INSERT）返回結果行
+                if cursor.description is not None:
+                    return cursor.fetchall()
+                return cursor.rowcount
+            return None
+        
+        return self._run(run, commit=not (fetch and is_select), query=query, params=params,
+                         read_only=read_only, row_factory=row_factory)
+    
+    def _record_prepare(self, key, conn):
+        """Count whether a successful execution prepared the statement or reused the connection's plan"""
+        with self._stats_lock:
+            stats = self._named_stats.setdefault(key, {'calls': 0, 'prepared': 0, 'reused': 0})
+            stats['calls'] += 1
+            prepared = self._prepared_keys.get(conn)
+            if prepared is None:
+                prepared = self._prepared_keys[conn] = OrderedDict()
+            if key in prepared:
+                stats['reused'] += 1
+                prepared.move_to_end(key)
+                return
+            
+            stats['prepared'] += 1
+            prepared[key] = True
+            # 與 psycopg 相同：每條連線最多保留 prepared_max 個語句，超出時淘汰最久未用的
+            # （其他自動 prepare 的語句也佔用名額，因此這裡的重用數是上限估計）
+            limit = conn.prepared_max
+            while limit is not None and len(prepared) > limit:
+                prepared.popitem(last=False)
+    
+    def _forget_prepared(self, conn):
+        """Drop the prepared-key record of a connection that is being closed"""
+        with self._stats_lock:
+            self._prepared_keys.pop(conn, None)
+    
+    def prepared_stats(self):
+        """Per-key counters: calls, statements prepared and plans reused"""
+        with self._stats_lock:
+            return {key: dict(stats) for key, stats in self._named_stats.items()}
+
     def execute_returning(self, query, params=None):
         """Execute query with RETURNING clause"""
-        conn = None
+        def run(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchone() if cursor.description else None
+        
+        return self._run(run, query=query, params=params)
+
+    def execute_batch(self, statements, read_only=False, row_factory=None):
+        """Execute [(query, params), ...] in pipeline mode with one network flush, results in order"""
+        statements = list(statements)
+        has_write = any(not query.strip().upper().startswith('SELECT') for query, _ in statements)
+        factory = resolve_row_factory(row_factory)
+        
+        def run(cursor):
+            conn = cursor.connection
+            cursors = []
+            try:
+                # ✅ psycopg 3 pipeline 模式：語句排隊發送，離開時一次 sync
+                with conn.pipeline():
+                    for query, params in statements:
+                        cur = conn.cursor(row_factory=factory) if factory else conn.cursor()
+                        cur.execute(query, params)
+                        cursors.append(cur)
+                
+                return [cur.fetchall() if cur.description else cur.rowcount for cur in cursors]
+            finally:
+                for cur in cursors:
+                    cur.close()
+        
+        # 整個 pipeline 作為一條記錄統計
+        batch_query = ';\n'.join(query for query, _ in statements)
+        return self._run(run, commit=has_write, query=batch_query, read_only=read_only and not has_write)
+
+    def execute_many(self, query, params_seq):
+        """Execute one statement for every parameter set using executemany in pipeline mode"""
+        params_seq = list(params_seq)
+        if not params_seq:
+            return 0
+        
+        def run(cursor):
+            # ✅ psycopg 3 的 executemany 在 pipeline 中批量發送，不需要逐條等待往返
+            with cursor.connection.pipeline():
+                cursor.executemany(query, params_seq)
+            return cursor.rowcount
+        
+        return self._run(run, query=query, params=params_seq[0])
+
+    def copy_rows(self, table, columns, rows):
+        """Bulk load rows into table(columns) with COPY FROM STDIN, returning the number of rows written
+
+        The whole COPY runs inside _run()'s _call(), so in cooperative mode `rows` is consumed on a
+        tpool thread: pass a list or a plain iterator, not a generator that touches greenlet state.
+        """
+        statement = sql.SQL("COPY {} ({}) FROM STDIN").format(
+            sql.Identifier(*table.split('.')),
+            sql.SQL(', ').join(sql.Identifier(column) for column in columns)
+        )
+        
+        def run(cursor):
+            count = 0
+            with cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    count += 1
+            return count
+        
+        return self._run(run, query=f"COPY {table} ({', '.join(columns)}) FROM STDIN")
+
+    def stream_query(self, query, params=None, itersize=2000, read_only=False, row_factory=None, conn=None):
+        """Yield rows from a named server-side cursor, fetching `itersize` rows per round-trip
+
+        conn (e.g. from snapshot_connection()) is taken over and returned when the stream ends.
+        """
+        # 串流讀取使用獨立連線：響應在 after_request 之後才發送，請求級連線那時已歸還
+        if conn is None:
+            conn = self._get_replica_connection() if self._use_replica(read_only) else None
+        if conn is None:
+            conn = self.get_connection()
         cursor = None
+        # 只統計花在數據庫上的時間，不包含調用方處理每一批資料的時間
+        db_seconds = 0.0
+        row_count = 0
+        error = None
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            factory = resolve_row_factory(row_factory)
+            name = f"stream_{uuid.uuid4().hex}"
+            cursor = conn.cursor(name=name, row_factory=factory) if factory else conn.cursor(name=name)
+            cursor.itersize = itersize
+            started = time.perf_counter()
+            self._call(cursor.execute, query, params)
+            db_seconds += time.perf_counter() - started
             
-            cursor.execute(query, params)
-            result = cursor.fetchone() if cursor.description else None
-            
-            conn.commit()
-            return result
+            while True:
+                started = time.perf_counter()
+                rows = self._call(cursor.fetchmany, itersize)
+                db_seconds += time.perf_counter() - started
+                if not rows:
+                    break
+                row_count += len(rows)
+                yield from rows
                 
         except psycopg.Error as e:
-            if conn:
-                conn.rollback()
+            error = type(e).__name__
             print(f"❌ Database error: {e}")
             raise
         finally:
+            self.metrics.record(query, params, db_seconds * 1000, rows=row_count, error=error)
+            # 關閉服務端游標（CLOSE）和回滾都要往返數據庫，同樣經由 _call
             if cursor:
-                cursor.close()
-            if conn:
-                self.return_connection(conn)
+                try:
+                    self._call(cursor.close)
+                except psycopg.Error:
+                    pass
+            # 只讀事務，直接回滾後歸還
+            try:
+                self._call(conn.rollback)
+            except psycopg.Error:
+                pass
+            self.return_connection(conn)
 
     def _close_pool(self):
         """Close the connection pool safely"""
@@ -203,6 +824,8 @@ class PostgresDBManager:
             try:
                 # ✅ psycopg 3 使用 close()
                 self.connection_pool.close()
+                for pool in self.replica_pools:
+                    pool.close()
                 print("✅ All database connections closed.")
             except Exception as e:
                 print(f"❌ Error closing connection pool: {e}")
\ No newline at end of file
@@ -1,6 +1,6 @@
 import sys
 import traceback
-from flask import abort
+from flask import abort, g, jsonify
 
 # def abort_msg(e):
 #     """500 bad request for exception"""
@@ -29,4 +29,30 @@ def abort_msg(e):
         'success': False,
         'message': 'An error occurred',
         'detail': detail
-    }, getattr(e, 'code', 500)
\ No newline at end of file
+    }, getattr(e, 'code', 500)
+
+class PoolSaturatedError(Exception):
+    """Raised when no database connection is available within the checkout timeout or the wait queue is full"""
+    code = 503
+    
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def pool_saturated(e):
+    """503 + Retry-After when the connection pool sheds a request"""
+    response = jsonify({
+        'success': False,
+        'message': '伺服器繁忙，請稍後再試',
+        'detail': str(e)
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def shed_saturated_response(response):
+    """after_request: routes catch broad Exceptions and answer 500, turn a pool rejection back into 503"""
+    error = g.pop('_db_saturated', None)
+    if error is None or response.status_code < 500:
+        return response
+    return pool_saturated(error)
@@ -0,0 +1,240 @@
+# metrics.py
+# 數據庫指標：按查詢指紋統計延遲直方圖、行數、錯誤數並記錄慢查詢；連線池使用情況與洩漏偵測
+import re
+import time
+import traceback
+from collections import deque
+from functools import lru_cache
+
+from flask import has_request_context, request
+
+# 直方圖桶上限（毫秒），最後一個桶收集所有更慢的查詢
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_COMMENT_RE = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM_RE = re.compile(r'%\(\w+\)s|%s')
+_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query):
+    """將 SQL 正規化為指紋：去掉註釋、常量和參數佔位符，合併空白"""
+    text = _COMMENT_RE.sub(' ', query)
+    text = _STRING_RE.sub('?', text)
+    text = _PARAM_RE.sub('?', text)
+    text = _NUMBER_RE.sub('?', text)
+    text = _LIST_RE.sub('(?...)', text)
+    return _SPACE_RE.sub(' ', text).strip().rstrip(';').strip()
+
+
+def params_shape(params):
+    """只描述參數的結構（類型 / 鍵名），避免把密碼等值寫進日誌"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+class QueryMetrics:
+    """Per-fingerprint latency histograms, row counts, error counts and a slow-query log"""
+
+    def __init__(self, lock, slow_query_ms=500):
+        self._lock = lock
+        self.slow_query_ms = slow_query_ms
+        self._stats = {}
+
+    def record(self, query, params, elapsed_ms, rows=None, error=None):
+        """Record one statement execution"""
+        key = fingerprint(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    'calls': 0,
+                    'errors': 0,
+                    'rows': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'buckets': [0] * len(LATENCY_BUCKETS_MS),
+                    'routes': {},
+                }
+            stats['calls'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if error is not None:
+                stats['errors'] += 1
+            if rows:
+                stats['rows'] += rows
+            for index, upper in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms <= upper:
+                    stats['buckets'][index] += 1
+                    break
+
+            route = request.endpoint if has_request_context() else None
+            stats['routes'][route] = stats['routes'].get(route, 0) + 1
+
+        if elapsed_ms >= self.slow_query_ms:
+            print(f"🐢 Slow query ({elapsed_ms:.1f} ms) route={route} "
+                  f"params={params_shape(params)} rows={rows} error={error}\n    {key}")
+
+    def snapshot(self):
+        """Return all statistics, slowest total time first"""
+        with self._lock:
+            items = [(key, dict(stats, buckets=list(stats['buckets']), routes=dict(stats['routes'])))
+                     for key, stats in self._stats.items()]
+
+        result = []
+        for key, stats in sorted(items, key=lambda item: item[1]['total_ms'], reverse=True):
+            calls = stats['calls']
+            result.append({
+                'fingerprint': key,
+                'calls': calls,
+                'errors': stats['errors'],
+                'rows': stats['rows'],
+                'total_ms': round(stats['total_ms'], 3),
+                'avg_ms': round(stats['total_ms'] / calls, 3) if calls else 0,
+                'max_ms': round(stats['max_ms'], 3),
+                'p50_ms': _bucket_percentile(stats['buckets'], calls, 0.50, stats['max_ms']),
+                'p95_ms': _bucket_percentile(stats['buckets'], calls, 0.95, stats['max_ms']),
+                'p99_ms': _bucket_percentile(stats['buckets'], calls, 0.99, stats['max_ms']),
+                'histogram': {
+                    ('+Inf' if upper == float('inf') else str(upper)): count
+                    for upper, count in zip(LATENCY_BUCKETS_MS, stats['buckets'])
+                },
+                'routes': stats['routes'],
+            })
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def _bucket_percentile(buckets, total, quantile, max_ms):
+    """以直方圖桶上限估算百分位數（落在最後一個桶時使用最大值）"""
+    if not total:
+        return None
+    target = total * quantile
+    seen = 0
+    for upper, count in zip(LATENCY_BUCKETS_MS, buckets):
+        seen += count
+        if seen >= target:
+            return round(max_ms, 3) if upper == float('inf') else upper
+    return round(max_ms, 3)
+
+
+class PoolMonitor:
+    """Connection pool statistics: checkout wait percentiles, hold times and leak detection"""
+
+    def __init__(self, lock, leak_threshold_seconds=30, sample_size=1000):
+        self._lock = lock
+        self.leak_threshold_seconds = leak_threshold_seconds
+        self._wait_ms = deque(maxlen=sample_size)
+        self._holders = {}
+        self._checkouts = 0
+        self._unpooled = 0
+        self._hold_total_ms = 0.0
+        self._returns = 0
+
+    def on_checkout(self, conn, wait_ms, pooled=True):
+        """Record a checkout together with the stack and route that requested it"""
+        now = time.monotonic()
+        holder = {
+            'since': now,
+            'pooled': pooled,
+            'route': request.endpoint if has_request_context() else None,
+            'stack': traceback.extract_stack(limit=12)[:-2],
+            'reported': False,
+        }
+        with self._lock:
+            self._checkouts += 1
+            self._wait_ms.append(wait_ms)
+            if not pooled:
+                self._unpooled += 1
+            self._holders[id(conn)] = holder
+        self._report_leaks(now)
+
+    def on_return(self, conn):
+        """Record a return; returns False when the connection was not checked out from the pool"""
+        with self._lock:
+            holder = self._holders.pop(id(conn), None)
+            if holder is None:
+                return True
+            self._returns += 1
+            self._hold_total_ms += (time.monotonic() - holder['since']) * 1000
+        return holder['pooled']
+
+    def leaks(self, now=None):
+        """Connections held longer than the leak threshold, oldest first"""
+        now = now or time.monotonic()
+        with self._lock:
+            holders = list(self._holders.values())
+        result = []
+        for holder in sorted(holders, key=lambda item: item['since']):
+            held = now - holder['since']
+            if held < self.leak_threshold_seconds:
+                break
+            result.append({
+                'held_seconds': round(held, 3),
+                'pooled': holder['pooled'],
+                'route': holder['route'],
+                'stack': traceback.format_list(holder['stack']),
+            })
+        return result
+
+    def _report_leaks(self, now):
+        """在每次取得連線時檢查一次，每個疑似洩漏只輸出一次"""
+        with self._lock:
+            stale = [holder for holder in self._holders.values()
+                     if not holder['reported'] and now - holder['since'] >= self.leak_threshold_seconds]
+            for holder in stale:
+                holder['reported'] = True
+        for holder in stale:
+            print(f"⚠️ Possible connection leak: held {now - holder['since']:.1f}s "
+                  f"(route={holder['route']}, pooled={holder['pooled']})\n"
+                  + ''.join(traceback.format_list(holder['stack'])))
+
+    def snapshot(self, pool=None):
+        """Pool size / idle / waiting from psycopg_pool plus our checkout and hold statistics"""
+        with self._lock:
+            waits = sorted(self._wait_ms)
+            data = {
+                'checkouts': self._checkouts,
+                'unpooled_checkouts': self._unpooled,
+                'in_use': len(self._holders),
+                'avg_hold_ms': round(self._hold_total_ms / self._returns, 3) if self._returns else None,
+            }
+
+        data['checkout_wait_ms'] = {
+            'p50': _percentile(waits, 0.50),
+            'p95': _percentile(waits, 0.95),
+            'p99': _percentile(waits, 0.99),
+            'max': round(waits[-1], 3) if waits else None,
+            'samples': len(waits),
+        }
+
+        if pool is not None:
+            stats = pool.get_stats()
+            data['pool'] = {
+                'size': stats.get('pool_size'),
+                'idle': stats.get('pool_available'),
+                'min': stats.get('pool_min'),
+                'max': stats.get('pool_max'),
+                'waiting': stats.get('requests_waiting'),
+                'raw': stats,
+            }
+
+        data['leak_threshold_seconds'] = self.leak_threshold_seconds
+        data['leaks'] = self.leaks()
+        return data
+
+
+def _percentile(sorted_values, quantile):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(quantile * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
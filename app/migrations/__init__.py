@@ -0,0 +1,87 @@
+# migrations/__init__.py
+# 版本化數據庫遷移：每個 mNNNN_*.py 模組定義 VERSION / NAME / TRANSACTIONAL / STATEMENTS，
+# 已執行的版本記錄在 schema_migrations 表中。使用 `flask db-migrate` 執行。
+import psycopg
+
+from . import (
+    m0001_hot_path_indexes,
+    m0002_schedule_week_versions,
+    m0003_schedule_changes,
+    m0004_schedules_unique_user_date,
+    m0005_schedule_templates,
+    m0006_schedule_list_filters,
+    m0007_partition_schedules,
+    m0008_schedule_week_snapshots,
+    m0009_archive_chunks,
+    m0010_leave_skip_validation,
+    m0011_schedule_list_keyset,
+)
+
+MIGRATIONS = sorted([
+    m0001_hot_path_indexes,
+    m0002_schedule_week_versions,
+    m0003_schedule_changes,
+    m0004_schedules_unique_user_date,
+    m0005_schedule_templates,
+    m0006_schedule_list_filters,
+    m0007_partition_schedules,
+    m0008_schedule_week_snapshots,
+    m0009_archive_chunks,
+    m0010_leave_skip_validation,
+    m0011_schedule_list_keyset,
+], key=lambda module: module.VERSION)
+
+
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def applied_versions(conn):
+    """Return the set of migration versions already applied"""
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations").fetchall()}
+
+
+def apply_migrations(db_manager, target=None, dry_run=False):
+    """執行尚未套用的遷移（到 target 版本為止），返回已執行（或 dry_run 時將執行）的版本列表"""
+    # 使用獨立的 autocommit 連線：CREATE INDEX CONCURRENTLY 不能放在事務中
+    with psycopg.connect(db_manager.dsn, autocommit=True) as conn:
+        done = applied_versions(conn)
+        pending = [
+            module for module in MIGRATIONS
+            if module.VERSION not in done and (target is None or module.VERSION <= target)
+        ]
+
+        applied = []
+        for module in pending:
+            print(f"🔧 Migration {module.VERSION:04d} {module.NAME}{' (dry run)' if dry_run else ''}")
+            if dry_run:
+                applied.append(module.VERSION)
+                continue
+
+            if module.TRANSACTIONAL:
+                with conn.transaction():
+                    for statement in module.STATEMENTS:
+                        conn.execute(statement)
+                    conn.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (module.VERSION, module.NAME)
+                    )
+            else:
+                for statement in module.STATEMENTS:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (module.VERSION, module.NAME)
+                )
+
+            applied.append(module.VERSION)
+            print(f"✅ Migration {module.VERSION:04d} applied")
+
+        return applied
@@ -0,0 +1,139 @@
+# migrations/explain.py
+# 對各路由的熱點查詢執行 EXPLAIN，若在大表上退化為 Seq Scan 則報告失敗。
+# 需在接近真實數據量的數據庫上執行（`flask db-explain`），小表（如 shift_types）的 Seq Scan 不視為問題。
+from datetime import date, timedelta
+
+import psycopg
+
+from app.queries import NAMED_QUERIES, users_list_queries
+
+
+def route_queries():
+    """
+    (名稱, SQL, 參數) 列表：SQL 取自 NAMED_QUERIES（與路由執行的語句相同），參數取代表性的值。
+    同一 key 可按不同參數檢查多次（名稱為 "key (說明)"）；寫入語句只 EXPLAIN，不執行。
+    """
+    today = date.today()
+    month_start = today.replace(day=1)
+    month_end = month_start + timedelta(days=30)
+    monday = today - timedelta(days=today.weekday())
+    sunday = monday + timedelta(days=6)
+
+    checks = [
+        ('schedules.range', range_params(month_start, month_end)),
+        ('schedules.range (nickname)', range_params(month_start, month_end, nickname='%an%')),
+        ('schedules.range (page)', range_params(month_start, month_end, after_nickname='an',
+                                                after_date=month_start, after_id=1, limit=200)),
+        ('schedules.range (shift_name)', range_params(month_start, month_end, shift_names=['早班'])),
+        ('schedules.range (department)', range_params(month_start, month_end, department_ids=[1])),
+        ('schedules.range_archive', range_params(month_start, month_end)),
+        ('schedules.by_ids', ([1, 2, 3], month_start, month_end)),
+        ('schedules.changes_since', {'txid': '0', 'id': 0, 'horizon': '1000000', 'start': month_start,
+                                     'end': month_end, 'limit': 500}),
+        ('schedules.grid', {'start': month_start, 'end': month_end, 'nickname': None}),
+        ('schedules.range_version', (month_start, month_end)),
+        ('schedules.stats_cells', (month_start, month_start, month_end)),
+        ('schedules.create', {'userID': 'A0001', 'schedule_date': today, 'shift_name': '早班',
+                              'shift_description': None, 'created_by': 'admin'}),
+        ('schedules.copy_preview', copy_params(monday, today)),
+        ('schedules.copy_apply', dict(copy_params(monday, today), created_by='admin')),
+        ('schedules.copy_preview (template)', copy_params(monday, today, template_id=1)),
+        ('schedules.week_diff', week_params(monday, sunday)),
+        ('schedules.week_apply', dict(week_params(monday, sunday), created_by='admin')),
+        ('schedules.week_version', (monday,)),
+        ('leave.validate_token', ('00000000-0000-0000-0000-000000000000', 30)),
+        ('leave.mark_schedules', ('{}', monday, sunday, '["%s"]' % today.isoformat(), 'someone', '事假', '全天')),
+        ('leave.affected_schedules', (monday, sunday, '["%s"]' % today.isoformat(), 'someone', '事假', '全天',
+                                      'someone', 'someone')),
+        ('users.by_ids', ([1, 2, 3],)),
+        ('users.ids_by_department', ([1],)),
+        ('auth.user_by_username', ('someone',)),
+        ('shift_types.active_by_name', ('早班',)),
+    ]
+    queries = [(name, NAMED_QUERIES[name.split(' ')[0]], params) for name, params in checks]
+
+    # 用戶列表的 SQL 隨篩選條件組合，取路由實際使用的組合（見 queries.users_list_queries）
+    (count_query, count_params), (data_query, data_params) = users_list_queries('admin', search='an')
+    queries.append(('users.list_search (count)', count_query, count_params))
+    queries.append(('users.list_search', data_query, data_params))
+    return queries
+
+
+def range_params(start, end, **filters):
+    """schedules.range 的參數（未指定的篩選為 NULL）"""
+    params = {
+        'start': start,
+        'end': end,
+        'nickname': None,
+        'department_ids': None,
+        'shift_names': None,
+        'user_codes': None,
+        'after_nickname': None,
+        'after_date': None,
+        'after_id': None,
+        'limit': None,
+    }
+    params.update(filters)
+    return params
+
+
+def copy_params(target_monday, target_start, template_id=None):
+    """schedules.copy_preview 的參數：把上週複製到本週起的四週"""
+    return {
+        'template_id': template_id,
+        'source_start': target_monday - timedelta(weeks=1),
+        'period': 7,
+        'target_monday': target_monday,
+        'target_start': target_start,
+        'target_end': target_monday + timedelta(weeks=4, days=-1),
+        'user_codes': None,
+        'department_id': None,
+        'locked_dates': [],
+    }
+
+
+def week_params(week_start, week_end):
+    """schedules.week_diff 的參數：一個用戶一週七格"""
+    dates = [week_start + timedelta(days=offset) for offset in range(7)]
+    return {
+        'user_codes': ['A0001'] * 7,
+        'dates': dates,
+        'shifts': ['早班'] * 5 + [None, None],
+        'scope_users': ['A0001'],
+        'replace': False,
+        'week_start': week_start,
+        'week_end': week_end,
+    }
+
+
+def _seq_scans(plan, found):
+    """遞迴收集計劃樹中的 Seq Scan 節點"""
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append((plan.get('Relation Name'), plan.get('Plan Rows')))
+    for child in plan.get('Plans', []):
+        _seq_scans(child, found)
+    return found
+
+
+def check_query_plans(db_manager, min_rows=10000):
+    """對每條查詢執行 EXPLAIN，返回 [(名稱, 表名, 表行數估計)]，空列表表示全部走索引"""
+    problems = []
+    with psycopg.connect(db_manager.dsn) as conn:
+        table_rows = {
+            row[0]: row[1] for row in conn.execute(
+                "SELECT relname, reltuples FROM pg_class WHERE relkind IN ('r', 'p')"
+            ).fetchall()
+        }
+
+        # ClientCursor：參數在客戶端代入，EXPLAIN 看到的是具體值的計劃
+        cursor = psycopg.ClientCursor(conn)
+        for name, query, params in route_queries():
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cursor.fetchone()[0][0]['Plan']
+            for relation, _ in _seq_scans(plan, []):
+                rows = table_rows.get(relation, 0)
+                if rows >= min_rows:
+                    problems.append((name, relation, int(rows)))
+        conn.rollback()
+
+    return problems
@@ -0,0 +1,75 @@
+# 熱點查詢索引：排班範圍 / 用戶查找 / 請假 token / 班別，以及 ILIKE '%x%' 使用的 pg_trgm 索引
+#
+# 注意：IF NOT EXISTS 只按名稱判斷。若舊庫已有同欄位但不同名稱的索引（例如 UNIQUE 約束），
+# 請先用 \di 確認，避免重複索引拖慢寫入。
+
+VERSION = 1
+NAME = 'hot_path_indexes'
+
+# CREATE INDEX CONCURRENTLY 不能在事務中執行，逐條 autocommit
+TRANSACTIONAL = False
+
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+
+    # schedules：日期範圍查詢（列表頁），INCLUDE 讓 JOIN 所需欄位可以 index-only 取得
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schedules_schedule_date
+        ON schedules (schedule_date) INCLUDE (user_id, shift_name)
+    """,
+    # schedules：單一用戶某天是否已有排班 / 用戶的排班範圍
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schedules_user_id_schedule_date
+        ON schedules (user_id, schedule_date)
+    """,
+    # schedules：請假批准按暱稱快照 + 日期更新 remark
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schedules_user_name_snapshot_date
+        ON schedules (user_name_snapshot, schedule_date)
+    """,
+
+    # users：登入（status != 1）
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_username_login
+        ON users (username) WHERE status != 1
+    """,
+    # users：按 userID 查找（創建排班、修改用戶）
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_userid
+        ON users (userID)
+    """,
+    # users：按暱稱排序 / 請假批准按暱稱查找
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_nickname
+        ON users (nickname)
+    """,
+    # users：列表搜尋與排班頁暱稱篩選的 ILIKE '%x%'
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_nickname_trgm
+        ON users USING gin (nickname gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_username_trgm
+        ON users USING gin (username gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_userid_trgm
+        ON users USING gin (userID gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_email_trgm
+        ON users USING gin (email gin_trgm_ops)
+    """,
+
+    # leave_tokens：按 token 驗證並限制 30 分鐘內
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leave_tokens_token_created_at
+        ON leave_tokens (token, created_at)
+    """,
+
+    # shift_types：有效班別名稱檢查
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_shift_types_active_name
+        ON shift_types (shift_name) WHERE is_active = TRUE
+    """,
+]
@@ -0,0 +1,139 @@
+# 排班版本戳：每個 ISO 週一行（版本號 + 行數 + 最後更新時間），由觸發器維護；
+# users / shift_types 中會出現在排班列表裡的欄位變更時，另外遞增維度版本。
+# GET /api/schedules/ 與 /grid 以此計算 ETag，If-None-Match 命中時直接返回 304，不執行 JOIN。
+
+VERSION = 2
+NAME = 'schedule_week_versions'
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    # 全局遞增序列：刪除後重建的週也不會得到相同的版本號
+    "CREATE SEQUENCE IF NOT EXISTS schedule_version_seq",
+
+    """
+    CREATE TABLE IF NOT EXISTS schedule_week_versions (
+        week_start DATE PRIMARY KEY,
+        version BIGINT NOT NULL,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS schedule_dimension_versions (
+        name TEXT PRIMARY KEY,
+        version BIGINT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+
+    # 以現有數據初始化
+    """
+    INSERT INTO schedule_week_versions (week_start, version, row_count, updated_at)
+    SELECT date_trunc('week', schedule_date)::date, nextval('schedule_version_seq'),
+           count(*), COALESCE(max(updated_at), now())
+    FROM schedules
+    GROUP BY 1
+    ON CONFLICT (week_start) DO NOTHING
+    """,
+    """
+    INSERT INTO schedule_dimension_versions (name, version)
+    VALUES ('users', nextval('schedule_version_seq')),
+           ('shift_types', nextval('schedule_version_seq'))
+    ON CONFLICT (name) DO NOTHING
+    """,
+
+    # 語句級觸發器 + transition table：批量寫入（COPY / executemany）每週只 upsert 一次
+    """
+    CREATE OR REPLACE FUNCTION bump_schedule_week_versions() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO schedule_week_versions AS v (week_start, version, row_count, updated_at)
+            SELECT date_trunc('week', schedule_date)::date, nextval('schedule_version_seq'), count(*), now()
+            FROM new_rows
+            GROUP BY 1
+            ON CONFLICT (week_start) DO UPDATE
+                SET version = EXCLUDED.version,
+                    row_count = v.row_count + EXCLUDED.row_count,
+                    updated_at = EXCLUDED.updated_at;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO schedule_week_versions AS v (week_start, version, row_count, updated_at)
+            SELECT date_trunc('week', schedule_date)::date, nextval('schedule_version_seq'), -count(*), now()
+            FROM old_rows
+            GROUP BY 1
+            ON CONFLICT (week_start) DO UPDATE
+                SET version = EXCLUDED.version,
+                    row_count = GREATEST(v.row_count + EXCLUDED.row_count, 0),
+                    updated_at = EXCLUDED.updated_at;
+        ELSE
+            -- UPDATE：舊週 -1、新週 +1（同一週內的修改行數不變，只遞增版本）
+            INSERT INTO schedule_week_versions AS v (week_start, version, row_count, updated_at)
+            SELECT week_start, nextval('schedule_version_seq'), sum(delta), now()
+            FROM (
+                SELECT date_trunc('week', schedule_date)::date AS week_start, -1 AS delta FROM old_rows
+                UNION ALL
+                SELECT date_trunc('week', schedule_date)::date, 1 FROM new_rows
+            ) changes
+            GROUP BY week_start
+            ON CONFLICT (week_start) DO UPDATE
+                SET version = EXCLUDED.version,
+                    row_count = GREATEST(v.row_count + EXCLUDED.row_count, 0),
+                    updated_at = EXCLUDED.updated_at;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedule_week_versions_insert ON schedules",
+    """
+    CREATE TRIGGER trg_schedule_week_versions_insert
+        AFTER INSERT ON schedules
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_schedule_week_versions()
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedule_week_versions_update ON schedules",
+    """
+    CREATE TRIGGER trg_schedule_week_versions_update
+        AFTER UPDATE ON schedules
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_schedule_week_versions()
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedule_week_versions_delete ON schedules",
+    """
+    CREATE TRIGGER trg_schedule_week_versions_delete
+        AFTER DELETE ON schedules
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_schedule_week_versions()
+    """,
+
+    # 維度版本：用戶資料 / 班別描述變更會改變排班列表的輸出
+    """
+    CREATE OR REPLACE FUNCTION bump_schedule_dimension_version() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO schedule_dimension_versions AS v (name, version, updated_at)
+        VALUES (TG_TABLE_NAME, nextval('schedule_version_seq'), now())
+        ON CONFLICT (name) DO UPDATE
+            SET version = EXCLUDED.version, updated_at = EXCLUDED.updated_at;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_users_schedule_dimension_version ON users",
+    # 只監聽排班列表輸出的欄位，登入更新 last_login 不會讓 ETag 失效
+    """
+    CREATE TRIGGER trg_users_schedule_dimension_version
+        AFTER INSERT OR DELETE OR UPDATE OF userid, username, nickname, email, phone, department_id, role_level
+        ON users
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_schedule_dimension_version()
+    """,
+    "DROP TRIGGER IF EXISTS trg_shift_types_schedule_dimension_version ON shift_types",
+    """
+    CREATE TRIGGER trg_shift_types_schedule_dimension_version
+        AFTER INSERT OR DELETE OR UPDATE
+        ON shift_types
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_schedule_dimension_version()
+    """,
+]
@@ -0,0 +1,108 @@
+# 排班變更日誌：觸發器把每次 INSERT / UPDATE / DELETE 記錄到 schedule_changes，
+# GET /api/schedules/changes?since=<cursor> 只返回游標之後的變更（刪除以 tombstone 表示）。
+#
+# 游標按事務 ID（xid8）而非自增 id 推進：自增 id 的提交順序不確定，較早取號但較晚提交的
+# 事務會被已發出的游標跳過。只讀取事務 ID 小於當前快照 xmin 的記錄，保證這些事務都已結束。
+
+VERSION = 3
+NAME = 'schedule_changes'
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS schedule_changes (
+        id BIGSERIAL PRIMARY KEY,
+        txid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+        op CHAR(1) NOT NULL,
+        schedule_id INTEGER NOT NULL,
+        schedule_date DATE NOT NULL,
+        -- UPDATE 改變日期時的舊日期，讓按範圍篩選的客戶端也能收到「移出」的變更
+        old_schedule_date DATE,
+        changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_schedule_changes_txid_id ON schedule_changes (txid, id)",
+    "CREATE INDEX IF NOT EXISTS idx_schedule_changes_changed_at ON schedule_changes (changed_at)",
+
+    # 清理記錄：游標早於已清理的事務時返回 410，客戶端需重新載入整個範圍
+    """
+    CREATE TABLE IF NOT EXISTS schedule_changes_pruned (
+        singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+        max_txid XID8 NOT NULL,
+        pruned_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+
+    """
+    CREATE OR REPLACE FUNCTION log_schedule_changes() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO schedule_changes (op, schedule_id, schedule_date)
+            SELECT 'I', id, schedule_date FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO schedule_changes (op, schedule_id, schedule_date)
+            SELECT 'D', id, schedule_date FROM old_rows;
+        ELSE
+            INSERT INTO schedule_changes (op, schedule_id, schedule_date, old_schedule_date)
+            SELECT 'U', n.id, n.schedule_date,
+                   NULLIF(o.schedule_date, n.schedule_date)
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedule_changes_insert ON schedules",
+    """
+    CREATE TRIGGER trg_schedule_changes_insert
+        AFTER INSERT ON schedules
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION log_schedule_changes()
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedule_changes_update ON schedules",
+    """
+    CREATE TRIGGER trg_schedule_changes_update
+        AFTER UPDATE ON schedules
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION log_schedule_changes()
+    """,
+    "DROP TRIGGER IF EXISTS trg_schedule_changes_delete ON schedules",
+    """
+    CREATE TRIGGER trg_schedule_changes_delete
+        AFTER DELETE ON schedules
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION log_schedule_changes()
+    """,
+
+    # 刪除 keep 之前的變更並記錄已清理的最大事務 ID，返回刪除行數
+    """
+    CREATE OR REPLACE FUNCTION prune_schedule_changes(keep INTERVAL) RETURNS BIGINT
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        pruned_txid XID8;
+        deleted BIGINT;
+    BEGIN
+        SELECT txid INTO pruned_txid FROM schedule_changes
+        WHERE changed_at < now() - keep
+        ORDER BY txid DESC
+        LIMIT 1;
+        IF pruned_txid IS NULL THEN
+            RETURN 0;
+        END IF;
+
+        DELETE FROM schedule_changes WHERE txid <= pruned_txid;
+        GET DIAGNOSTICS deleted = ROW_COUNT;
+
+        INSERT INTO schedule_changes_pruned (singleton, max_txid, pruned_at)
+        VALUES (TRUE, pruned_txid, now())
+        ON CONFLICT (singleton) DO UPDATE
+            SET max_txid = GREATEST(schedule_changes_pruned.max_txid, EXCLUDED.max_txid),
+                pruned_at = EXCLUDED.pruned_at;
+        RETURN deleted;
+    END
+    $$
+    """,
+]
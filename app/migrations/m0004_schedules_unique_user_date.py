@@ -0,0 +1,63 @@
+# schedules (user_id, schedule_date) 唯一索引：create_schedule 以 INSERT ... ON CONFLICT 一次完成，
+# 不再「先查後插」（並發點擊會插入重複排班）。
+#
+# 先合併已存在的重複行：保留有班別的最早一行，並把重複行上的備註（請假批准曾重複插入）補到保留行。
+# 若在合併和建索引之間又插入了重複行，CREATE UNIQUE INDEX 會失敗並留下 INVALID 索引，
+# 重新執行 `flask db-migrate` 即可（DROP INDEX IF EXISTS 會先清理）。
+
+VERSION = 4
+NAME = 'schedules_unique_user_date'
+
+# CREATE INDEX CONCURRENTLY 不能在事務中執行，逐條 autocommit
+TRANSACTIONAL = False
+
+_RANKED = """
+    SELECT id, user_id, schedule_date, remark,
+           row_number() OVER (
+               PARTITION BY user_id, schedule_date
+               ORDER BY (shift_name IS NULL), id
+           ) AS rn
+    FROM schedules
+    WHERE user_id IS NOT NULL
+"""
+
+STATEMENTS = [
+    # 1. 重複行上的最新備註補到保留行
+    f"""
+    WITH ranked AS ({_RANKED}),
+    extra AS (
+        SELECT user_id, schedule_date,
+               (array_agg(remark ORDER BY id DESC) FILTER (WHERE remark IS NOT NULL))[1] AS remark
+        FROM ranked
+        WHERE rn > 1
+        GROUP BY user_id, schedule_date
+    )
+    UPDATE schedules s
+    SET remark = extra.remark,
+        updated_at = now()
+    FROM ranked
+    JOIN extra USING (user_id, schedule_date)
+    WHERE s.id = ranked.id
+    AND ranked.rn = 1
+    AND s.remark IS NULL
+    AND extra.remark IS NOT NULL
+    """,
+
+    # 2. 刪除重複行
+    f"""
+    WITH ranked AS ({_RANKED})
+    DELETE FROM schedules s
+    USING ranked
+    WHERE s.id = ranked.id
+    AND ranked.rn > 1
+    """,
+
+    "DROP INDEX CONCURRENTLY IF EXISTS uq_schedules_user_id_schedule_date",
+    """
+    CREATE UNIQUE INDEX CONCURRENTLY uq_schedules_user_id_schedule_date
+        ON schedules (user_id, schedule_date)
+    """,
+
+    # 唯一索引已覆蓋 (user_id, schedule_date) 查詢，移除 0001 的普通索引以減少寫入開銷
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_schedules_user_id_schedule_date",
+]
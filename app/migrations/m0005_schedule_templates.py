@@ -0,0 +1,30 @@
+# 輪班模板：保存 N 週的排班（相對週一的天數偏移），POST /api/schedules/copy 可以把模板
+# （或任意一段實際排班）以一條 INSERT ... SELECT 鋪到目標日期範圍。
+
+VERSION = 5
+NAME = 'schedule_templates'
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS schedule_templates (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        weeks INTEGER NOT NULL CHECK (weeks BETWEEN 1 AND 12),
+        created_by VARCHAR(50),
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS schedule_template_cells (
+        template_id INTEGER NOT NULL REFERENCES schedule_templates (id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        -- 相對模板第一個週一的天數（0 .. weeks * 7 - 1）
+        day_offset INTEGER NOT NULL,
+        shift_name VARCHAR(50) NOT NULL,
+        shift_description TEXT,
+        PRIMARY KEY (template_id, user_id, day_offset)
+    )
+    """,
+]
@@ -0,0 +1,24 @@
+# 排班列表的篩選與 keyset 分頁索引
+#
+# 排序鍵 (nickname, schedule_date, id) 跨 users / schedules 兩張表，無法由單一索引直接提供順序；
+# 每頁由日期範圍索引（0001）限定掃描範圍，keyset 條件 + LIMIT 使排序為 top-N，
+# 頁數再深也不需要像 OFFSET 一樣跳過前面的行。這裡補上新篩選條件使用的索引。
+
+VERSION = 6
+NAME = 'schedule_list_filters'
+
+# CREATE INDEX CONCURRENTLY 不能在事務中執行，逐條 autocommit
+TRANSACTIONAL = False
+
+STATEMENTS = [
+    # 按班別篩選：shift_name = ANY(...) AND schedule_date BETWEEN ...
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schedules_shift_name_schedule_date
+        ON schedules (shift_name, schedule_date)
+    """,
+    # 按部門篩選
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_department_id
+        ON users (department_id)
+    """,
+]
@@ -0,0 +1,237 @@
+# schedules 按 schedule_date 做聲明式範圍分區（每月一個分區 + DEFAULT 分區）
+#
+# 步驟：舊表改名為 schedules_unpartitioned（索引加 _old 後綴），以相同欄位建立分區表，
+# 按數據範圍建立月分區後複製數據，再重建索引，並把舊表上的觸發器和外鍵搬到新表。
+# 分區表的主鍵必須包含分區鍵，因此改為 (id, schedule_date)；若有其他表以外鍵引用 schedules.id，
+# 或有視圖依賴 schedules，遷移會中止，需先手動處理。舊表保留作備份，確認無誤後可手動 DROP。
+#
+# 需要 PostgreSQL 13+（分區表上的 BEFORE ROW 觸發器）。
+# 之後由 `flask db-partitions`（建議每日 cron）建立未來的分區並分離過期分區。
+
+VERSION = 7
+NAME = 'partition_schedules'
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    # 建立某月分區；DEFAULT 分區中已落入該月的行先搬到新分區，否則 ATTACH 會失敗。
+    # 直接搬動分區中的行不會觸發 schedules 上的語句級觸發器（版本戳 / 變更日誌不受影響）
+    """
+    CREATE OR REPLACE FUNCTION create_schedule_partition(p_month DATE) RETURNS TEXT
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        start_date DATE := date_trunc('month', p_month)::date;
+        end_date DATE := (date_trunc('month', p_month) + interval '1 month')::date;
+        part_name TEXT := 'schedules_p' || to_char(start_date, 'YYYY_MM');
+    BEGIN
+        IF to_regclass(part_name) IS NOT NULL THEN
+            RETURN NULL;
+        END IF;
+
+        EXECUTE format('CREATE TABLE %I (LIKE schedules INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part_name);
+        IF to_regclass('schedules_default') IS NOT NULL THEN
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM schedules_default WHERE schedule_date >= %L AND schedule_date < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                start_date, end_date, part_name
+            );
+        END IF;
+        EXECUTE format(
+            'ALTER TABLE schedules ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            part_name, start_date, end_date
+        );
+        RETURN part_name;
+    END
+    $$
+    """,
+
+    # 確保從本月起 months_ahead 個月的分區都已存在，返回新建的分區名稱
+    """
+    CREATE OR REPLACE FUNCTION ensure_schedule_partitions(months_ahead INTEGER) RETURNS SETOF TEXT
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        month DATE;
+        created TEXT;
+    BEGIN
+        FOR month IN
+            SELECT generate_series(date_trunc('month', current_date),
+                                   date_trunc('month', current_date) + make_interval(months => months_ahead),
+                                   interval '1 month')::date
+        LOOP
+            created := create_schedule_partition(month);
+            IF created IS NOT NULL THEN
+                RETURN NEXT created;
+            END IF;
+        END LOOP;
+    END
+    $$
+    """,
+
+    # 分離整月早於 before 的分區（分離後成為獨立的表，不再出現在 schedules 查詢中），返回表名
+    """
+    CREATE OR REPLACE FUNCTION detach_schedule_partitions(before DATE) RETURNS SETOF TEXT
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        part RECORD;
+    BEGIN
+        FOR part IN
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'schedules'::regclass
+            AND c.relname ~ '^schedules_p[0-9]{4}_[0-9]{2}$'
+            AND (to_date(substring(c.relname FROM 12), 'YYYY_MM') + interval '1 month')::date <= before
+            ORDER BY c.relname
+        LOOP
+            EXECUTE format('ALTER TABLE schedules DETACH PARTITION %I', part.relname);
+            RETURN NEXT part.relname;
+        END LOOP;
+    END
+    $$
+    """,
+
+    # 前置檢查
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'schedules'::regclass) THEN
+            RAISE EXCEPTION 'schedules is already partitioned';
+        END IF;
+        IF EXISTS (SELECT 1 FROM pg_constraint WHERE confrelid = 'schedules'::regclass AND contype = 'f') THEN
+            RAISE EXCEPTION 'foreign keys reference schedules; drop them before partitioning';
+        END IF;
+        IF EXISTS (
+            SELECT 1 FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            WHERE d.refobjid = 'schedules'::regclass AND r.ev_class <> 'schedules'::regclass
+        ) THEN
+            RAISE EXCEPTION 'views depend on schedules; drop and recreate them around this migration';
+        END IF;
+    END
+    $$
+    """,
+
+    "LOCK TABLE schedules IN ACCESS EXCLUSIVE MODE",
+    "ALTER TABLE schedules RENAME TO schedules_unpartitioned",
+
+    # 索引名稱在 schema 內唯一，舊表的索引加 _old 後綴，新表沿用原名
+    """
+    DO $$
+    DECLARE
+        idx RECORD;
+    BEGIN
+        FOR idx IN
+            SELECT indexrelid::regclass::text AS name
+            FROM pg_index
+            WHERE indrelid = 'schedules_unpartitioned'::regclass
+        LOOP
+            EXECUTE format('ALTER INDEX %s RENAME TO %I', idx.name, idx.name || '_old');
+        END LOOP;
+    END
+    $$
+    """,
+
+    """
+    CREATE TABLE schedules (
+        LIKE schedules_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS,
+        PRIMARY KEY (id, schedule_date)
+    ) PARTITION BY RANGE (schedule_date)
+    """,
+
+    # id：serial 序列改為由新表擁有；identity 欄位（分區表不支持）改用獨立序列
+    """
+    DO $$
+    DECLARE
+        seq TEXT;
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid = 'schedules_unpartitioned'::regclass AND attname = 'id' AND attidentity <> ''
+        ) THEN
+            CREATE SEQUENCE IF NOT EXISTS schedules_partitioned_id_seq OWNED BY schedules.id;
+            ALTER TABLE schedules ALTER COLUMN id SET DEFAULT nextval('schedules_partitioned_id_seq');
+            PERFORM setval('schedules_partitioned_id_seq',
+                           COALESCE((SELECT max(id) FROM schedules_unpartitioned), 0) + 1, false);
+        ELSE
+            seq := pg_get_serial_sequence('schedules_unpartitioned', 'id');
+            IF seq IS NOT NULL THEN
+                EXECUTE format('ALTER SEQUENCE %s OWNED BY schedules.id', seq);
+            END IF;
+        END IF;
+    END
+    $$
+    """,
+
+    "CREATE TABLE schedules_default PARTITION OF schedules DEFAULT",
+
+    # 為現有數據範圍和未來 3 個月建立月分區
+    """
+    DO $$
+    DECLARE
+        first_month DATE;
+        month DATE;
+    BEGIN
+        SELECT date_trunc('month', min(schedule_date))::date INTO first_month FROM schedules_unpartitioned;
+        FOR month IN
+            SELECT generate_series(COALESCE(first_month, date_trunc('month', current_date)::date),
+                                   (date_trunc('month', current_date) + interval '3 months')::date,
+                                   interval '1 month')::date
+        LOOP
+            PERFORM create_schedule_partition(month);
+        END LOOP;
+    END
+    $$
+    """,
+
+    "INSERT INTO schedules SELECT * FROM schedules_unpartitioned",
+
+    # 重建索引（在分區表上建立，會自動建立到每個分區）
+    """
+    CREATE INDEX idx_schedules_schedule_date
+        ON schedules (schedule_date) INCLUDE (user_id, shift_name)
+    """,
+    """
+    CREATE INDEX idx_schedules_user_name_snapshot_date
+        ON schedules (user_name_snapshot, schedule_date)
+    """,
+    """
+    CREATE UNIQUE INDEX uq_schedules_user_id_schedule_date
+        ON schedules (user_id, schedule_date)
+    """,
+    """
+    CREATE INDEX idx_schedules_shift_name_schedule_date
+        ON schedules (shift_name, schedule_date)
+    """,
+
+    # 觸發器（版本戳、變更日誌、班別驗證等）與外鍵搬到新表，保留停用狀態
+    """
+    DO $$
+    DECLARE
+        trg RECORD;
+        fk RECORD;
+    BEGIN
+        FOR trg IN
+            SELECT tgname, tgenabled, pg_get_triggerdef(oid) AS def
+            FROM pg_trigger
+            WHERE tgrelid = 'schedules_unpartitioned'::regclass AND NOT tgisinternal
+        LOOP
+            EXECUTE format('DROP TRIGGER %I ON schedules_unpartitioned', trg.tgname);
+            EXECUTE regexp_replace(trg.def, ' ON \\S*schedules_unpartitioned ', ' ON schedules ');
+            IF trg.tgenabled = 'D' THEN
+                EXECUTE format('ALTER TABLE schedules DISABLE TRIGGER %I', trg.tgname);
+            END IF;
+        END LOOP;
+
+        FOR fk IN
+            SELECT conname, pg_get_constraintdef(oid) AS def
+            FROM pg_constraint
+            WHERE conrelid = 'schedules_unpartitioned'::regclass AND contype = 'f'
+        LOOP
+            EXECUTE format('ALTER TABLE schedules ADD CONSTRAINT %I %s', fk.conname, fk.def);
+        END LOOP;
+    END
+    $$
+    """,
+
+    "ANALYZE schedules",
+]
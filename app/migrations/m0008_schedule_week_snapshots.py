@@ -0,0 +1,23 @@
+# 已鎖定週的響應快照：整週的列表 / 網格響應體以 zlib 壓縮保存，之後讀取直接返回，不再執行 JOIN。
+# 快照以生成時的 ETag（週版本 + 維度版本，見 m0002）為鍵，排班或用戶 / 班別變更後自然失效。
+# UNLOGGED：快照可隨時重建，不需要 WAL，崩潰後清空也無妨。
+
+VERSION = 8
+NAME = 'schedule_week_snapshots'
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE UNLOGGED TABLE IF NOT EXISTS schedule_week_snapshots (
+        week_start DATE NOT NULL,
+        -- 響應類型：list / grid
+        scope TEXT NOT NULL,
+        etag TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        payload BYTEA NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (week_start, scope)
+    )
+    """,
+]
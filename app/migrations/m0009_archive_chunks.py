@@ -0,0 +1,189 @@
+# 冷數據歸檔：早於保留期的 schedules 與 leave_tokens 按月搬到 archive_chunks，
+# 每個 (來源表, 月份) 一行，整月的行以 jsonb 數組保存（大於 2KB 的值由 TOAST 自動壓縮），
+# 熱表和索引只保留近期數據。使用 `flask db-archive` 執行（建議每月由 cron 執行）。
+# 讀取時以 jsonb_populate_recordset(NULL::schedules, rows) 還原為 schedules 的行類型，
+# 見 app/queries.py 的 SCHEDULE_ARCHIVE_SOURCE（請求帶 include_archive 時才合併歸檔數據）。
+
+VERSION = 9
+NAME = 'archive_chunks'
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS archive_chunks (
+        -- 來源表：schedules / leave_tokens
+        source TEXT NOT NULL,
+        month DATE NOT NULL,
+        row_count INTEGER NOT NULL,
+        rows JSONB NOT NULL,
+        archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (source, month)
+    )
+    """,
+
+    # 遞增範圍內各週的版本：數據移出熱表（或進入歸檔）後，列表 / 網格的 ETag 與週快照隨之失效
+    """
+    CREATE OR REPLACE FUNCTION bump_schedule_weeks(from_date DATE, to_date DATE) RETURNS VOID
+    LANGUAGE sql AS $$
+        UPDATE schedule_week_versions
+        SET version = nextval('schedule_version_seq'),
+            updated_at = now()
+        WHERE week_start BETWEEN date_trunc('week', from_date)::date AND to_date
+    $$
+    """,
+
+    # 分離分區不會觸發 schedules 上的觸發器，這裡補上版本遞增（取代 m0007 中的定義）
+    """
+    CREATE OR REPLACE FUNCTION detach_schedule_partitions(before DATE) RETURNS SETOF TEXT
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        part RECORD;
+        month DATE;
+    BEGIN
+        FOR part IN
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'schedules'::regclass
+            AND c.relname ~ '^schedules_p[0-9]{4}_[0-9]{2}$'
+            AND (to_date(substring(c.relname FROM 12), 'YYYY_MM') + interval '1 month')::date <= before
+            ORDER BY c.relname
+        LOOP
+            month := to_date(substring(part.relname FROM 12), 'YYYY_MM');
+            EXECUTE format('ALTER TABLE schedules DETACH PARTITION %I', part.relname);
+            PERFORM bump_schedule_weeks(month, (month + interval '1 month' - interval '1 day')::date);
+            RETURN NEXT part.relname;
+        END LOOP;
+    END
+    $$
+    """,
+
+    # 歸檔早於 before 所在月份的排班，返回每月歸檔的行數。
+    # 先收回已分離的月分區（db-partitions --detach-before），再把熱表中的舊行以 DELETE ... RETURNING 搬出；
+    # DELETE 會照常觸發版本戳與變更日誌，增量同步的客戶端會收到這些行的刪除
+    """
+    CREATE OR REPLACE FUNCTION archive_schedules(before DATE)
+    RETURNS TABLE (month DATE, row_count INTEGER)
+    LANGUAGE plpgsql AS $$
+    #variable_conflict use_column
+    DECLARE
+        cutoff DATE := date_trunc('month', before)::date;
+        chunk_month DATE;
+        moved INTEGER;
+        part TEXT;
+    BEGIN
+        FOR part IN
+            SELECT c.relname
+            FROM pg_class c
+            WHERE c.relname ~ '^schedules_p[0-9]{4}_[0-9]{2}$'
+            AND c.relkind = 'r'
+            AND NOT c.relispartition
+            AND to_date(substring(c.relname FROM 12), 'YYYY_MM') < cutoff
+            ORDER BY c.relname
+        LOOP
+            chunk_month := to_date(substring(part FROM 12), 'YYYY_MM');
+            EXECUTE format(
+                'WITH chunk AS (SELECT count(*)::integer AS n, jsonb_agg(to_jsonb(t)) AS rows FROM %I t), '
+                'saved AS ('
+                '    INSERT INTO archive_chunks AS a (source, month, row_count, rows) '
+                '    SELECT ''schedules'', %L, n, rows FROM chunk WHERE n > 0 '
+                '    ON CONFLICT (source, month) DO UPDATE '
+                '        SET row_count = a.row_count + EXCLUDED.row_count, '
+                '            rows = a.rows || EXCLUDED.rows, '
+                '            archived_at = now()'
+                ') '
+                'SELECT n FROM chunk',
+                part, chunk_month
+            ) INTO moved;
+            EXECUTE format('DROP TABLE %I', part);
+            PERFORM bump_schedule_weeks(chunk_month, (chunk_month + interval '1 month' - interval '1 day')::date);
+
+            month := chunk_month;
+            row_count := moved;
+            RETURN NEXT;
+        END LOOP;
+
+        FOR chunk_month IN
+            SELECT DISTINCT date_trunc('month', s.schedule_date)::date
+            FROM schedules s
+            WHERE s.schedule_date < cutoff
+            ORDER BY 1
+        LOOP
+            WITH moved_rows AS (
+                DELETE FROM schedules s
+                WHERE s.schedule_date >= chunk_month
+                AND s.schedule_date < (chunk_month + interval '1 month')::date
+                RETURNING s.*
+            ),
+            chunk AS (
+                SELECT count(*)::integer AS n, jsonb_agg(to_jsonb(m)) AS rows FROM moved_rows m
+            ),
+            saved AS (
+                INSERT INTO archive_chunks AS a (source, month, row_count, rows)
+                SELECT 'schedules', chunk_month, n, rows FROM chunk WHERE n > 0
+                ON CONFLICT (source, month) DO UPDATE
+                    SET row_count = a.row_count + EXCLUDED.row_count,
+                        rows = a.rows || EXCLUDED.rows,
+                        archived_at = now()
+            )
+            SELECT n INTO moved FROM chunk;
+
+            -- 已清空的月分區直接刪除
+            part := 'schedules_p' || to_char(chunk_month, 'YYYY_MM');
+            IF to_regclass(part) IS NOT NULL THEN
+                EXECUTE format('DROP TABLE %I', part);
+            END IF;
+
+            month := chunk_month;
+            row_count := moved;
+            RETURN NEXT;
+        END LOOP;
+    END
+    $$
+    """,
+
+    # 歸檔 before 之前建立的請假令牌（令牌 30 分鐘後即失效，保留期之前的都已處理或過期）
+    """
+    CREATE OR REPLACE FUNCTION archive_leave_tokens(before TIMESTAMPTZ)
+    RETURNS TABLE (month DATE, row_count INTEGER)
+    LANGUAGE plpgsql AS $$
+    #variable_conflict use_column
+    DECLARE
+        chunk_month DATE;
+        moved INTEGER;
+    BEGIN
+        FOR chunk_month IN
+            SELECT DISTINCT date_trunc('month', t.created_at)::date
+            FROM leave_tokens t
+            WHERE t.created_at < before
+            ORDER BY 1
+        LOOP
+            WITH moved_rows AS (
+                DELETE FROM leave_tokens t
+                WHERE t.created_at < before
+                AND t.created_at >= chunk_month
+                AND t.created_at < (chunk_month + interval '1 month')
+                RETURNING t.*
+            ),
+            chunk AS (
+                SELECT count(*)::integer AS n, jsonb_agg(to_jsonb(m)) AS rows FROM moved_rows m
+            ),
+            saved AS (
+                INSERT INTO archive_chunks AS a (source, month, row_count, rows)
+                SELECT 'leave_tokens', chunk_month, n, rows FROM chunk WHERE n > 0
+                ON CONFLICT (source, month) DO UPDATE
+                    SET row_count = a.row_count + EXCLUDED.row_count,
+                        rows = a.rows || EXCLUDED.rows,
+                        archived_at = now()
+            )
+            SELECT n INTO moved FROM chunk;
+
+            month := chunk_month;
+            row_count := moved;
+            RETURN NEXT;
+        END LOOP;
+    END
+    $$
+    """,
+]
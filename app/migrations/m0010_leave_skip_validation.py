@@ -0,0 +1,45 @@
+# 請假寫入跳過班別 / 用戶驗證：批准請假時原本以 ALTER TABLE ... DISABLE TRIGGER 停用驗證觸發器，
+# 這會對 schedules 加 ACCESS EXCLUSIVE 鎖，直到請求事務提交（期間所有排班讀寫都被阻塞）。
+# 這裡為 trg_validate_shift_name_and_user 加上 WHEN 條件：事務內設置
+# app.skip_schedule_validation = 'on'（set_config(..., true)，只在本事務有效）時不執行驗證，不需要任何表鎖。
+# 觸發器定義不在本倉庫中，按 pg_get_triggerdef 的結果重建，保留原有的啟用狀態。
+
+VERSION = 10
+NAME = 'leave_skip_validation'
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    DO $$
+    DECLARE
+        trg RECORD;
+    BEGIN
+        SELECT tgenabled, pg_get_triggerdef(oid) AS def INTO trg
+        FROM pg_trigger
+        WHERE tgrelid = 'schedules'::regclass
+        AND tgname = 'trg_validate_shift_name_and_user'
+        AND NOT tgisinternal;
+
+        IF trg.def IS NULL THEN
+            RAISE NOTICE 'trg_validate_shift_name_and_user not found, nothing to do';
+            RETURN;
+        END IF;
+        IF trg.def ~ ' WHEN \\(' THEN
+            RAISE NOTICE 'trg_validate_shift_name_and_user already has a WHEN condition, left unchanged';
+            RETURN;
+        END IF;
+
+        DROP TRIGGER trg_validate_shift_name_and_user ON schedules;
+        EXECUTE regexp_replace(
+            trg.def,
+            ' EXECUTE (FUNCTION|PROCEDURE) ',
+            ' WHEN (current_setting(''app.skip_schedule_validation'', true) IS DISTINCT FROM ''on'') EXECUTE \\1 '
+        );
+        IF trg.tgenabled = 'D' THEN
+            ALTER TABLE schedules DISABLE TRIGGER trg_validate_shift_name_and_user;
+        END IF;
+    END
+    $$
+    """,
+]
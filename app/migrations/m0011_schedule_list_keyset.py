@@ -0,0 +1,18 @@
+# 排班列表 keyset 分頁的 (schedule_date, id) 索引（0006 只說明了排序鍵無法由單一索引提供）
+#
+# 列表按 (nickname, schedule_date, id) 排序，nickname 在 users 上；在 schedules 這一側，
+# 日期範圍內按 (schedule_date, id) 有序讀取，keyset 條件中的 (schedule_date, id) 也可由索引直接比較。
+# 在分區表（見 0007）上建立，PostgreSQL 會自動建立到每個月分區，之後新建的分區也會自動帶上。
+# 分區表不支持 CONCURRENTLY：建立期間阻塞排班寫入，請在低峰時段執行。
+
+VERSION = 11
+NAME = 'schedule_list_keyset'
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_schedules_schedule_date_id
+        ON schedules (schedule_date, id)
+    """,
+]
@@ -0,0 +1,539 @@
+# queries.py
+# 熱點查詢註冊表：路由以 key 引用，PostgresDBManager.execute_named() 會在每條連線上
+# server-side prepare，之後的呼叫直接重用執行計劃（統計見 db_manager.prepared_stats()）
+
+# 排班列表的欄位與 JOIN（列表 / 增量同步共用）
+# 欄位名即響應的鍵名（配合 row_factory='dict'），userID 需加引號保留大小寫
+SCHEDULE_SELECT = """
+        SELECT
+            s.id,
+            s.schedule_date,
+            s.user_id,
+            s.shift_name,
+            -- 優先使用 shift_types.description
+            COALESCE(st.description, s.shift_description) as shift_description,
+            s.user_name_snapshot,
+            s.week_number,
+            s.year,
+            s.created_by,
+            s.created_at,
+            s.updated_at,
+            s.remark,
+            u.userID AS "userID",
+            u.username,
+            u.nickname,
+            u.email,
+            u.phone,
+            u.department_id,
+            u.role_level
+            FROM schedules s
+            LEFT JOIN users u ON s.user_id = u.id
+            LEFT JOIN shift_types st ON s.shift_name = st.shift_name AND st.is_active = TRUE"""
+
+# 複製週 / 輪班模板的計劃行（POST /api/schedules/copy）：
+# 來源為實際排班中從 source_start 起的 period 天，或保存的模板；目標日按相對 target_monday 的偏移對應
+SCHEDULE_COPY_PLAN = """
+        WITH source_cells AS (
+            SELECT s.user_id, (s.schedule_date - %(source_start)s::date) AS day_offset,
+                   s.shift_name, s.shift_description
+            FROM schedules s
+            WHERE %(template_id)s::integer IS NULL
+            AND s.schedule_date >= %(source_start)s::date
+            AND s.schedule_date < %(source_start)s::date + %(period)s::integer
+            AND s.shift_name IS NOT NULL
+            UNION ALL
+            SELECT c.user_id, c.day_offset, c.shift_name, c.shift_description
+            FROM schedule_template_cells c
+            WHERE c.template_id = %(template_id)s::integer
+        ),
+        target_days AS (
+            SELECT day::date AS schedule_date,
+                   (day::date - %(target_monday)s::date) %% %(period)s::integer AS day_offset
+            FROM generate_series(%(target_start)s::date, %(target_end)s::date, interval '1 day') AS day
+        ),
+        planned AS (
+            SELECT sc.user_id, td.schedule_date, sc.shift_name, sc.shift_description,
+                   u.userID AS user_code, u.nickname
+            FROM target_days td
+            JOIN source_cells sc USING (day_offset)
+            JOIN users u ON u.id = sc.user_id
+            WHERE u.status > 1
+            AND (%(user_codes)s::text[] IS NULL OR u.userID = ANY(%(user_codes)s::text[]))
+            AND (%(department_id)s::integer IS NULL OR u.department_id = %(department_id)s::integer)
+        )"""
+
+# 週編輯的最小差異（PUT /api/schedules/week/<week>）：
+# desired 為客戶端提交的格子（shift_name 為 NULL 表示清空），current 為該週範圍內用戶的現有排班
+# （只含有班別的行；只有請假備註的行不屬於網格編輯範圍）。replace 為真時 desired 之外的現有排班也刪除。
+# 帶備註的行（請假審批寫入的 remark）清空時不刪除，只清除班別（action 為 clear），請假記錄保留。
+SCHEDULE_WEEK_DIFF = """
+        WITH desired AS (
+            SELECT u.id AS user_id, u.nickname, d.schedule_date, NULLIF(d.shift_name, '') AS shift_name
+            FROM unnest(%(user_codes)s::text[], %(dates)s::date[], %(shifts)s::text[])
+                AS d(user_code, schedule_date, shift_name)
+            JOIN users u ON u.userID = d.user_code
+        ),
+        scope_users AS (
+            SELECT user_id FROM desired
+            UNION
+            SELECT u.id FROM users u WHERE u.userID = ANY(%(scope_users)s::text[])
+        ),
+        current AS (
+            SELECT s.id, s.user_id, s.schedule_date, s.shift_name, s.remark
+            FROM schedules s
+            WHERE s.schedule_date BETWEEN %(week_start)s::date AND %(week_end)s::date
+            AND s.user_id IN (SELECT user_id FROM scope_users)
+            AND s.shift_name IS NOT NULL
+        ),
+        diff AS (
+            SELECT CASE WHEN c.remark IS NULL THEN 'delete' ELSE 'clear' END AS action,
+                   c.id, c.user_id, c.schedule_date,
+                   c.shift_name AS old_shift_name, NULL::text AS shift_name, NULL::text AS nickname
+            FROM current c
+            LEFT JOIN desired d USING (user_id, schedule_date)
+            WHERE (d.user_id IS NULL AND %(replace)s::boolean)
+            OR (d.user_id IS NOT NULL AND d.shift_name IS NULL)
+            UNION ALL
+            SELECT CASE WHEN c.id IS NULL THEN 'insert' ELSE 'update' END, c.id, d.user_id, d.schedule_date,
+                   c.shift_name, d.shift_name, d.nickname
+            FROM desired d
+            LEFT JOIN current c USING (user_id, schedule_date)
+            WHERE d.shift_name IS NOT NULL
+            AND c.shift_name IS DISTINCT FROM d.shift_name
+        )"""
+
+# 排班範圍的篩選、排序與 keyset 分頁（schedules.range / schedules.range_archive 共用）
+# 沒有暱稱的排班排在最後（NULLS LAST，與未分頁時的 ORDER BY u.nickname 相同）；
+# after_nickname 為 NULL 表示上一頁停在這些行之中
+SCHEDULE_RANGE_FILTER = """
+            WHERE s.schedule_date BETWEEN %(start)s AND %(end)s
+            AND (%(nickname)s::text IS NULL OR u.nickname ILIKE %(nickname)s)
+            AND (%(department_ids)s::integer[] IS NULL OR u.department_id = ANY(%(department_ids)s::integer[]))
+            AND (%(shift_names)s::text[] IS NULL OR s.shift_name = ANY(%(shift_names)s::text[]))
+            AND (%(user_codes)s::text[] IS NULL OR u.userID = ANY(%(user_codes)s::text[]))
+            AND (%(after_id)s::integer IS NULL
+                 OR (%(after_nickname)s::text IS NULL
+                     AND u.nickname IS NULL
+                     AND (s.schedule_date, s.id) > (%(after_date)s::date, %(after_id)s::integer))
+                 OR (%(after_nickname)s::text IS NOT NULL
+                     AND (u.nickname > %(after_nickname)s::text
+                          OR u.nickname IS NULL
+                          OR (u.nickname = %(after_nickname)s::text
+                              AND (s.schedule_date, s.id) > (%(after_date)s::date, %(after_id)s::integer)))))
+            ORDER BY u.nickname NULLS LAST, s.schedule_date, s.id
+            LIMIT %(limit)s
+    """
+
+# 熱表與歸檔（見 migrations/m0009）合併後的排班行，取代 "FROM schedules s"；
+# 歸檔按月保存，只展開與 start..end 重疊的月份
+SCHEDULE_ARCHIVE_SOURCE = """FROM (
+                SELECT * FROM schedules
+                WHERE schedule_date BETWEEN %(start)s AND %(end)s
+                UNION ALL
+                SELECT r.*
+                FROM archive_chunks c
+                CROSS JOIN LATERAL jsonb_populate_recordset(NULL::schedules, c.rows) r
+                WHERE c.source = 'schedules'
+                AND c.month BETWEEN date_trunc('month', %(start)s::date)::date AND %(end)s::date
+                AND r.schedule_date BETWEEN %(start)s AND %(end)s
+            ) s"""
+
+# 月表網格（/api/schedules/grid）：與列表同一 JOIN，只取組裝網格所需的欄位
+SCHEDULE_GRID_SELECT = """
+        SELECT
+            s.id,
+            s.schedule_date,
+            s.user_id,
+            s.shift_name,
+            COALESCE(st.description, s.shift_description) as shift_description,
+            s.remark,
+            s.user_name_snapshot,
+            u.userID,
+            u.username,
+            u.nickname,
+            u.email,
+            u.phone,
+            u.department_id,
+            u.role_level
+            FROM schedules s
+            LEFT JOIN users u ON s.user_id = u.id
+            LEFT JOIN shift_types st ON s.shift_name = st.shift_name AND st.is_active = TRUE"""
+
+SCHEDULE_GRID_FILTER = """
+            WHERE s.schedule_date BETWEEN %(start)s AND %(end)s
+            AND (%(nickname)s::text IS NULL OR u.nickname ILIKE %(nickname)s)
+            ORDER BY u.nickname, s.user_id, s.schedule_date
+    """
+
+NAMED_QUERIES = {
+    # 排班範圍查詢（列表頁）；各篩選條件為 NULL 時不篩選
+    # keyset 分頁：按 (nickname NULLS LAST, schedule_date, id) 排序，after_* 為上一頁最後一行，limit 為 NULL 時不分頁
+    # 注意：串流輸出走 DECLARE 服務端游標，游標查詢無法使用 prepared statement
+    'schedules.range': SCHEDULE_SELECT + SCHEDULE_RANGE_FILTER,
+
+    # 同上，並包含已歸檔的排班（請求帶 include_archive=true 時使用）
+    'schedules.range_archive': SCHEDULE_SELECT.replace('FROM schedules s', SCHEDULE_ARCHIVE_SOURCE)
+                               + SCHEDULE_RANGE_FILTER,
+
+    # 按 id 取回排班（增量同步返回變更後的最新內容）；日期範圍用於分區裁剪
+    'schedules.by_ids': SCHEDULE_SELECT + """
+            WHERE s.id = ANY(%s)
+            AND s.schedule_date BETWEEN %s AND %s
+    """,
+
+    # 增量同步：快照 xmin 以下的事務都已結束，游標推進到此為止；pruned 為已清理的最大事務 ID
+    'schedules.changes_horizon': """
+        SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS horizon,
+               (SELECT max_txid::text FROM schedule_changes_pruned) AS pruned
+    """,
+
+    # 增量同步：游標 (txid, id) 之後、horizon 之前的變更；start 為 NULL 時不按日期篩選
+    'schedules.changes_since': """
+        SELECT id, txid::text AS txid, op, schedule_id, schedule_date, old_schedule_date
+            FROM schedule_changes
+            WHERE (txid, id) > (%(txid)s::xid8, %(id)s::bigint)
+            AND txid < %(horizon)s::xid8
+            AND (%(start)s::date IS NULL
+                 OR schedule_date BETWEEN %(start)s AND %(end)s
+                 OR old_schedule_date BETWEEN %(start)s AND %(end)s)
+            ORDER BY txid, id
+            LIMIT %(limit)s
+    """,
+
+    # 月表網格（/api/schedules/grid），_archive 為包含歸檔的版本
+    'schedules.grid': SCHEDULE_GRID_SELECT + SCHEDULE_GRID_FILTER,
+    'schedules.grid_archive': SCHEDULE_GRID_SELECT.replace('FROM schedules s', SCHEDULE_ARCHIVE_SOURCE)
+                              + SCHEDULE_GRID_FILTER,
+
+    # 排班範圍版本戳（ETag）：範圍內各 ISO 週的版本 + 用戶 / 班別維度版本，由觸發器維護
+    'schedules.range_version': """
+        SELECT week_start::text, version, row_count
+            FROM schedule_week_versions
+            WHERE week_start BETWEEN date_trunc('week', %s::date)::date AND %s::date
+        UNION ALL
+        SELECT name, version, 0
+            FROM schedule_dimension_versions
+        ORDER BY 1
+    """,
+
+    # 排班鎖定狀態（多個日期一次查詢，第 7 欄為 is_locked）；只在 SCHEDULE_LOCK_DB_CHECK 核對時使用
+    'schedules.lock_status_many': """
+        SELECT d.day, ls.*
+        FROM unnest(%s::date[]) AS d(day)
+        CROSS JOIN LATERAL get_schedule_lock_status(d.day, %s, %s, %s, %s) AS ls
+    """,
+
+    # 創建排班：用戶、班別驗證和寫入在一條語句中完成，(user_id, schedule_date) 唯一索引保證不重複
+    # 返回 (新 id, 用戶是否有效, 班別是否有效)，新 id 為 NULL 時按後兩欄判斷原因，兩者皆真表示已有排班
+    'schedules.create': """
+        WITH input AS (
+            SELECT %(userID)s::text AS user_code,
+                   %(schedule_date)s::date AS schedule_date,
+                   %(shift_name)s::text AS shift_name,
+                   %(shift_description)s::text AS shift_description,
+                   %(created_by)s::text AS created_by
+        ),
+        target_user AS (
+            SELECT u.id, u.nickname
+            FROM users u
+            JOIN input i ON u.userID = i.user_code
+            WHERE u.status > 1
+        ),
+        shift AS (
+            SELECT st.shift_name
+            FROM shift_types st
+            JOIN input i ON st.shift_name = i.shift_name
+            WHERE st.is_active = TRUE
+        ),
+        inserted AS (
+            INSERT INTO schedules (
+                user_id, schedule_date, shift_name, shift_description,
+                user_name_snapshot, week_number, year, created_by
+            )
+            SELECT tu.id,
+                   i.schedule_date,
+                   i.shift_name,
+                   COALESCE(NULLIF(i.shift_description, ''), i.shift_name),
+                   left(tu.nickname, 100),
+                   EXTRACT(WEEK FROM i.schedule_date)::integer,
+                   EXTRACT(YEAR FROM i.schedule_date)::integer,
+                   i.created_by
+            FROM input i
+            CROSS JOIN target_user tu
+            CROSS JOIN shift
+            ON CONFLICT (user_id, schedule_date) DO NOTHING
+            RETURNING id, user_id
+        )
+        SELECT (SELECT id FROM inserted),
+               (SELECT user_id FROM inserted),
+               EXISTS (SELECT 1 FROM target_user),
+               EXISTS (SELECT 1 FROM shift)
+    """,
+
+    # 複製預覽（dry run）：每個計劃格子及其處理方式 insert / exists / locked / invalid_shift
+    'schedules.copy_preview': SCHEDULE_COPY_PLAN + """
+        SELECT p.user_code AS "userID", p.nickname, p.schedule_date, p.shift_name,
+               e.id AS existing_id, e.shift_name AS existing_shift_name,
+               CASE
+                   WHEN p.schedule_date = ANY(%(locked_dates)s::date[]) THEN 'locked'
+                   WHEN NOT EXISTS (
+                       SELECT 1 FROM shift_types st
+                       WHERE st.shift_name = p.shift_name AND st.is_active = TRUE
+                   ) THEN 'invalid_shift'
+                   WHEN e.id IS NOT NULL THEN 'exists'
+                   ELSE 'insert'
+               END AS action
+        FROM planned p
+        LEFT JOIN schedules e ON e.user_id = p.user_id AND e.schedule_date = p.schedule_date
+        ORDER BY p.nickname, p.schedule_date
+    """,
+
+    # 複製寫入：跳過已鎖定日期、停用班別和已有排班（ON CONFLICT），返回新插入的行
+    'schedules.copy_apply': SCHEDULE_COPY_PLAN + """
+        INSERT INTO schedules (
+            user_id, schedule_date, shift_name, shift_description,
+            user_name_snapshot, week_number, year, created_by
+        )
+        SELECT p.user_id,
+               p.schedule_date,
+               p.shift_name,
+               COALESCE(NULLIF(p.shift_description, ''), p.shift_name),
+               left(p.nickname, 100),
+               EXTRACT(WEEK FROM p.schedule_date)::integer,
+               EXTRACT(YEAR FROM p.schedule_date)::integer,
+               %(created_by)s
+        FROM planned p
+        WHERE p.schedule_date <> ALL(%(locked_dates)s::date[])
+        AND EXISTS (
+            SELECT 1 FROM shift_types st
+            WHERE st.shift_name = p.shift_name AND st.is_active = TRUE
+        )
+        ON CONFLICT (user_id, schedule_date) DO NOTHING
+        RETURNING id, user_id, schedule_date, shift_name
+    """,
+
+    # 保存輪班模板：從 source_start 起 weeks 週的實際排班，返回 (模板 id, 格子數)
+    'schedules.template_create': """
+        WITH template AS (
+            INSERT INTO schedule_templates (name, weeks, created_by)
+            VALUES (%(name)s, %(weeks)s, %(created_by)s)
+            RETURNING id
+        ),
+        cells AS (
+            INSERT INTO schedule_template_cells (template_id, user_id, day_offset, shift_name, shift_description)
+            SELECT t.id, s.user_id, s.schedule_date - %(source_start)s::date, s.shift_name, s.shift_description
+            FROM template t
+            CROSS JOIN schedules s
+            JOIN users u ON u.id = s.user_id
+            WHERE s.schedule_date >= %(source_start)s::date
+            AND s.schedule_date < %(source_start)s::date + %(weeks)s::integer * 7
+            AND s.shift_name IS NOT NULL
+            AND (%(user_codes)s::text[] IS NULL OR u.userID = ANY(%(user_codes)s::text[]))
+            AND (%(department_id)s::integer IS NULL OR u.department_id = %(department_id)s::integer)
+            RETURNING 1
+        )
+        SELECT (SELECT id FROM template), (SELECT count(*) FROM cells)
+    """,
+
+    'schedules.templates': """
+        SELECT t.id, t.name, t.weeks, t.created_by, t.created_at, count(c.template_id) AS cells
+        FROM schedule_templates t
+        LEFT JOIN schedule_template_cells c ON c.template_id = t.id
+        GROUP BY t.id
+        ORDER BY t.created_at DESC
+    """,
+
+    'schedules.template_by_id': "SELECT id, name, weeks FROM schedule_templates WHERE id = %s",
+
+    # 週編輯預覽：最小差異（insert / update / delete）
+    'schedules.week_diff': SCHEDULE_WEEK_DIFF + """
+        SELECT action, id, user_id, schedule_date, old_shift_name, shift_name
+        FROM diff
+        ORDER BY schedule_date, user_id
+    """,
+
+    # 週編輯寫入：刪除、清除班別與 upsert 在同一條語句中完成（三者的 (user_id, schedule_date) 不重疊）
+    'schedules.week_apply': SCHEDULE_WEEK_DIFF + """,
+        deleted AS (
+            DELETE FROM schedules s
+            USING diff
+            WHERE diff.action = 'delete'
+            AND s.id = diff.id
+            AND s.schedule_date = diff.schedule_date
+            AND s.schedule_date BETWEEN %(week_start)s::date AND %(week_end)s::date
+            RETURNING s.id, s.user_id, s.schedule_date
+        ),
+        cleared AS (
+            UPDATE schedules s
+            SET shift_name = NULL,
+                shift_description = NULL,
+                updated_at = now()
+            FROM diff
+            WHERE diff.action = 'clear'
+            AND s.id = diff.id
+            AND s.schedule_date = diff.schedule_date
+            AND s.schedule_date BETWEEN %(week_start)s::date AND %(week_end)s::date
+            RETURNING s.id, s.user_id, s.schedule_date
+        ),
+        upserted AS (
+            INSERT INTO schedules (
+                user_id, schedule_date, shift_name, shift_description,
+                user_name_snapshot, week_number, year, created_by
+            )
+            SELECT diff.user_id,
+                   diff.schedule_date,
+                   diff.shift_name,
+                   diff.shift_name,
+                   left(diff.nickname, 100),
+                   EXTRACT(WEEK FROM diff.schedule_date)::integer,
+                   EXTRACT(YEAR FROM diff.schedule_date)::integer,
+                   %(created_by)s
+            FROM diff
+            WHERE diff.action IN ('insert', 'update')
+            ON CONFLICT (user_id, schedule_date) DO UPDATE
+                SET shift_name = EXCLUDED.shift_name,
+                    shift_description = EXCLUDED.shift_description,
+                    updated_at = now()
+            RETURNING id, user_id, schedule_date, shift_name
+        )
+        SELECT 'delete' AS op, id, user_id, schedule_date, NULL::text AS shift_name FROM deleted
+        UNION ALL
+        SELECT 'clear', id, user_id, schedule_date, NULL::text FROM cleared
+        UNION ALL
+        SELECT 'upsert', id, user_id, schedule_date, shift_name FROM upserted
+    """,
+
+    # 週版本戳（見 migrations/m0002），同一事務中寫入後讀取即為寫入後的版本
+    'schedules.week_version': "SELECT version, row_count FROM schedule_week_versions WHERE week_start = %s",
+
+    # 排班統計（/api/schedules/stats）的格子：天數相對第一個參數，按日期排序（只讀 schedule_date 索引）
+    'schedules.stats_cells': """
+        SELECT user_id, schedule_date - %s::date AS day, shift_name
+        FROM schedules
+        WHERE schedule_date BETWEEN %s AND %s
+        AND shift_name IS NOT NULL
+        AND user_id IS NOT NULL
+        ORDER BY schedule_date
+    """,
+
+    # 請假令牌（免登錄的審批頁面）：30 分鐘內建立的令牌
+    'leave.validate_token': """
+        SELECT token, leave_data, action, review_reason, processed_at, created_at
+        FROM leave_tokens
+        WHERE token = %s
+        AND created_at >= now() - make_interval(mins => %s)
+    """,
+
+    # 請假審批：把請假備註寫到範圍內的現有排班（日期範圍作為常量條件，只掃描涉及的月分區）
+    'leave.mark_schedules': """
+        UPDATE schedules s
+        SET remark = %s,
+            updated_at = now()
+        WHERE s.schedule_date BETWEEN %s AND %s
+        AND EXISTS (
+            SELECT 1
+            FROM get_leave_dates(%s::jsonb, %s, %s, %s) fld
+            WHERE s.schedule_date = fld.leave_date
+            AND s.user_name_snapshot = fld.nickname
+        )
+    """,
+
+    # 請假審批後受影響的排班（提交後推送）
+    'leave.affected_schedules': """
+        SELECT s.id, s.schedule_date, s.user_id, s.shift_name, s.remark
+        FROM schedules s
+        LEFT JOIN users u ON u.id = s.user_id
+        WHERE s.schedule_date BETWEEN %s AND %s
+        AND s.schedule_date IN (
+            SELECT leave_date FROM get_leave_dates(%s::jsonb, %s, %s, %s)
+        )
+        AND (s.user_name_snapshot = %s OR u.nickname = %s)
+    """,
+
+    'users.by_ids': "SELECT id, userID, nickname, department_id FROM users WHERE id = ANY(%s)",
+    'users.ids_by_department': "SELECT id FROM users WHERE department_id = ANY(%s)",
+
+    # SSO 登入
+    'auth.user_by_username': """
+        SELECT userID, username, nickname, role_level, status, last_login
+        FROM users
+        WHERE username = %s
+        AND status != 1
+    """,
+
+    # 密碼登入
+    'auth.user_by_password': """
+        SELECT userID, username, nickname, role_level, status, last_login
+        FROM users
+        WHERE username = %s
+        AND password_hash = crypt(%s, password_hash)
+        AND status != 1
+    """,
+
+    # 班別存在檢查
+    'shift_types.active': "SELECT shift_name, description FROM shift_types WHERE is_active = TRUE ORDER BY id",
+    'shift_types.active_by_name': "SELECT id, shift_name, description FROM shift_types WHERE shift_name = %s AND is_active = TRUE",
+    'shift_types.active_by_name_excluding_id': "SELECT id FROM shift_types WHERE shift_name = %s AND id != %s AND is_active = TRUE",
+    'shift_types.by_id': "SELECT id, shift_name FROM shift_types WHERE id = %s",
+}
+
+
+# 用戶列表的排序欄位白名單（不在其中的回退為 ID）
+USERS_LIST_SORT_FIELDS = ['ID', 'userID', 'username', 'nickname', 'email', 'role_level', 'status', 'created_at', 'last_login']
+
+
+def users_list_queries(exclude_username=None, search='', role=None, status=None,
+                       sort_by='ID', sort_order='asc', limit=10, offset=0):
+    """
+    用戶列表的 (總數查詢, 參數), (分頁查詢, 參數)。
+    篩選條件可選，SQL 隨條件組合變化，因此不註冊為命名查詢；路由與 db-explain 共用此函數。
+    """
+    where_conditions = []
+    query_params = []
+
+    # 🎯 排除當前用戶自己的資料
+    if exclude_username:
+        where_conditions.append("username != %s")
+        query_params.append(exclude_username)
+
+    if search:
+        where_conditions.append("(userID ILIKE %s OR username ILIKE %s OR nickname ILIKE %s OR email ILIKE %s)")
+        search_term = f"%{search}%"
+        query_params.extend([search_term, search_term, search_term, search_term])
+
+    if role is not None:
+        where_conditions.append("role_level = %s")
+        query_params.append(role)
+
+    if status is not None:
+        where_conditions.append("status = %s")
+        query_params.append(status)
+
+    where_clause = ""
+    if where_conditions:
+        where_clause = "WHERE " + " AND ".join(where_conditions)
+
+    if sort_by not in USERS_LIST_SORT_FIELDS:
+        sort_by = 'ID'
+    if sort_order.lower() not in ['asc', 'desc']:
+        sort_order = 'asc'
+
+    count_query = f"SELECT COUNT(*) AS total FROM users {where_clause}"
+    data_query = f"""
+        SELECT
+            userID AS "userID",
+            username,
+            nickname,
+            email,
+            role_level,
+            status,
+            last_login,
+            created_at,
+            updated_at,
+            webhook
+        FROM users
+        {where_clause}
+        ORDER BY {sort_by} {sort_order}
+        LIMIT %s OFFSET %s
+    """
+    return (count_query, tuple(query_params)), (data_query, tuple(query_params) + (limit, offset))
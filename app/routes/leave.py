@@ -7,6 +7,8 @@ from flask_jwt_extended import get_jwt_identity, jwt_required
 import json
 
 from app.database import PostgresDBManager
+from app.socket.schedule_events import publish_schedule_changes, schedule_cell
+from app.utils.week_snapshots import invalidate_week_snapshots
 from config import Config
 
 
@@ -322,21 +324,7 @@ def is_valid_token(token):
     try:
         db_manager = PostgresDBManager.get_instance()
         
-        query = """
-                SELECT 
-                    token,
-                    leave_data,
-                    action,
-                    review_reason,
-                    processed_at,
-                    created_at
-                FROM leave_tokens
-                WHERE token = %s
-                AND created_at >= now() - interval '%s minutes'
-            """
-
-        # 使用 execute_query
-        result = db_manager.execute_query(query, (token, 30), fetch=True)
+        result = db_manager.execute_named('leave.validate_token', (token, 30))
         
         # 檢查結果
         if not result or len(result) == 0:
@@ -410,158 +398,175 @@ def approve_leave(token):
     try:
         db_manager = PostgresDBManager.get_instance()
         
-        # 1. 更新 leave_tokens 表
-        query = """ 
-        UPDATE leave_tokens
-        SET action = 'approved',
-            processed_at = COALESCE(processed_at, now())
-        WHERE token = %s
-        AND (processed_at IS NULL OR processed_at >= now() - interval '%s minutes')
-        RETURNING *
-        """
-        
-        result = db_manager.execute_returning(query, (token, 30))
-        
-        if not result:
-            return jsonify({
-                'success': False,
-                'error': '批准失敗，可能申請不存在或已處理'
-            }), 400
-        
-        # 2. 提取數據（假設 result 是元組或列表）
-        # 注意：需要根據實際數據結構調整索引
-        token_row = result[0] if isinstance(result, list) else result
-        leave_data = token_row[1]  # 假設第二個欄位是 leave_data
-        processed_at = token_row[4]  # 假設第五個欄位是 processed_at
-        
-        nickname = leave_data.get('nickname')
-        leave_type = leave_data.get('leaveType')
-        time_period = leave_data.get('time')
-        dates_data = leave_data.get('dates')  # 這可能是單個日期或多個日期
-        
-        print(f'✅ 批准請假申請成功 - 用戶: {nickname}, 類型: {leave_type}')
+        # 審批、排班寫入和請假行的 set_config(..., true) 必須在同一個事務中：
+        # 請求級連線關閉（POSTGRES_REQUEST_SCOPED=false）時也明確開啟事務
+        with db_manager.transaction():
+            # 1. 更新 leave_tokens 表
+            query = """ 
+            UPDATE leave_tokens
+            SET action = 'approved',
+                processed_at = COALESCE(processed_at, now())
+            WHERE token = %s
+            AND (processed_at IS NULL OR processed_at >= now() - interval '%s minutes')
+            RETURNING *
+            """
         
-        # 3. 更新 schedules 表
-        try:
-            import json
+            result = db_manager.execute_returning(query, (token, 30))
+        
+            if not result:
+                return jsonify({
+                    'success': False,
+                    'error': '批准失敗，可能申請不存在或已處理'
+                }), 400
+        
+            # 2. 提取數據（假設 result 是元組或列表）
+            # 注意：需要根據實際數據結構調整索引
+            token_row = result[0] if isinstance(result, list) else result
+            leave_data = token_row[1]  # 假設第二個欄位是 leave_data
+            processed_at = token_row[4]  # 假設第五個欄位是 processed_at
+        
+            nickname = leave_data.get('nickname')
+            leave_type = leave_data.get('leaveType')
+            time_period = leave_data.get('time')
+            dates_data = leave_data.get('dates')  # 這可能是單個日期或多個日期
+        
+            print(f'✅ 批准請假申請成功 - 用戶: {nickname}, 類型: {leave_type}')
+        
+            # 3. 更新 schedules 表（寫入失敗的請假日期在響應中返回）
+            failed_dates = []
+            try:
+                # 使用 SAVEPOINT：排班更新失敗時只回滾這一段，不影響請假審批本身
+                with db_manager.savepoint():
+                    import json
             
-            # 創建 JSON remark
-            remark_json = {
-                'leave_type': leave_type,
-                'time_period': time_period
-            }
+                    # 創建 JSON remark
+                    remark_json = {
+                        'leave_type': leave_type,
+                        'time_period': time_period
+                    }
             
-            # 使用您的 get_leave_dates 函數
-            update_query = """
-            UPDATE schedules s
-            SET remark = %s,
-                updated_at = now()
-            WHERE EXISTS (
-                SELECT 1 
-                FROM get_leave_dates(%s::jsonb, %s, %s, %s) fld
-                WHERE s.schedule_date = fld.leave_date
-                AND s.user_name_snapshot = fld.nickname
-            )
-            """
+                    # 先取請假日期的範圍：作為常量條件加入下面的查詢，schedules 分區表只掃描涉及的月分區
+                    first_date, last_date = db_manager.execute_query(
+                        "SELECT min(leave_date), max(leave_date) FROM get_leave_dates(%s::jsonb, %s, %s, %s)",
+                        (json.dumps(dates_data), nickname, leave_type, time_period)
+                    )[0]
             
-            rows_updated = db_manager.execute_query(
-                update_query,
-                (
-                    json.dumps(remark_json, ensure_ascii=False),
-                    json.dumps(dates_data),
-                    nickname,
-                    leave_type,
-                    time_period
-                ),
-                fetch=False
-            )
+                    # 使用您的 get_leave_dates 函數（queries.py 的 leave.mark_schedules）
+                    rows_updated = db_manager.execute_named(
+                        'leave.mark_schedules',
+                        (
+                            json.dumps(remark_json, ensure_ascii=False),
+                            first_date,
+                            last_date,
+                            json.dumps(dates_data),
+                            nickname,
+                            leave_type,
+                            time_period
+                        ),
+                        fetch=False
+                    )
             
-            if rows_updated == 0 or rows_updated is None:
-                print(f"⚠️  沒有找到匹配的記錄，嘗試插入新記錄...")
+                    if rows_updated == 0 or rows_updated is None:
+                        print(f"⚠️  沒有找到匹配的記錄，嘗試插入新記錄...")
                 
-                # 確保觸發器已停用
-                disable_trigger_query = """
-                ALTER TABLE schedules DISABLE TRIGGER trg_validate_shift_name_and_user
-                """
-                db_manager.execute_query(disable_trigger_query, fetch=False)
+                        # 請假行不做班別驗證：只對本事務設置旗標（見 migrations/m0010），不再 ALTER TABLE 停用觸發器，
+                        # 避免 ACCESS EXCLUSIVE 鎖在請求結束前阻塞所有排班讀寫
+                        db_manager.execute_query(
+                            "SELECT set_config('app.skip_schedule_validation', 'on', true)", fetch=False
+                        )
                 
-                try:
-                    # 插入查詢
-                    insert_query = """
-                    INSERT INTO schedules (
-                        user_id,
-                        schedule_date,
-                        week_number,
-                        year,
-                        remark
-                    ) VALUES (
-                        (SELECT id FROM users WHERE nickname = %s LIMIT 1),
-                        %s::date,
-                        EXTRACT(WEEK FROM %s::date)::integer,
-                        EXTRACT(YEAR FROM %s::date)::integer,
-                        %s::jsonb
-                    )
-                    """
+                        try:
+                            # 插入查詢：該用戶當天已有排班時只更新備註（唯一索引見 migrations/m0004），不再插入重複行
+                            insert_query = """
+                            INSERT INTO schedules (
+                                user_id,
+                                schedule_date,
+                                week_number,
+                                year,
+                                remark
+                            ) VALUES (
+                                (SELECT id FROM users WHERE nickname = %s LIMIT 1),
+                                %s::date,
+                                EXTRACT(WEEK FROM %s::date)::integer,
+                                EXTRACT(YEAR FROM %s::date)::integer,
+                                %s::jsonb
+                            )
+                            ON CONFLICT (user_id, schedule_date) DO UPDATE
+                                SET remark = EXCLUDED.remark,
+                                    updated_at = now()
+                            """
                     
-                    # 處理多個日期
-                    if isinstance(dates_data, list):
-                        inserted_count = 0
-                        for date_str in dates_data:
-                            try:
-                                insert_result = db_manager.execute_query(
+                            # 處理多個日期
+                            if isinstance(dates_data, list):
+                                # 每個日期一個 SAVEPOINT：某一天失敗（例如觸發器拒絕）只跳過該天，其餘日期照常寫入
+                                remark_text = json.dumps(remark_json, ensure_ascii=False)
+                                inserted_count = 0
+                                for date_str in dates_data:
+                                    try:
+                                        with db_manager.savepoint():
+                                            db_manager.execute_query(
+                                                insert_query,
+                                                (nickname, date_str, date_str, date_str, remark_text),
+                                                fetch=False
+                                            )
+                                        inserted_count += 1
+                                    except Exception as date_error:
+                                        failed_dates.append(date_str)
+                                        print(f"❌ 插入請假日期失敗 {date_str}: {date_error}")
+                        
+                                print(f"✅ 總共插入了 {inserted_count} 筆記錄，失敗 {len(failed_dates)} 筆")
+                            else:
+                                # 單個日期
+                                insert_data = db_manager.execute_query(
                                     insert_query,
                                     (
                                         nickname,
-                                        date_str,
-                                        date_str,
-                                        date_str,
+                                        dates_data,  # 單個日期字串
+                                        dates_data,
+                                        dates_data,
                                         json.dumps(remark_json, ensure_ascii=False)
                                     ),
                                     fetch=False
                                 )
-                                if insert_result:
-                                    inserted_count += 1
-                                    print(f"✅ 插入日期 {date_str} 成功")
-                            except Exception as date_error:
-                                print(f"❌ 插入日期 {date_str} 失敗: {date_error}")
-                        
-                        print(f"✅ 總共插入了 {inserted_count} 筆記錄")
-                    else:
-                        # 單個日期
-                        insert_data = db_manager.execute_query(
-                            insert_query,
-                            (
-                                nickname,
-                                dates_data,  # 單個日期字串
-                                dates_data,
-                                dates_data,
-                                json.dumps(remark_json, ensure_ascii=False)
-                            ),
-                            fetch=False
-                        )
-                        print(f"✅ 插入成功: {insert_data}")
+                                print(f"✅ 插入成功: {insert_data}")
                         
-                finally:
-                    # 重新啟用觸發器
-                    enable_trigger_query = """
-                    ALTER TABLE schedules ENABLE TRIGGER trg_validate_shift_name_and_user
-                    """
-                    db_manager.execute_query(enable_trigger_query, fetch=False)
+                        finally:
+                            # 恢復驗證（同一事務中之後的寫入照常驗證）
+                            db_manager.execute_query(
+                                "SELECT set_config('app.skip_schedule_validation', 'off', true)", fetch=False
+                            )
                     
-            else:
-                print(f"✅ 成功更新了 {rows_updated} 筆排班記錄")
+                    else:
+                        print(f"✅ 成功更新了 {rows_updated} 筆排班記錄")
                 
-        except Exception as update_error:
-            print(f"⚠️  更新日程表時發生錯誤: {update_error}")
-            # 不影響主要流程
+                    # 取回受影響的排班，提交後推送到對應週的房間
+                    affected = db_manager.execute_named(
+                        'leave.affected_schedules',
+                        (first_date, last_date, json.dumps(dates_data), nickname, leave_type, time_period,
+                         nickname, nickname)
+                    )
+                    publish_schedule_changes([
+                        schedule_cell('upsert', row[1], row[0], row[2], row[3], row[4])
+                        for row in affected
+                    ])
+                    # 請假可能落在已鎖定的週：該週的快照隨本次審批一起作廢
+                    invalidate_week_snapshots(db_manager, [row[1] for row in affected])
+                
+            except Exception as update_error:
+                print(f"⚠️  更新日程表時發生錯誤: {update_error}")
+                # 不影響主要流程
         
-        # 4. 發送通知
-        send_to_synology_chat_approve(leave_data)
+            # 4. 發送通知：請求事務提交後才發出，外部調用不再延長事務
+            db_manager.on_commit(lambda: send_to_synology_chat_approve(leave_data))
         
-        return jsonify({
-            'success': True,
-            'message': '請假申請已批准'
-        })
+            response = {
+                'success': True,
+                'message': '請假申請已批准'
+            }
+            if failed_dates:
+                response['failed_dates'] = failed_dates
+                response['message'] = f'請假申請已批准，但 {len(failed_dates)} 個日期未能寫入排班'
+            return jsonify(response)
         
     except Exception as e:
         print(f"❌ 批准失敗: {e}")
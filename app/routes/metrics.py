@@ -0,0 +1,66 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+
+from app.database import PostgresDBManager
+from app.utils.auth_utils import admin_required
+
+metrics_bp = Blueprint('metrics', __name__, url_prefix='/api/metrics')
+
+@metrics_bp.route('/', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_metrics():
+    """
+    查看數據庫指標（每條查詢的延遲直方圖、行數、錯誤數、prepared statement 重用情況、連線池狀態），僅限管理員
+    """
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'slow_query_ms': db_manager.metrics.slow_query_ms,
+                'queries': db_manager.metrics.snapshot(),
+                'prepared': db_manager.prepared_stats(),
+                'pool': db_manager.pool_stats()
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@metrics_bp.route('/pool', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_pool_metrics():
+    """
+    查看連線池狀態（大小、閒置、等待中的請求、取得連線等待時間、平均持有時間、疑似洩漏），僅限管理員
+    """
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        return jsonify({
+            'success': True,
+            'data': db_manager.pool_stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@metrics_bp.route('/', methods=['DELETE'])
+@jwt_required()
+@admin_required
+def reset_metrics():
+    """
+    清空查詢指標（例如壓測前），僅限管理員
+    """
+    db_manager = PostgresDBManager.get_instance()
+    db_manager.metrics.reset()
+    return jsonify({
+        'success': True,
+        'message': '指標已清空'
+    }), 200
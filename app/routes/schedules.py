@@ -1,13 +1,58 @@
-from flask import Blueprint, json, request, jsonify
+from flask import Blueprint, Response, json, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date, timedelta
+import base64
 
+import numpy as np
 import psycopg
+from app import analytics
 from app.database import PostgresDBManager
+from app.socket.schedule_events import publish_schedule_changes, schedule_cell
+from app.utils.lock_calendar import LockCalendar, week_start
+from app.utils.serializers import iso_dumps, iso_jsonify
+from app.utils.streaming import stream_json_response
+from app.utils.versioning import not_modified, schedule_range_version, versions_etag, with_etag
+from app.utils.week_snapshots import compose_week_rows, save_week_snapshots, snapshot_weeks, week_etags
 from config import Config
 
 schedules_bp = Blueprint('schedules', __name__, url_prefix='/api/schedules')
 
+# 串流查詢每次從服務端游標取回的行數
+STREAM_ITERSIZE = Config.SCHEDULE_STREAM_ITERSIZE
+
+# 批量創建排班的單次上限
+BATCH_MAX_SCHEDULES = Config.SCHEDULE_BATCH_MAX
+
+# 列表分頁的默認 / 最大每頁行數
+LIST_PAGE_SIZE = Config.SCHEDULE_LIST_PAGE_SIZE
+LIST_MAX_PAGE_SIZE = 5000
+
+# 增量同步單次返回的最大變更數
+CHANGES_PAGE_SIZE = Config.SCHEDULE_CHANGES_PAGE_SIZE
+
+# 排班鎖定日曆（進程內計算，緩存到下一個鎖定時間點）
+lock_calendar = LockCalendar(
+    Config.SCHEDULE_DAYS_BEFORE_LOCK,
+    Config.SCHEDULE_LOCK_TIME,
+    Config.SCHEDULE_WEEKS_AHEAD
+)
+
+# 鎖定範圍查詢最多跨越的天數
+LOCK_STATUS_MAX_DAYS = 366
+
+# 複製週 / 輪班模板單次最多填充的天數，模板最多的週數
+COPY_MAX_DAYS = 92
+TEMPLATE_MAX_WEEKS = 12
+
+# 週編輯單次最多提交的格子數
+WEEK_MAX_CELLS = 5000
+
+# 排班統計：最多跨越的天數、班別工時與夜班配置、已鎖定週的格子緩存
+STATS_MAX_DAYS = 366
+STATS_SHIFT_HOURS = analytics.parse_shift_hours(Config.SCHEDULE_SHIFT_HOURS)
+STATS_NIGHT_SHIFTS = analytics.parse_shift_names(Config.SCHEDULE_NIGHT_SHIFTS)
+stats_cache = analytics.WeekCellCache(Config.SCHEDULE_STATS_CACHE_WEEKS)
+
 # 獲取排班列表
 @schedules_bp.route('/', methods=['GET'])
 @jwt_required()
@@ -21,129 +66,963 @@ def get_all_schedule_data():
 
         # 如果沒有提供日期，默認為當前月份
         if not start_date or not end_date:
-            today = datetime.now()
-            first_day = today.replace(day=1)
-            if today.month == 12:
-                last_day = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                last_day = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+            start_date, end_date = current_month_range()
+
+        # 篩選：department_id / shift_name / userID（用戶編號，不是數字 user_id）可重複或以逗號分隔
+        try:
+            department_ids = [int(value) for value in list_arg('department_id')] or None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'department_id 必須為整數'
+            }), 400
+        shift_names = list_arg('shift_name') or None
+        user_codes = list_arg('userID') or None
+        # 只有明確要求時才合併已歸檔的排班（見 migrations/m0009）
+        include_archive = request.args.get('include_archive', 'false').lower() == 'true'
+
+        # keyset 分頁：帶 limit 或 cursor 時分頁，否則返回整個範圍
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        after = decode_list_cursor(cursor) if cursor else None
+        if cursor and after is None:
+            return jsonify({
+                'success': False,
+                'error': 'cursor 格式錯誤'
+            }), 400
+        if limit is not None or cursor:
+            limit = min(max(limit or LIST_PAGE_SIZE, 1), LIST_MAX_PAGE_SIZE)
+
+        # 版本戳與排班數據在同一條連線的同一個快照（REPEATABLE READ）中讀取：ETag 與響應體一致，
+        # 且整個請求只佔用這一條連線（不再另外綁定請求級連線）；串流結束時由 stream_query 歸還
+        conn = db_manager.snapshot_connection(read_only=True)
+        streaming = False
+        try:
+            # 🎯 條件請求：範圍內數據未變更時直接返回 304，不執行 JOIN
+            with db_manager.using(conn):
+                versions = schedule_range_version(db_manager, start_date, end_date)
+            etag = versions_etag(versions, 'list', start_date, end_date, nickname,
+                                 department_ids, shift_names, user_codes, cursor, limit, include_archive)
+            cached = not_modified(etag)
+            if cached is not None:
+                return cached
+
+            # 排班範圍查詢（見 app/queries.py），各篩選為空時不篩選
+            query_key = 'schedules.range_archive' if include_archive else 'schedules.range'
+            query = db_manager.get_named_query(query_key)
+            params = {
+                'start': start_date,
+                'end': end_date,
+                'nickname': f'%{nickname}%' if nickname else None,
+                'department_ids': department_ids,
+                'shift_names': shift_names,
+                'user_codes': user_codes,
+                'after_nickname': after[0] if after else None,
+                'after_date': after[1] if after else None,
+                'after_id': after[2] if after else None,
+                'limit': limit,
+            }
+            
+            # 🎯 不帶篩選 / 分頁時：範圍內已鎖定的完整週（例如月表中過去的週）從週快照取回，
+            # 只查詢其餘日期；沒有快照的已鎖定週從本次查詢結果生成
+            filtered = (nickname or department_ids or shift_names or user_codes or cursor
+                        or limit is not None or include_archive)
+            with db_manager.using(conn):
+                locked_weeks = [] if filtered else locked_full_weeks(start_date, end_date)
+            if locked_weeks:
+                first, last = (datetime.strptime(str(value), '%Y-%m-%d').date() for value in (start_date, end_date))
+                with db_manager.using(conn):
+                    rows, pending = compose_week_rows(
+                        db_manager, 'list_rows', first, last, week_etags(versions, 'list_rows', locked_weeks),
+                        lambda start, end: db_manager.execute_named(
+                            query_key, dict(params, start=start, end=end), row_factory='dict'
+                        ),
+                        day_of=lambda row: row['schedule_date']
+                    )
+                    # 快照週與查詢結果合併後按列表的順序排序（快照中的日期已是 ISO 字串）；
+                    # 暱稱的先後由數據庫的排序規則決定，與 schedules.range 的 ORDER BY 一致
+                    ranks = nickname_ranks(db_manager, [row['nickname'] for row in rows])
+                rows.sort(key=lambda row: (row['nickname'] is None, ranks.get(row['nickname'], 0),
+                                           str(row['schedule_date']), row['id']))
+                body = iso_dumps({
+                    'success': True,
+                    'data': rows,
+                    'count': len(rows),
+                    'date_range': {
+                        'start_date': start_date,
+                        'end_date': end_date
+                    },
+                    'search_nickname': nickname
+                }).encode()
+                if pending:
+                    # 快照寫入走主庫的請求級連線：先歸還只讀快照連線，同一時間只佔用一條
+                    db_manager.release_snapshot(conn)
+                    conn = None
+                    save_week_snapshots(db_manager, 'list_rows', pending)
+                return with_etag(Response(body, mimetype='application/json'), etag)
+            
+            # 🎯 使用服務端游標串流輸出，記憶體佔用不隨日期範圍增長
+            # dict_row 直接以欄位名為鍵，日期由 iso_dumps 序列化為 ISO 8601
+            rows = db_manager.stream_query(query, params, itersize=STREAM_ITERSIZE, row_factory='dict',
+                                           conn=conn)
+            
+            # 記錄最後一行，用於生成下一頁的游標
+            last = {}
+            def track(rows):
+                for row in rows:
+                    last['row'] = row
+                    yield row
             
-            start_date = first_day.strftime('%Y-%m-%d')
-            end_date = last_day.strftime('%Y-%m-%d')
+            def tail(count):
+                result = {
+                    'count': count,
+                    'date_range': {
+                        'start_date': start_date,
+                        'end_date': end_date
+                    },
+                    'search_nickname': nickname  # 返回搜索的 nickname
+                }
+                if limit is not None:
+                    # 取滿一頁時才可能還有下一頁
+                    result['next_cursor'] = encode_list_cursor(last['row']) if count == limit else None
+                return result
+            
+            # stream_json_response 會立即取出第一行，連線從此由串流生成器負責歸還
+            streaming = True
+            return with_etag(stream_json_response(
+                track(rows),
+                head={'success': True},
+                tail=tail,
+                dumps=iso_dumps
+            ), etag)
+        finally:
+            if conn is not None and not streaming:
+                db_manager.release_snapshot(conn)
+        
+    except Exception as e:
+        print(f"獲取排班數據錯誤: {str(e)}")  # 調試用
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        # 構建基礎查詢
-        query = """
-        SELECT
-            s.id,
-            s.schedule_date,
-            s.user_id,
-            s.shift_name,
-            -- 優先使用 shift_types.description
-            COALESCE(st.description, s.shift_description) as shift_description,
-            s.user_name_snapshot,
-            s.week_number,
-            s.year,
-            s.created_by,
-            s.created_at,
-            s.updated_at,
-            s.remark,
-            u.userID,
-            u.username,
-            u.nickname,
-            u.email,
-            u.phone,
-            u.department_id,
-            u.role_level
-            FROM schedules s
-            LEFT JOIN users u ON s.user_id = u.id
-            LEFT JOIN shift_types st ON s.shift_name = st.shift_name AND st.is_active = TRUE
-            WHERE s.schedule_date BETWEEN %s AND %s
-        """
+# 月表網格：用戶維度、日期維度各輸出一次，班別以字典編碼為整數矩陣，備註單獨稀疏輸出
+@schedules_bp.route('/grid', methods=['GET'])
+@jwt_required()
+def get_schedule_grid():
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        nickname = request.args.get('nickname')
+        include_archive = request.args.get('include_archive', 'false').lower() == 'true'
+
+        if not start_date or not end_date:
+            start_date, end_date = current_month_range()
+
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': '日期格式錯誤，應為 YYYY-MM-DD'
+            }), 400
+
+        if end < start:
+            return jsonify({
+                'success': False,
+                'error': 'end_date 不能早於 start_date'
+            }), 400
+
+        # 版本戳與網格數據在同一條連線的同一個快照（REPEATABLE READ）中讀取：ETag 與響應體一致，
+        # 不會出現版本來自主庫、數據來自副本的情況
+        conn = db_manager.snapshot_connection(read_only=True)
+        try:
+            with db_manager.using(conn):
+                versions = schedule_range_version(db_manager, start, end)
+                etag = versions_etag(versions, 'grid', start, end, nickname, include_archive)
+                cached = not_modified(etag)
+                if cached is not None:
+                    return cached
+
+                # 不帶篩選時，範圍內已鎖定的完整週從週快照取回，只查詢其餘日期
+                locked_weeks = [] if nickname or include_archive else locked_full_weeks(start, end)
+                pending = None
+                if locked_weeks:
+                    rows, pending = compose_week_rows(
+                        db_manager, 'grid_rows', start, end, week_etags(versions, 'grid_rows', locked_weeks),
+                        lambda first, last: db_manager.execute_named(
+                            'schedules.grid', {'start': first, 'end': last, 'nickname': None}, read_only=True
+                        ),
+                        day_of=lambda row: row[1],
+                        restore=lambda row: (row[0], date.fromisoformat(row[1]), *row[2:])
+                    )
+                    # 與 schedules.grid 相同的順序：暱稱（NULL 在後，先後由數據庫的排序規則決定）、用戶、日期
+                    ranks = nickname_ranks(db_manager, [row[9] for row in rows])
+                    rows.sort(key=lambda row: (row[9] is None, ranks.get(row[9], 0),
+                                               row[2] is None, row[2] or 0, row[1]))
+                else:
+                    rows = db_manager.execute_named(
+                        'schedules.grid_archive' if include_archive else 'schedules.grid',
+                        {'start': start, 'end': end, 'nickname': f'%{nickname}%' if nickname else None},
+                        read_only=True
+                    )
+        finally:
+            db_manager.release_snapshot(conn)
+
+        grid = build_schedule_grid(rows, start, end)
+        grid['success'] = True
+        grid['search_nickname'] = nickname
+        if pending:
+            # 快照寫入走主庫的請求級連線（只讀快照連線已歸還）
+            save_week_snapshots(db_manager, 'grid_rows', pending)
+        return with_etag(jsonify(grid), etag), 200
+
+    except Exception as e:
+        print(f"獲取排班網格錯誤: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# 網格中用戶維度的欄位（順序即 users.rows 中每行的順序）
+GRID_USER_FIELDS = ['user_id', 'userID', 'username', 'nickname', 'email', 'phone', 'department_id', 'role_level']
+
+def build_schedule_grid(rows, start, end):
+    """
+    將 schedules.grid 的查詢結果組裝為列式網格：
+    - users: 欄位名 + 每個用戶一行
+    - dates: 日期範圍內的每一天
+    - shifts: 班別字典，matrix 中的整數即其下標（null 表示當天沒有排班）
+    - ids: 與 matrix 同形的排班 id（編輯時使用）
+    - remarks: 只列出有備註的格子 [用戶下標, 日期下標, 備註]
+    """
+    day_count = (end - start).days + 1
+    dates = [(start + timedelta(days=offset)).isoformat() for offset in range(day_count)]
+
+    user_rows = []
+    user_index = {}
+    shift_codes = {}
+    shifts = []
+    matrix = []
+    ids = []
+    remarks = []
+    duplicates = 0
+
+    for (schedule_id, schedule_date, user_id, shift_name, shift_description, remark,
+         user_name_snapshot, userID, username, user_nickname, email, phone,
+         department_id, role_level) in rows:
+        row_index = user_index.get(user_id)
+        if row_index is None:
+            row_index = user_index[user_id] = len(user_rows)
+            # 用戶已刪除時以排班上的名稱快照補上暱稱
+            user_rows.append([user_id, userID, username, user_nickname or user_name_snapshot,
+                              email, phone, department_id, role_level])
+            matrix.append([None] * day_count)
+            ids.append([None] * day_count)
+
+        code = shift_codes.get(shift_name)
+        if code is None:
+            code = shift_codes[shift_name] = len(shifts)
+            shifts.append({'shift_name': shift_name, 'description': shift_description})
+
+        day = (schedule_date - start).days
+        if matrix[row_index][day] is not None:
+            # 同一用戶同一天多筆排班時保留第一筆
+            duplicates += 1
+            continue
+        matrix[row_index][day] = code
+        ids[row_index][day] = schedule_id
+        if remark:
+            remarks.append([row_index, day, remark])
+
+    return {
+        'date_range': {
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat()
+        },
+        'users': {
+            'fields': GRID_USER_FIELDS,
+            'rows': user_rows
+        },
+        'dates': dates,
+        'shifts': shifts,
+        'matrix': matrix,
+        'ids': ids,
+        'remarks': remarks,
+        'count': sum(1 for row in ids for cell in row if cell is not None),
+        'duplicates': duplicates
+    }
+
+# 排班統計：每日各班別人數、每人工時 / 夜班 / 週末負荷、連續上班天數與分佈（見 app/analytics.py）
+@schedules_bp.route('/stats', methods=['GET'])
+@jwt_required()
+def get_schedule_stats():
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+
+        if not start_date or not end_date:
+            start_date, end_date = current_month_range()
+
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+            department_ids = [int(value) for value in list_arg('department_id')] or None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': '日期格式應為 YYYY-MM-DD，department_id 必須為整數'
+            }), 400
+
+        if end < start or (end - start).days >= STATS_MAX_DAYS:
+            return jsonify({
+                'success': False,
+                'error': f'日期範圍無效（最多 {STATS_MAX_DAYS} 天）'
+            }), 400
+
+        # 版本同時用於 ETag 和已鎖定週的緩存鍵；版本與排班格子在同一條連線的同一個快照中讀取
+        conn = db_manager.snapshot_connection(read_only=True)
+        try:
+            with db_manager.using(conn):
+                versions = schedule_range_version(db_manager, start, end)
+                etag = versions_etag(versions, 'stats', start, end, department_ids)
+                cached = not_modified(etag)
+                if cached is not None:
+                    return cached
+
+                week_versions = {
+                    date.fromisoformat(key): version
+                    for key, version, _ in (versions or []) if key[:1].isdigit()
+                }
+                mondays = analytics.week_mondays(start, end)
+                # 週日已鎖定即整週已鎖定；沒有版本表時不緩存
+                sundays = find_locked_dates([monday + timedelta(days=6) for monday in mondays])
+                locked_weeks = set() if versions is None else {
+                    monday for monday in mondays if monday + timedelta(days=6) in sundays
+                }
+
+                def load_rows(first, last):
+                    return db_manager.execute_named('schedules.stats_cells', (first, first, last),
+                                                    read_only=True)
+
+                weeks = analytics.load_week_cells(load_rows, mondays, week_versions, locked_weeks, stats_cache)
+
+                user_filter = None
+                if department_ids:
+                    user_filter = np.array([
+                        row[0] for row in db_manager.execute_named(
+                            'users.ids_by_department', (department_ids,), read_only=True
+                        )
+                    ], dtype=np.int64)
+
+                user_ids, names, matrix = analytics.build_matrix(weeks, start, end, user_filter)
+                stats = analytics.schedule_stats(names, matrix, start, STATS_SHIFT_HOURS, STATS_NIGHT_SHIFTS,
+                                                 Config.SCHEDULE_DEFAULT_SHIFT_HOURS)
+
+                users = {
+                    row[0]: row for row in db_manager.execute_named(
+                        'users.by_ids', (user_ids.tolist(),), read_only=True
+                    )
+                } if len(user_ids) else {}
+                descriptions = dict(db_manager.execute_named('shift_types.active', read_only=True))
+        finally:
+            db_manager.release_snapshot(conn)
+
+        user_rows = []
+        for index, user_id in enumerate(user_ids.tolist()):
+            _, user_code, nickname, department_id = users.get(user_id, (user_id, None, None, None))
+            user_rows.append([
+                user_id, user_code, nickname, department_id,
+                int(stats['days_worked'][index]),
+                float(stats['hours'][index]),
+                int(stats['nights'][index]),
+                int(stats['weekend_days'][index]),
+                int(stats['longest_streak'][index]),
+                int(stats['current_streak'][index]),
+            ])
+
+        alert_days = Config.SCHEDULE_STREAK_ALERT_DAYS
+        return with_etag(jsonify({
+            'success': True,
+            'date_range': {
+                'start_date': start.isoformat(),
+                'end_date': end.isoformat()
+            },
+            'dates': [(start + timedelta(days=offset)).isoformat() for offset in range(matrix.shape[1])],
+            'shifts': [
+                {
+                    'shift_name': name,
+                    'description': descriptions.get(name),
+                    'hours': STATS_SHIFT_HOURS.get(name, Config.SCHEDULE_DEFAULT_SHIFT_HOURS),
+                    'night': name in STATS_NIGHT_SHIFTS
+                }
+                for name in names.tolist()
+            ],
+            # coverage[班別下標][日期下標] 為當天該班別人數
+            'coverage': stats['coverage'].tolist(),
+            'headcount': stats['headcount'].tolist(),
+            'users': {
+                'fields': STATS_USER_FIELDS,
+                'rows': user_rows
+            },
+            'fairness': stats['fairness'],
+            'streak_alerts': [
+                {'user_id': row[0], 'nickname': row[2], 'longest_streak': row[8]}
+                for row in user_rows if row[8] > alert_days
+            ]
+        }), etag), 200
+
+    except Exception as e:
+        print(f"獲取排班統計錯誤: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# 統計中用戶維度的欄位（順序即 users.rows 中每行的順序）
+STATS_USER_FIELDS = ['user_id', 'userID', 'nickname', 'department_id', 'days_worked', 'hours',
+                     'nights', 'weekend_days', 'longest_streak', 'current_streak']
+
+# 增量同步：返回游標之後新增 / 修改的排班（最新內容）與刪除的 tombstone
+# 不帶 since 時只返回當前游標：客戶端應先取得游標，再載入整個範圍，之後以游標輪詢
+@schedules_bp.route('/changes', methods=['GET'])
+@jwt_required()
+def get_schedule_changes():
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        since = request.args.get('since')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+
+        if since:
+            cursor = parse_changes_cursor(since)
+            if cursor is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'since 游標格式錯誤'
+                }), 400
+        else:
+            cursor = None
+
+        if bool(start_date) != bool(end_date):
+            return jsonify({
+                'success': False,
+                'error': 'start_date 與 end_date 需同時提供'
+            }), 400
+
+        # 變更日誌與快照都在主庫讀取，兩次查詢需看到同一份事務狀態
+        horizon, pruned = db_manager.execute_named('schedules.changes_horizon')[0]
+
+        if cursor is None:
+            return jsonify({
+                'success': True,
+                'cursor': f'{horizon}-0',
+                'has_more': False,
+                'upserts': [],
+                'deletes': []
+            }), 200
+
+        if pruned is not None and cursor[0] <= int(pruned):
+            # 游標之後的部分變更已被清理，無法保證完整
+            return jsonify({
+                'success': False,
+                'error': '游標已過期，請重新載入排班範圍',
+                'code': 'CURSOR_EXPIRED'
+            }), 410
+
+        changes = db_manager.execute_named('schedules.changes_since', {
+            'txid': str(cursor[0]),
+            'id': cursor[1],
+            'horizon': horizon,
+            'start': start_date or None,
+            'end': end_date or None,
+            'limit': CHANGES_PAGE_SIZE,
+        }, row_factory='dict')
+
+        # 同一排班多次變更時以最後一次為準
+        latest = {}
+        for change in changes:
+            latest[change['schedule_id']] = change
+
+        upsert_ids = [schedule_id for schedule_id, change in latest.items() if change['op'] != 'D']
+        upsert_dates = [change['schedule_date'] for change in latest.values() if change['op'] != 'D']
+        upserts = db_manager.execute_named(
+            'schedules.by_ids', (upsert_ids, min(upsert_dates), max(upsert_dates)), row_factory='dict'
+        ) if upsert_ids else []
+
+        deletes = [
+            {'id': schedule_id, 'schedule_date': change['schedule_date']}
+            for schedule_id, change in latest.items() if change['op'] == 'D'
+        ]
+
+        # 未取滿一頁表示 horizon 之前的變更已全部返回，游標直接推進到 horizon
+        has_more = len(changes) >= CHANGES_PAGE_SIZE
+        if has_more:
+            next_cursor = f"{changes[-1]['txid']}-{changes[-1]['id']}"
+        else:
+            next_cursor = f'{horizon}-0'
+
+        return iso_jsonify({
+            'success': True,
+            'cursor': next_cursor,
+            'has_more': has_more,
+            'upserts': upserts,
+            'deletes': deletes
+        }), 200
+
+    except Exception as e:
+        print(f"獲取排班變更錯誤: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def parse_changes_cursor(value):
+    """解析 '<txid>-<id>' 形式的游標，格式錯誤時返回 None"""
+    txid, sep, change_id = value.partition('-')
+    if not sep or not txid.isdigit() or not change_id.isdigit():
+        return None
+    return int(txid), int(change_id)
+
+# 複製週 / 輪班模板：把來源週（或保存的 N 週模板）以一條 INSERT ... SELECT 鋪到目標範圍
+# 已鎖定的日期、停用的班別和已有排班都會跳過；dry_run 時只返回每個格子的處理方式
+@schedules_bp.route('/copy', methods=['POST'])
+@jwt_required()
+def copy_schedules():
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        data = request.get_json(silent=True) or {}
+        current_user = get_current_nickname()
         
-        params = [start_date, end_date]
+        error = invalid_copy_scope(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error,
+                'code': 'INVALID_FIELD'
+            }), 400
+        
+        template_id = data.get('template_id')
+        source_start = parse_iso_date(data.get('source_start'))
+        target_start = parse_iso_date(data.get('target_start'))
+        if target_start is None or (template_id is None and source_start is None):
+            return jsonify({
+                'success': False,
+                'error': '需要 target_start，以及 source_start 或 template_id（日期格式 YYYY-MM-DD）',
+                'code': 'MISSING_FIELD'
+            }), 400
+        
+        if template_id is not None:
+            template = db_manager.execute_named('schedules.template_by_id', (template_id,))
+            if not template:
+                return jsonify({
+                    'success': False,
+                    'error': f'模板不存在: {template_id}',
+                    'code': 'TEMPLATE_NOT_FOUND'
+                }), 404
+            weeks = template[0][2]
+            source_start = None
+        else:
+            weeks = data.get('weeks', 1)
+            if not isinstance(weeks, int) or not 1 <= weeks <= TEMPLATE_MAX_WEEKS:
+                return jsonify({
+                    'success': False,
+                    'error': f'weeks 需為 1 到 {TEMPLATE_MAX_WEEKS} 的整數',
+                    'code': 'INVALID_WEEKS'
+                }), 400
+            # 來源與目標都對齊到週一，星期幾一一對應
+            source_start = week_start(source_start)
         
-        # 如果有 nickname 參數，添加篩選條件
-        if nickname:
-            query += " AND u.nickname ILIKE %s"
-            params.append(f'%{nickname}%')
+        target_monday = week_start(target_start)
+        target_end = parse_iso_date(data.get('target_end')) or target_monday + timedelta(days=weeks * 7 - 1)
+        if target_end < target_start or (target_end - target_start).days >= COPY_MAX_DAYS:
+            return jsonify({
+                'success': False,
+                'error': f'目標日期範圍無效（最多 {COPY_MAX_DAYS} 天）',
+                'code': 'INVALID_RANGE'
+            }), 400
         
-        # 添加排序
-        query += " ORDER BY u.nickname, s.schedule_date"
+        target_days = [target_start + timedelta(days=offset)
+                       for offset in range((target_end - target_start).days + 1)]
+        params = {
+            'template_id': template_id,
+            'source_start': source_start,
+            'period': weeks * 7,
+            'target_monday': target_monday,
+            'target_start': target_start,
+            'target_end': target_end,
+            'user_codes': data.get('users') or None,
+            'department_id': data.get('department_id'),
+            'locked_dates': sorted(find_locked_dates(target_days)),
+            'created_by': current_user[:50] if current_user else current_user,
+        }
         
-        result = db_manager.execute_query(query, params)
+        if data.get('dry_run'):
+            cells = db_manager.execute_named('schedules.copy_preview', params,
+                                             read_only=True, row_factory='dict')
+            summary = {'insert': 0, 'exists': 0, 'locked': 0, 'invalid_shift': 0}
+            for cell in cells:
+                summary[cell['action']] += 1
+            return iso_jsonify({
+                'success': True,
+                'dry_run': True,
+                'data': {
+                    'summary': summary,
+                    'cells': cells
+                }
+            }), 200
         
-        schedules = []
-        # print(f"查詢結果數量: {len(result)}")
-        # print(f"查詢result: {result}")
-        # print(f"查詢參數: {result[5]}")
-        for row in result:
-            schedule = {
-                'id': row[0],
-                'schedule_date': row[1].isoformat() if row[1] else None,
-                'user_id': row[2],
-                'shift_name': row[3],
-                'shift_description': row[4],
-                'user_name_snapshot': row[5],
-                'week_number': row[6],
-                'year': row[7],
-                'created_by': row[8],
-                'created_at': row[9].isoformat() if row[9] else None,
-                'updated_at': row[10].isoformat() if row[10] else None,
-                'remark': row[11] ,
-                'userID': row[12],
-                'username': row[13],
-                'nickname': row[14],
-                'email': row[15],
-                'phone': row[16],
-                'department_id': row[17],
-                'role_level': row[18]
+        inserted = db_manager.execute_named('schedules.copy_apply', params)
+        
+        publish_schedule_changes([
+            schedule_cell('upsert', row[2], row[0], row[1], row[3]) for row in inserted
+        ])
+        
+        return jsonify({
+            'success': True,
+            'message': '排班複製完成',
+            'data': {
+                'inserted': len(inserted),
+                'target_range': {
+                    'start_date': target_start.isoformat(),
+                    'end_date': target_end.isoformat()
+                }
             }
-            schedules.append(schedule)
+        }), 201
+        
+    except Exception as e:
+        print(f"複製排班錯誤: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# 週編輯：提交整週的目標狀態（或若干格子的變更），服務端計算最小差異並在一個事務中
+# 以一條語句批量 upsert / 刪除，返回寫入後的週版本戳
+@schedules_bp.route('/week/<week>', methods=['PUT'])
+@jwt_required()
+def apply_schedule_week(week):
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        monday = parse_iso_week(week)
+        if monday is None:
+            return jsonify({
+                'success': False,
+                'error': '週格式錯誤，應為 YYYY-Www（例如 2026-W42）',
+                'code': 'INVALID_WEEK'
+            }), 400
+        sunday = monday + timedelta(days=6)
+        
+        data = request.get_json() or {}
+        current_user = get_current_nickname()
+        cells = data.get('cells') or []
+        # replace：cells 為整週目標狀態，範圍內用戶未列出的排班會被刪除；否則只套用列出的格子
+        replace = bool(data.get('replace'))
+        scope_users = [str(code) for code in data.get('users') or []]
+        
+        if len(cells) > WEEK_MAX_CELLS:
+            return jsonify({
+                'success': False,
+                'error': f'單週最多 {WEEK_MAX_CELLS} 個格子',
+                'code': 'TOO_MANY_CELLS'
+            }), 400
+        
+        user_codes, dates, shifts = [], [], []
+        seen = set()
+        for index, cell in enumerate(cells):
+            user_code = cell.get('userID')
+            cell_date = parse_iso_date(cell.get('schedule_date'))
+            shift_name = cell.get('shift_name') or None
+            if not user_code or cell_date is None or not monday <= cell_date <= sunday:
+                error = '缺少 userID 或 schedule_date 不在該週內'
+            elif shift_name is not None and len(shift_name) > 50:
+                error = f'班別名稱過長 (最多50字符): {shift_name}'
+            elif (str(user_code), cell_date) in seen:
+                error = '重複的用戶和日期'
+            else:
+                error = None
+            if error:
+                return jsonify({
+                    'success': False,
+                    'error': f'第 {index + 1} 個格子無效: {error}',
+                    'code': 'INVALID_CELL'
+                }), 400
+            seen.add((str(user_code), cell_date))
+            user_codes.append(str(user_code))
+            dates.append(cell_date)
+            shifts.append(shift_name)
+        
+        if find_locked_dates([monday]):
+            return jsonify({
+                'success': False,
+                'error': f'排班已鎖定: {week}',
+                'code': 'SCHEDULE_LOCKED'
+            }), 400
+        
+        params = {
+            'user_codes': user_codes,
+            'dates': dates,
+            'shifts': shifts,
+            'scope_users': scope_users,
+            'week_start': monday,
+            'week_end': sunday,
+            'replace': replace,
+            'created_by': current_user[:50] if current_user else current_user,
+        }
+        
+        # 驗證和寫入在請求事務的同一個 SAVEPOINT 中完成：不另外取連線，失敗時整段回滾
+        with db_manager.savepoint():
+            users_rows, shift_rows = db_manager.execute_batch([
+                ("SELECT userID FROM users WHERE userID = ANY(%s::text[]) AND status > 1",
+                 (sorted(set(user_codes) | set(scope_users)),)),
+                ("SELECT shift_name FROM shift_types WHERE shift_name = ANY(%s::text[]) AND is_active = TRUE",
+                 (sorted({shift for shift in shifts if shift}),)),
+            ])
+            unknown_users = sorted((set(user_codes) | set(scope_users)) - {str(row[0]) for row in users_rows})
+            invalid_shifts = sorted({shift for shift in shifts if shift} - {row[0] for row in shift_rows})
+            if unknown_users or invalid_shifts:
+                return jsonify({
+                    'success': False,
+                    'error': '用戶不存在或班別無效，未寫入任何資料',
+                    'code': 'USER_NOT_FOUND' if unknown_users else 'INVALID_SHIFT',
+                    'data': {
+                        'unknown_users': unknown_users,
+                        'invalid_shifts': invalid_shifts
+                    }
+                }), 400
             
+            if data.get('dry_run'):
+                diff = db_manager.execute_named('schedules.week_diff', params, row_factory='dict')
+                return iso_jsonify({
+                    'success': True,
+                    'dry_run': True,
+                    'data': {
+                        'week': week,
+                        'diff': diff
+                    }
+                }), 200
+            
+            changed = db_manager.execute_named('schedules.week_apply', params)
+            version = db_manager.execute_named('schedules.week_version', (monday,))
+            
+            publish_schedule_changes([week_cell(*row) for row in changed])
+        
         return jsonify({
             'success': True,
-            'data': schedules,
-            'count': len(schedules),
-            'date_range': {
-                'start_date': start_date,
-                'end_date': end_date
-            },
-            'search_nickname': nickname  # 返回搜索的 nickname
-        })
+            'message': '週排班已更新',
+            'data': {
+                'week': week,
+                'upserted': sum(1 for row in changed if row[0] == 'upsert'),
+                'deleted': sum(1 for row in changed if row[0] == 'delete'),
+                'cleared': sum(1 for row in changed if row[0] == 'clear'),
+                'version': version[0][0] if version else None,
+                'row_count': version[0][1] if version else None
+            }
+        }), 200
         
     except Exception as e:
-        print(f"獲取排班數據錯誤: {str(e)}")  # 調試用
+        print(f"週排班更新錯誤: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def week_cell(op, schedule_id, user_id, schedule_date, shift_name):
+    """schedules.week_apply 的一行轉為推送的格子；clear（帶請假備註的行只清除班別）以 upsert 推送，shift_name 為 null"""
+    if op == 'clear':
+        return dict(schedule_cell('upsert', schedule_date, schedule_id, user_id), shift_name=None)
+    return schedule_cell(op, schedule_date, schedule_id, user_id, shift_name)
+
+def parse_iso_week(value):
+    """解析 'YYYY-Www' 為該週週一，格式錯誤時返回 None"""
+    try:
+        year, week = value.split('-W')
+        return date.fromisocalendar(int(year), int(week), 1)
+    except (AttributeError, ValueError):
+        return None
+
+# 輪班模板列表
+@schedules_bp.route('/templates', methods=['GET'])
+@jwt_required()
+def get_schedule_templates():
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        templates = db_manager.execute_named('schedules.templates', read_only=True, row_factory='dict')
+        return iso_jsonify({
+            'success': True,
+            'data': templates
+        }), 200
+    except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+# 保存輪班模板：把 source_start 起 weeks 週的實際排班保存為模板
+@schedules_bp.route('/templates', methods=['POST'])
+@jwt_required()
+def create_schedule_template():
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        data = request.get_json(silent=True) or {}
+        current_user = get_current_nickname()
+        
+        error = invalid_copy_scope(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error,
+                'code': 'INVALID_FIELD'
+            }), 400
+        
+        name = (data.get('name') or '').strip()
+        source_start = parse_iso_date(data.get('source_start'))
+        weeks = data.get('weeks', 1)
+        if not name or len(name) > 100 or source_start is None:
+            return jsonify({
+                'success': False,
+                'error': '需要 name（最多100字符）和 source_start（YYYY-MM-DD）',
+                'code': 'MISSING_FIELD'
+            }), 400
+        if not isinstance(weeks, int) or not 1 <= weeks <= TEMPLATE_MAX_WEEKS:
+            return jsonify({
+                'success': False,
+                'error': f'weeks 需為 1 到 {TEMPLATE_MAX_WEEKS} 的整數',
+                'code': 'INVALID_WEEKS'
+            }), 400
+        
+        template_id, cells = db_manager.execute_named('schedules.template_create', {
+            'name': name,
+            'weeks': weeks,
+            'created_by': current_user[:50] if current_user else current_user,
+            'source_start': week_start(source_start),
+            'user_codes': data.get('users') or None,
+            'department_id': data.get('department_id'),
+        })[0]
+        
+        return jsonify({
+            'success': True,
+            'message': '模板保存成功',
+            'data': {
+                'id': template_id,
+                'cells': cells
+            }
+        }), 201
+        
+    except Exception as e:
+        print(f"保存排班模板錯誤: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def invalid_copy_scope(data):
+    """
+    檢查複製 / 模板請求的欄位類型，返回錯誤信息，全部有效時返回 None：
+    template_id、department_id 為整數，users 為 userID 字串的數組（未提供時不篩選）
+    """
+    if not isinstance(data, dict):
+        return '請求內容必須為 JSON 物件'
+    for field in ('template_id', 'department_id'):
+        value = data.get(field)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            return f'{field} 必須為整數'
+    users = data.get('users')
+    if users is not None and (not isinstance(users, list) or not all(isinstance(code, str) for code in users)):
+        return 'users 必須為 userID 字串的數組'
+    return None
+
+def parse_iso_date(value):
+    """解析 'YYYY-MM-DD'，空值或格式錯誤時返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def list_arg(name):
+    """查詢參數列表：支持 ?a=1&a=2 與 ?a=1,2"""
+    values = []
+    for value in request.args.getlist(name):
+        values.extend(item.strip() for item in value.split(',') if item.strip())
+    return values
+
+def nickname_ranks(db_manager, nicknames):
+    """
+    {暱稱: 名次}，名次按數據庫的排序規則（與 ORDER BY u.nickname 相同）；
+    合併快照與查詢結果時用作排序鍵，Python 的字串比較是碼位順序，與數據庫的排序規則不一定相同
+    """
+    names = list({name for name in nicknames if name is not None})
+    if not names:
+        return {}
+    rows = db_manager.execute_query(
+        "SELECT DISTINCT nickname FROM users WHERE nickname = ANY(%s) ORDER BY nickname",
+        (names,),
+        read_only=True
+    )
+    return {row[0]: rank for rank, row in enumerate(rows)}
+
+def encode_list_cursor(row):
+    """以最後一行的 (nickname, schedule_date, id) 生成不透明的分頁游標；沒有暱稱時 nickname 為 null"""
+    key = [row['nickname'], row['schedule_date'].isoformat(), row['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def decode_list_cursor(cursor):
+    """解析分頁游標，格式錯誤時返回 None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        nickname, schedule_date, schedule_id = json.loads(base64.urlsafe_b64decode(padded))
+        if nickname is not None:
+            nickname = str(nickname)
+        return nickname, datetime.strptime(schedule_date, '%Y-%m-%d').date(), int(schedule_id)
+    except (ValueError, TypeError):
+        return None
+
+def current_month_range():
+    """當前月份的第一天和最後一天（YYYY-MM-DD）"""
+    today = datetime.now()
+    first_day = today.replace(day=1)
+    if today.month == 12:
+        last_day = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
+    else:
+        last_day = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+    return first_day.strftime('%Y-%m-%d'), last_day.strftime('%Y-%m-%d')
+
+def get_current_nickname():
+    """從 JWT identity 中提取暱稱 (nickname)"""
+    current_identity = get_jwt_identity()
+    current_user = "unknown"  # 默認值
+    
+    if isinstance(current_identity, dict):
+        # 如果 identity 是字典，提取 nickname
+        current_user = current_identity.get('nickname', 'unknown')
+    elif isinstance(current_identity, str):
+        # 如果 identity 是字符串，嘗試解析 JSON
+        try:
+            identity_data = json.loads(current_identity)
+            current_user = identity_data.get('nickname', 'unknown')
+        except json.JSONDecodeError:
+            # 如果不是 JSON 字符串，直接使用
+            current_user = current_identity
+        except Exception as e:
+            print(f"解析 JWT identity 錯誤: {e}")
+            current_user = "unknown"
+    else:
+        current_user = str(current_identity)
+    
+    return current_user
+
 # 創建排班
 @schedules_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_schedule():
     db_manager = PostgresDBManager.get_instance()
     try:
-        current_identity = get_jwt_identity()
-        # 從 JWT identity 中提取暱稱 (nickname)
-        current_user = "unknown"  # 默認值
-        
-        if isinstance(current_identity, dict):
-            # 如果 identity 是字典，提取 nickname
-            current_user = current_identity.get('nickname', 'unknown')
-        elif isinstance(current_identity, str):
-            # 如果 identity 是字符串，嘗試解析 JSON
-            try:
-                identity_data = json.loads(current_identity)
-                current_user = identity_data.get('nickname', 'unknown')
-            except json.JSONDecodeError:
-                # 如果不是 JSON 字符串，直接使用
-                current_user = current_identity
-            except Exception as e:
-                print(f"解析 JWT identity 錯誤: {e}")
-                current_user = "unknown"
-        else:
-            current_user = str(current_identity)
+        current_user = get_current_nickname()
         
         data = request.get_json()
 
@@ -157,7 +1036,8 @@ def create_schedule():
             if field not in data:
                 return jsonify({
                     'success': False,
-                    'error': f'缺少必要欄位: {field}'
+                    'error': f'缺少必要欄位: {field}',
+                    'code': 'MISSING_FIELD'
                 }), 400
 
         userID = data['userID']  # 改為 userID
@@ -169,7 +1049,8 @@ def create_schedule():
         if shift_name and len(shift_name) > 50:
             return jsonify({
                 'success': False,
-                'error': f'班別名稱過長 (最多50字符，當前{len(shift_name)}字符): {shift_name}'
+                'error': f'班別名稱過長 (最多50字符，當前{len(shift_name)}字符): {shift_name}',
+                'code': 'SHIFT_NAME_TOO_LONG'
             }), 400
 
         # 處理 created_by 長度限制 - 使用暱稱
@@ -179,103 +1060,50 @@ def create_schedule():
         else:
             created_by = current_user
 
-        # 檢查用戶是否存在 - 改為使用 userID 查詢
-        user_check_query = "SELECT id, userID, username, nickname FROM users WHERE userID = %s AND status > 1"
-        user_result = db_manager.execute_query(user_check_query, (userID,))
-        
-        if not user_result:
+        try:
+            schedule_date_obj = datetime.strptime(schedule_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
             return jsonify({
                 'success': False,
-                'error': f'用戶不存在或狀態異常 (userID: {userID})'
+                'error': '無效的日期格式，請使用 YYYY-MM-DD',
+                'code': 'INVALID_DATE'
             }), 400
 
-        # 獲取用戶的 id 和暱稱
-        user_id = user_result[0][0]  # 獲取 users 表的 id
-        user_nickname = user_result[0][3]
-        
-        # 處理 user_name_snapshot 長度限制 (VARCHAR(100))
-        if user_nickname and len(user_nickname) > 100:
-            user_name_snapshot = user_nickname[:100]
-            print(f"用戶暱稱快照被截斷: {user_nickname} -> {user_name_snapshot}")
-        else:
-            user_name_snapshot = user_nickname
-
-        # 檢查班別是否存在
-        shift_check_query = "SELECT id, shift_name, description FROM shift_types WHERE shift_name = %s AND is_active = TRUE"
-        shift_result = db_manager.execute_query(shift_check_query, (shift_name,))
-        
-        if not shift_result:
+        # 檢查鎖定（進程內計算，不查數據庫）
+        if find_locked_dates([schedule_date_obj]):
             return jsonify({
                 'success': False,
-                'error': f'無效的班別名稱: {shift_name}'
+                'error': f'排班已鎖定: {schedule_date}',
+                'code': 'SCHEDULE_LOCKED'
             }), 400
 
-        # 如果沒有提供班別描述，使用默認描述
-        if not shift_description:
-            shift_description = shift_result[0][1]
+        # 🎯 用戶 / 班別驗證和寫入在同一條語句中完成（一次往返）；
+        # (user_id, schedule_date) 唯一索引 + ON CONFLICT 保證並發點擊也不會重複插入
+        schedule_id, user_id, user_ok, shift_ok = db_manager.execute_named('schedules.create', {
+            'userID': str(userID),
+            'schedule_date': schedule_date_obj,
+            'shift_name': shift_name,
+            'shift_description': shift_description,
+            'created_by': created_by,
+        })[0]
 
-        # 檢查是否已存在排班 - 使用 user_id (users 表的 id)
-        existing_check_query = """
-            SELECT id FROM schedules 
-            WHERE user_id = %s AND schedule_date = %s
-        """
-        existing_result = db_manager.execute_query(existing_check_query, (user_id, schedule_date))
-        # print('existing_result:', existing_result)
-        
-        # 檢查鎖定 - 如果已鎖定會拋出異常
-        check_lock(data['schedule_date'])
-        
-        if existing_result:
+        if schedule_id is None:
+            if not user_ok:
+                error, code = f'用戶不存在或狀態異常 (userID: {userID})', 'USER_NOT_FOUND'
+            elif not shift_ok:
+                error, code = f'無效的班別名稱: {shift_name}', 'INVALID_SHIFT'
+            else:
+                error, code = '該用戶在此日期已有排班', 'DUPLICATE_SCHEDULE'
             return jsonify({
                 'success': False,
-                'error': '該用戶在此日期已有排班'
+                'error': error,
+                'code': code
             }), 400
 
-        # 計算週數和年份
-        schedule_date_obj = datetime.strptime(schedule_date, '%Y-%m-%d').date()
-        week_number = schedule_date_obj.isocalendar()[1]
-        year = schedule_date_obj.year
-        
-        # print(f"準備插入的數據:")
-        # print(f"  user_id: {user_id} (來自 users 表的 id)")
-        # print(f"  userID: {userID} (輸入的 userID)")
-        # print(f"  schedule_date: {schedule_date}")
-        # print(f"  shift_name: '{shift_name}' (長度: {len(shift_name)})")
-        # print(f"  shift_description: '{shift_description}' (長度: {len(shift_description) if shift_description else 0})")
-        # print(f"  user_name_snapshot: '{user_name_snapshot}' (長度: {len(user_name_snapshot) if user_name_snapshot else 0})")
-        # print(f"  created_by: '{created_by}' (長度: {len(created_by) if created_by else 0})")
-        # print(f"  week_number: {week_number}")
-        # print(f"  year: {year}")
-
-        # 插入排班記錄 - 使用 user_id (users 表的 id)
-        insert_query = """
-            INSERT INTO schedules (
-                user_id, schedule_date, shift_name, shift_description,
-                user_name_snapshot, week_number, year, created_by
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """
-        
-        insert_params = (
-            user_id, schedule_date, shift_name, shift_description,
-            user_name_snapshot, week_number, year, created_by
-        )
-
-        result = db_manager.execute_query(insert_query, insert_params)
-        print(f"插入結果: {result}")  # 調試用
-        
-        if not result:
-            return jsonify({
-                'success': False,
-                'error': '創建排班失敗，未返回 ID'
-            }), 500
-        
-        if result == 0:
-            return jsonify({
-                'success': False,
-                'msg': '用戶不存在或已被刪除',
-                'error': 'User not found'
-            }), 404
+        # 提交後推送到該週的房間
+        publish_schedule_changes([
+            schedule_cell('upsert', schedule_date_obj, schedule_id, user_id, shift_name)
+        ])
 
         return jsonify({
             'success': True,
@@ -293,27 +1121,11 @@ def create_schedule():
         }), 500
  
 def check_lock(schedule_date):
-    db_manager = PostgresDBManager.get_instance()
-    check_islock = """SELECT * FROM get_schedule_lock_status(%s,%s,%s,%s,%s); """
-    # print('Config.SCHEDULE_WEEKS_AHEAD:',Config.SCHEDULE_WEEKS_AHEAD  )
     try:
-        islock_result = db_manager.execute_query(
-            check_islock, 
-            (   schedule_date, 
-                date.today(),
-                Config.SCHEDULE_DAYS_BEFORE_LOCK,  # 使用配置的提前天數
-                Config.SCHEDULE_LOCK_TIME,         # 使用配置的鎖定時間
-                Config.SCHEDULE_WEEKS_AHEAD        # 使用配置的提前周數 
-             )
-        )
+        if not isinstance(schedule_date, date):
+            schedule_date = datetime.strptime(str(schedule_date), '%Y-%m-%d').date()
         
-        if not islock_result:
-            raise Exception("無法獲取鎖定狀態")
-        
-        result = islock_result[0]
-        locked = result[5]
-        
-        if locked:
+        if find_locked_dates([schedule_date]):
             # 拋出自定義異常
             raise ValueError(f"排班已鎖定: {schedule_date}")
         
@@ -323,6 +1135,91 @@ def check_lock(schedule_date):
         print(f"鎖定檢查錯誤: {str(e)}")
         raise  # 重新拋出異常
 
+def locked_full_weeks(start, end):
+    """start..end 完整包含且整週已鎖定的 ISO 週的週一（這些週可使用週快照）"""
+    try:
+        if not isinstance(start, date):
+            start = datetime.strptime(str(start), '%Y-%m-%d').date()
+        if not isinstance(end, date):
+            end = datetime.strptime(str(end), '%Y-%m-%d').date()
+    except ValueError:
+        return []
+    
+    mondays = snapshot_weeks(start, end)
+    days = [monday + timedelta(days=offset) for monday in mondays for offset in range(7)]
+    locked = find_locked_dates(days)
+    return [
+        monday for monday in mondays
+        if all(monday + timedelta(days=offset) in locked for offset in range(7))
+    ]
+
+def find_locked_dates(days):
+    """返回 days 中已鎖定的日期；SCHEDULE_LOCK_DB_CHECK 開啟（默認）時以數據庫函數的結果為準"""
+    days = list(days)
+    locked = lock_calendar.locked_dates(days)
+    if not Config.SCHEDULE_LOCK_DB_CHECK or not days:
+        return locked
+    
+    db_manager = PostgresDBManager.get_instance()
+    rows = db_manager.execute_named('schedules.lock_status_many', (
+        days,
+        date.today(),
+        Config.SCHEDULE_DAYS_BEFORE_LOCK,  # 使用配置的提前天數
+        Config.SCHEDULE_LOCK_TIME,         # 使用配置的鎖定時間
+        Config.SCHEDULE_WEEKS_AHEAD        # 使用配置的提前周數
+    ))
+    # 第 7 欄為 is_locked（前面多了 d.day）
+    db_locked = {row[0] for row in rows if row[6]}
+    if db_locked != locked:
+        print(f"⚠️ Lock calendar mismatch: python={sorted(locked)} db={sorted(db_locked)}")
+    return db_locked
+
+# 鎖定狀態：返回範圍內每個 ISO 週的鎖定時間和是否已鎖定
+@schedules_bp.route('/lock-status', methods=['GET'])
+@jwt_required()
+def get_lock_status_range():
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        if not start_date or not end_date:
+            start_date, end_date = current_month_range()
+        
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': '無效的日期格式，請使用 YYYY-MM-DD'
+            }), 400
+        
+        if end < start or (end - start).days > LOCK_STATUS_MAX_DAYS:
+            return jsonify({
+                'success': False,
+                'error': f'日期範圍無效（最多 {LOCK_STATUS_MAX_DAYS} 天）'
+            }), 400
+        
+        weeks = lock_calendar.range_status(start, end)
+        if Config.SCHEDULE_LOCK_DB_CHECK:
+            locked_mondays = find_locked_dates([week['week_start'] for week in weeks])
+            for week in weeks:
+                week['is_locked'] = week['week_start'] in locked_mondays
+        
+        return jsonify({
+            'success': True,
+            'data': weeks,
+            'date_range': {
+                'start_date': start.isoformat(),
+                'end_date': end.isoformat()
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # 更新排班接口
 @schedules_bp.route('/<int:schedule_id>', methods=['PUT'])
 @jwt_required()
@@ -344,19 +1241,26 @@ def update_schedule(schedule_id):
         check_lock(data['schedule_date'])
         
         # 如果通過了鎖定檢查，繼續執行更新
+        # schedule_date 同時作為條件：只更新通過鎖定檢查的那一天，並讓查詢只掃描對應的分區
         update_query = """
             UPDATE schedules 
             SET shift_name = %s
             WHERE id = %s
-            RETURNING id
+            AND schedule_date = %s::date
+            RETURNING id, schedule_date, user_id, shift_name
         """
         
-        result = db_manager.execute_query(
+        result = db_manager.execute_returning(
             update_query, 
-            (data['shift_name'], schedule_id)
+            (data['shift_name'], schedule_id, data['schedule_date'])
         )
         
-        if result and result != 0:  
+        if result:
+            # 提交後推送到該週的房間
+            updated_id, updated_date, updated_user_id, updated_shift = result
+            publish_schedule_changes([
+                schedule_cell('upsert', updated_date, updated_id, updated_user_id, updated_shift)
+            ])
             return jsonify({
                 'success': True,
                 'message': '排班更新成功',
@@ -506,111 +1410,194 @@ def update_schedule(schedule_id):
 #             'error': str(e)
 #         }), 500
 
+def batch_validation_failed(failed):
+    """批量創建的驗證失敗響應：列出每筆失敗的下標、原始數據和原因"""
+    return jsonify({
+        'success': False,
+        'error': '批量排班驗證失敗，未寫入任何資料',
+        'data': {
+            'failed': sorted(failed, key=lambda item: item['index'])
+        }
+    }), 400
+
 # 批量創建排班
-# @schedules_bp.route('/batch', methods=['POST'])
-# @jwt_required()
-# def batch_create_schedules():
-#     try:
-#         data = request.get_json()
-#         current_user = get_jwt_identity()
+@schedules_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_create_schedules():
+    """
+    批量創建排班：整批以集合查詢驗證（用戶、班別、鎖定、重複），全部通過後在同一事務中用 COPY 寫入
+    """
+    db_manager = PostgresDBManager.get_instance()
+    try:
+        current_user = get_current_nickname()
+        created_by = current_user[:50] if current_user else current_user
         
-#         schedules = data.get('schedules', [])
-#         if not schedules:
-#             return jsonify({
-#                 'success': False,
-#                 'error': '沒有提供排班數據'
-#             }), 400
+        data = request.get_json(silent=True) or {}
+        schedules = data.get('schedules', []) if isinstance(data, dict) else None
+        if not schedules:
+            return jsonify({
+                'success': False,
+                'error': '沒有提供排班數據'
+            }), 400
         
-#         results = {
-#             'success': [],
-#             'failed': []
-#         }
+        if not isinstance(schedules, list):
+            return jsonify({
+                'success': False,
+                'error': 'schedules 必須為數組'
+            }), 400
         
-#         with PostgresDBManager() as db:
-#             for schedule_data in schedules:
-#                 try:
-#                     required_fields = ['user_id', 'schedule_date', 'shift_name']
-#                     for field in required_fields:
-#                         if field not in schedule_data:
-#                             results['failed'].append({
-#                                 'data': schedule_data,
-#                                 'error': f'缺少必要欄位: {field}'
-#                             })
-#                             continue
-                    
-#                     # 檢查是否已存在
-#                     db.execute(
-#                         "SELECT id FROM schedules WHERE user_id = %s AND schedule_date = %s",
-#                         (schedule_data['user_id'], schedule_data['schedule_date'])
-#                     )
-#                     if db.fetchone():
-#                         results['failed'].append({
-#                             'data': schedule_data,
-#                             'error': '該用戶在此日期已有排班'
-#                         })
-#                         continue
-                    
-#                     # 檢查班別
-#                     db.execute(
-#                         "SELECT shift_name FROM shift_types WHERE shift_name = %s AND is_active = TRUE",
-#                         (schedule_data['shift_name'],)
-#                     )
-#                     if not db.fetchone():
-#                         results['failed'].append({
-#                             'data': schedule_data,
-#                             'error': '無效的班別名稱'
-#                         })
-#                         continue
-                    
-#                     # 插入排班
-#                     schedule_date = datetime.strptime(schedule_data['schedule_date'], '%Y-%m-%d').date()
-#                     week_number = schedule_date.isocalendar()[1]
-#                     year = schedule_date.year
-                    
-#                     query = """
-#                     INSERT INTO schedules (
-#                         user_id, schedule_date, shift_name, shift_description,
-#                         week_number, year, created_by
-#                     ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-#                     RETURNING id
-#                     """
-                    
-#                     params = (
-#                         schedule_data['user_id'],
-#                         schedule_data['schedule_date'],
-#                         schedule_data['shift_name'],
-#                         schedule_data.get('shift_description'),
-#                         week_number,
-#                         year,
-#                         current_user
-#                     )
-                    
-#                     db.execute(query, params)
-#                     schedule_id = db.fetchone()[0]
-                    
-#                     results['success'].append({
-#                         'id': schedule_id,
-#                         'user_id': schedule_data['user_id'],
-#                         'schedule_date': schedule_data['schedule_date']
-#                     })
-                    
-#                 except Exception as e:
-#                     results['failed'].append({
-#                         'data': schedule_data,
-#                         'error': str(e)
-#                     })
+        if len(schedules) > BATCH_MAX_SCHEDULES:
+            return jsonify({
+                'success': False,
+                'error': f'單次最多 {BATCH_MAX_SCHEDULES} 筆排班'
+            }), 400
+        
+        failed = []
+        items = []
+        seen = set()
+        
+        # 1. 逐筆檢查欄位格式（不查數據庫）
+        for index, schedule_data in enumerate(schedules):
+            if not isinstance(schedule_data, dict):
+                failed.append({'index': index, 'data': schedule_data, 'error': '排班數據必須為物件'})
+                continue
             
-#             return jsonify({
-#                 'success': True,
-#                 'message': '批量創建完成',
-#                 'data': results
-#             })
+            missing = [field for field in ('userID', 'schedule_date', 'shift_name') if not schedule_data.get(field)]
+            if missing:
+                failed.append({'index': index, 'data': schedule_data, 'error': f'缺少必要欄位: {", ".join(missing)}'})
+                continue
             
-#     except Exception as e:
-#         return jsonify({
-#             'success': False,
-#             'error': str(e)
-#         }), 500
+            shift_name = schedule_data['shift_name']
+            if not isinstance(shift_name, str):
+                failed.append({'index': index, 'data': schedule_data, 'error': '班別名稱必須為字串'})
+                continue
+            if len(shift_name) > 50:
+                failed.append({'index': index, 'data': schedule_data, 'error': f'班別名稱過長 (最多50字符): {shift_name}'})
+                continue
+            
+            try:
+                schedule_date = datetime.strptime(schedule_data['schedule_date'], '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                failed.append({'index': index, 'data': schedule_data, 'error': '無效的日期格式，請使用 YYYY-MM-DD'})
+                continue
+            
+            key = (str(schedule_data['userID']), schedule_date)
+            if key in seen:
+                failed.append({'index': index, 'data': schedule_data, 'error': '批次中重複的用戶和日期'})
+                continue
+            seen.add(key)
+            
+            items.append({
+                'index': index,
+                'data': schedule_data,
+                'userID': key[0],
+                'schedule_date': schedule_date,
+                'shift_name': shift_name,
+                'shift_description': schedule_data.get('shift_description')
+            })
+        
+        # 整批驗證：格式檢查已有失敗（包括全部無效）時直接返回，不查數據庫
+        if failed:
+            return batch_validation_failed(failed)
+        
+        user_codes = [item['userID'] for item in items]
+        dates = [item['schedule_date'] for item in items]
+        distinct_dates = sorted(set(dates))
+        
+        # 驗證和寫入在請求事務的同一個 SAVEPOINT 中完成：不另外取連線，失敗時整段回滾
+        with db_manager.savepoint():
+            # 2. 集合驗證：三個查詢一次 pipeline 發送，鎖定狀態由進程內的鎖定日曆計算
+            users_rows, shift_rows, existing_rows = db_manager.execute_batch([
+                ("SELECT id, userID, nickname FROM users WHERE userID = ANY(%s::text[]) AND status > 1",
+                 (sorted(set(user_codes)),)),
+                ("SELECT shift_name, description FROM shift_types WHERE shift_name = ANY(%s::text[]) AND is_active = TRUE",
+                 (sorted({item['shift_name'] for item in items}),)),
+                ("""
+                    SELECT u.userID, s.schedule_date
+                    FROM unnest(%s::text[], %s::date[]) AS b(user_code, day)
+                    JOIN users u ON u.userID = b.user_code
+                    JOIN schedules s ON s.user_id = u.id AND s.schedule_date = b.day
+                    WHERE s.schedule_date BETWEEN %s AND %s
+                """, (user_codes, dates, distinct_dates[0], distinct_dates[-1]))
+            ])
+            
+            users = {str(row[1]): row for row in users_rows}
+            shift_names = {row[0] for row in shift_rows}
+            locked_dates = find_locked_dates(distinct_dates)
+            existing = {(str(row[0]), row[1]) for row in existing_rows}
+            
+            rows = []
+            for item in items:
+                user = users.get(item['userID'])
+                if user is None:
+                    error = f'用戶不存在或狀態異常 (userID: {item["userID"]})'
+                elif item['shift_name'] not in shift_names:
+                    error = f'無效的班別名稱: {item["shift_name"]}'
+                elif item['schedule_date'] in locked_dates:
+                    error = f'排班已鎖定: {item["schedule_date"].isoformat()}'
+                elif (item['userID'], item['schedule_date']) in existing:
+                    error = '該用戶在此日期已有排班'
+                else:
+                    error = None
+                
+                if error:
+                    failed.append({'index': item['index'], 'data': item['data'], 'error': error})
+                    continue
+                
+                schedule_date = item['schedule_date']
+                nickname = user[2]
+                rows.append((
+                    user[0],
+                    schedule_date,
+                    item['shift_name'],
+                    item['shift_description'] or item['shift_name'],
+                    nickname[:100] if nickname else nickname,
+                    schedule_date.isocalendar()[1],
+                    schedule_date.year,
+                    created_by
+                ))
+            
+            # 整批驗證：任何一筆失敗都不寫入
+            if failed:
+                return batch_validation_failed(failed)
+            
+            # 3. COPY 一次寫入
+            inserted = db_manager.copy_rows('schedules', [
+                'user_id', 'schedule_date', 'shift_name', 'shift_description',
+                'user_name_snapshot', 'week_number', 'year', 'created_by'
+            ], rows)
+            
+            # COPY 不返回 id，推送的格子以用戶 + 日期定位（請求事務提交後推送）
+            publish_schedule_changes([
+                schedule_cell('upsert', row[1], user_id=row[0], shift_name=row[2]) for row in rows
+            ])
+        
+        return jsonify({
+            'success': True,
+            'message': '批量創建完成',
+            'data': {
+                'inserted': inserted
+            }
+        }), 201
+    
+    except psycopg.errors.UniqueViolation:
+        # 驗證後到 COPY 之間其他請求寫入了相同的用戶和日期
+        return jsonify({
+            'success': False,
+            'error': '批次中有用戶在此日期已有排班，未寫入任何資料',
+            'code': 'DUPLICATE_SCHEDULE'
+        }), 400
+            
+    except psycopg.Error as e:
+        return jsonify({
+            'success': False,
+            'error': f'數據庫錯誤: {str(e)}'
+        }), 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 # 檢查排班鎖定狀態
 # @schedules_bp.route('/lock-status/<date>', methods=['GET'])
@@ -6,6 +6,7 @@ from flask_jwt_extended import get_jwt_identity, jwt_required
 from app.database import PostgresDBManager
 from app.errors import abort_msg
 from app.utils.auth_utils import authenticate_and_login_user, reset_user_password, validate_password_strength
+from app.utils.serializers import iso_jsonify
 
 shift_types_bp = Blueprint('shift_types', __name__, url_prefix='/api/shift_types')
 
@@ -38,7 +39,7 @@ def get_shift_types():
         WHERE 1=1
         """
         
-        count_query = "SELECT COUNT(*) FROM shift_types WHERE 1=1"
+        count_query = "SELECT COUNT(*) AS total FROM shift_types WHERE 1=1"
         
         # 構建查詢條件和參數
         conditions = []
@@ -72,27 +73,15 @@ def get_shift_types():
         base_query += " LIMIT %s OFFSET %s"
         params.extend([per_page, offset])
         
-        # 執行查詢
-        result = db_manager.execute_query(base_query, tuple(params))
-        
-        # 獲取總數
-        total_result = db_manager.execute_query(count_query, tuple(params[:-2]) if params else ())
-        total_count = total_result[0][0] if total_result else 0
+        # 執行查詢和獲取總數（pipeline 一次發送）
+        # dict_row 直接以欄位名為鍵，日期由 iso_jsonify 序列化為 ISO 8601
+        shift_types_list, total_result = db_manager.execute_batch([
+            (base_query, tuple(params)),
+            (count_query, tuple(params[:-2]) if params else ())
+        ], read_only=True, row_factory='dict')
+        total_count = total_result[0]['total'] if total_result else 0
         total_pages = ceil(total_count / per_page) if per_page > 0 else 1
         
-        # 格式化響應數據
-        shift_types_list = []
-        for shift_type in result:
-            shift_types_list.append({
-                'id': shift_type[0],
-                'shift_name': shift_type[1],
-                'description': shift_type[2],
-                'is_active': shift_type[3],
-                'sort_order': shift_type[4],
-                'created_by': shift_type[5],
-                'created_at': shift_type[6].isoformat() if shift_type[6] else None
-            })
-        
         # 構建響應
         response = {
             'success': True,
@@ -109,7 +98,7 @@ def get_shift_types():
             }
         }
         
-        return jsonify(response), 200
+        return iso_jsonify(response), 200
         
     except Exception as e:
         import traceback
@@ -152,8 +141,7 @@ def create_shift_type():
                 }), 400
         
         # 檢查班別名稱是否已存在
-        check_query = "SELECT id FROM shift_types WHERE shift_name = %s AND is_active = TRUE"
-        existing = db_manager.execute_query(check_query, (data['shift_name'],))
+        existing = db_manager.execute_named('shift_types.active_by_name', (data['shift_name'],))
         if existing:
             return jsonify({
                 'success': False,
@@ -215,8 +203,7 @@ def update_shift_type():
         
         shift_id = data['id']
         # 檢查班別是否存在
-        check_query = "SELECT id FROM shift_types WHERE id = %s"
-        existing = db_manager.execute_query(check_query, (shift_id,))
+        existing = db_manager.execute_named('shift_types.by_id', (shift_id,))
         if not existing:
             return jsonify({
                 'success': False,
@@ -225,8 +212,7 @@ def update_shift_type():
         
         # 如果修改了班別名稱，檢查是否與其他班別重複
         if 'shift_name' in data and data['shift_name']:
-            name_check_query = "SELECT id FROM shift_types WHERE shift_name = %s AND id != %s AND is_active = TRUE"
-            name_existing = db_manager.execute_query(name_check_query, (data['shift_name'], data['id']))
+            name_existing = db_manager.execute_named('shift_types.active_by_name_excluding_id', (data['shift_name'], data['id']))
             if name_existing:
                 return jsonify({
                     'success': False,
@@ -308,8 +294,7 @@ def delete_shift_type():
         data = request.get_json()
         shift_id = data['id']
         # 檢查班別是否存在
-        check_query = "SELECT id, shift_name FROM shift_types WHERE id = %s"
-        existing = db_manager.execute_query(check_query, (shift_id,))
+        existing = db_manager.execute_named('shift_types.by_id', (shift_id,))
         if not existing:
             return jsonify({
                 'success': False,
@@ -351,7 +336,7 @@ def get_shift_type_detail(shift_type_id):
             WHERE id = %s
         """
         
-        result = db_manager.execute_query(query, (shift_type_id,))
+        result = db_manager.execute_query(query, (shift_type_id,), row_factory='dict')
         
         if not result:
             return jsonify({
@@ -359,21 +344,9 @@ def get_shift_type_detail(shift_type_id):
                 'error': '班別不存在'
             }), 404
         
-        shift_type = result[0]
-        
-        data = {
-            'id': shift_type[0],
-            'shift_name': shift_type[1],
-            'description': shift_type[2],
-            'is_active': shift_type[3],
-            'sort_order': shift_type[4],
-            'created_by': shift_type[5],
-            'created_at': shift_type[6].isoformat() if shift_type[6] else None
-        }
-        
-        return jsonify({
+        return iso_jsonify({
             'success': True,
-            'data': data
+            'data': result[0]
         }), 200
         
     except Exception as e:
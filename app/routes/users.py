@@ -4,6 +4,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from math import ceil
 
 from app.database import PostgresDBManager
+from app.queries import USERS_LIST_SORT_FIELDS, users_list_queries
+from app.utils.serializers import iso_jsonify
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
@@ -47,113 +49,28 @@ def getUsersList():
         # 計算偏移量
         offset = (page - 1) * per_page
         
-        # 構建查詢條件
-        where_conditions = []
-        query_params = []
-        
-        # 🎯 排除當前用戶自己的資料
-        if current_username:
-            where_conditions.append("username != %s")
-            query_params.append(current_username)
-        
-        if search:
-            where_conditions.append("(userID ILIKE %s OR username ILIKE %s OR nickname ILIKE %s OR email ILIKE %s)")
-            search_term = f"%{search}%"
-            query_params.extend([search_term, search_term, search_term, search_term])
-        
-        if role_filter is not None:
-            where_conditions.append("role_level = %s")
-            query_params.append(role_filter)
-        
-        if status_filter is not None:
-            where_conditions.append("status = %s")
-            query_params.append(status_filter)
-        
-        # 構建 WHERE 子句
-        where_clause = ""
-        if where_conditions:
-            where_clause = "WHERE " + " AND ".join(where_conditions)
-        
         # 驗證排序字段
-        allowed_sort_fields = ['ID', 'userID', 'username', 'nickname', 'email', 'role_level', 'status', 'created_at', 'last_login']
-        if sort_by not in allowed_sort_fields:
+        if sort_by not in USERS_LIST_SORT_FIELDS:
             sort_by = 'ID'
         
         # 驗證排序方向
         if sort_order.lower() not in ['asc', 'desc']:
             sort_order = 'asc'
         
-        # 構建排序子句
-        order_clause = f"ORDER BY {sort_by} {sort_order}"
-        
-        # 查詢總數
-        count_query = f"SELECT COUNT(*) FROM users {where_clause}"
+        # 🎯 排除當前用戶自己的資料（SQL 的組合見 queries.users_list_queries，db-explain 檢查同一組語句）
+        count_query, data_query = users_list_queries(
+            current_username, search, role_filter, status_filter, sort_by, sort_order, per_page, offset
+        )
         
-        total_count = db_manager.execute_query(count_query, tuple(query_params))
-        total_records = total_count[0][0] if total_count else 0
+        # 總數和分頁數據在同一次 pipeline 中發送
+        # dict_row 直接以欄位名為鍵，日期由 iso_jsonify 序列化為 ISO 8601
+        total_count, users_list = db_manager.execute_batch([
+            count_query,
+            data_query
+        ], read_only=True, row_factory='dict')
+        total_records = total_count[0]['total'] if total_count else 0
         total_pages = ceil(total_records / per_page) if total_records > 0 else 1
         
-        # 查詢用戶數據
-        data_query = f"""
-        SELECT           
-            userID,
-            username,
-            nickname,
-            email,
-            role_level,
-            status,
-            last_login,
-            created_at,
-            updated_at,
-            webhook
-        FROM users 
-        {where_clause}
-        {order_clause}
-        LIMIT %s OFFSET %s
-        """
-        
-        # 添加分頁參數
-        query_params.extend([per_page, offset])
-        
-        users_data = db_manager.execute_query(data_query, tuple(query_params))
-        
-        # 格式化響應數據
-        users_list = []
-        for user in users_data:
-            try:
-                user_dict = {
-                    'userID': user[0],  # userID
-                    'username': user[1],  # username
-                    'nickname': user[2],  # nickname
-                    'email': user[3],  # email
-                    'role_level': user[4],  # role_level
-                    'status': user[5],  # status
-                    'webhook': user[9]  # webhook
-                }
-                
-                # 處理日期字段，確保不為 None
-                if user[6]:  # last_login
-                    user_dict['last_login'] = user[6].isoformat()
-                else:
-                    user_dict['last_login'] = None
-                    
-                if user[7]:  # created_at
-                    user_dict['created_at'] = user[7].isoformat()
-                else:
-                    user_dict['created_at'] = None
-                    
-                if user[8]:  # updated_at
-                    user_dict['updated_at'] = user[8].isoformat()
-                else:
-                    user_dict['updated_at'] = None
-                    
-                users_list.append(user_dict)
-                
-            except Exception as e:
-                print(f"處理用戶數據時出錯 {user[0]}: {e}")
-                # 跳過有問題的用戶，繼續處理其他用戶
-                continue
-        
         # 構建響應
         response = {
             'success': True,
@@ -179,7 +96,7 @@ def getUsersList():
             }
         }
         
-        return jsonify(response), 200
+        return iso_jsonify(response), 200
         
     except Exception as e:
         import traceback
@@ -227,33 +144,24 @@ def addUser():
         
         db_manager = PostgresDBManager.get_instance()
         
-        # 檢查用戶ID是否已存在
-        existing_userid = db_manager.execute_query(
-            "SELECT userID FROM users WHERE userID = %s", 
-            (data['userID'],)
-        )
+        # 檢查用戶ID、用戶名、郵箱是否已存在（三個查詢一次 pipeline 發送）
+        existing_userid, existing_username, existing_email = db_manager.execute_batch([
+            ("SELECT userID FROM users WHERE userID = %s", (data['userID'],)),
+            ("SELECT userID FROM users WHERE username = %s", (data['username'],)),
+            ("SELECT userID FROM users WHERE email = %s", (data['email'],))
+        ])
         if existing_userid:
             return jsonify({
                 'success': False,
                 'message': '用戶ID已存在'
             }), 400
         
-        # 檢查用戶名是否已存在
-        existing_username = db_manager.execute_query(
-            "SELECT userID FROM users WHERE username = %s", 
-            (data['username'],)
-        )
         if existing_username:
             return jsonify({
                 'success': False,
                 'message': '用戶名已存在'
             }), 400
         
-        # 檢查郵箱是否已存在
-        existing_email = db_manager.execute_query(
-            "SELECT userID FROM users WHERE email = %s", 
-            (data['email'],)
-        )
         if existing_email:
             return jsonify({
                 'success': False,
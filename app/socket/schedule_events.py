@@ -0,0 +1,70 @@
+# socket/schedule_events.py
+# 排班變更推送：寫入排班的路由在事務提交後，把變更的格子推送到對應 ISO 週的房間
+# （例如 schedule:2026-W42），客戶端只訂閱正在查看的週（見 websocker.py 的 subscribe_weeks）。
+import re
+from datetime import date, datetime
+
+from flask import has_request_context, request
+
+from app.database import PostgresDBManager
+from app.extensions import socketio
+
+ROOM_PREFIX = 'schedule:'
+WEEK_RE = re.compile(r'^(\d{4})-W(\d{2})$')
+
+# 推送的事件名稱
+SCHEDULE_CHANGED = 'schedule_changed'
+
+
+def to_date(value):
+    """接受 date / datetime / 'YYYY-MM-DD' 字串"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def iso_week(value):
+    """日期所在的 ISO 週，例如 '2026-W42'"""
+    year, week, _ = to_date(value).isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def week_room(week):
+    """ISO 週對應的房間名稱；week 格式錯誤時返回 None"""
+    match = WEEK_RE.match(week or '')
+    if not match or not 1 <= int(match.group(2)) <= 53:
+        return None
+    return ROOM_PREFIX + week
+
+
+def schedule_cell(op, schedule_date, schedule_id=None, user_id=None, shift_name=None, remark=None):
+    """一個變更的格子，只帶非空欄位；op 為 'upsert' 或 'delete'"""
+    cell = {'op': op, 'schedule_date': to_date(schedule_date).isoformat()}
+    for key, value in (('id', schedule_id), ('user_id', user_id),
+                       ('shift_name', shift_name), ('remark', remark)):
+        if value is not None:
+            cell[key] = value
+    return cell
+
+
+def publish_schedule_changes(cells):
+    """按 ISO 週分組，在當前事務提交後推送；事務回滾時不會推送"""
+    by_week = {}
+    for cell in cells:
+        by_week.setdefault(iso_week(cell['schedule_date']), []).append(cell)
+    if not by_week:
+        return
+
+    source = request.endpoint if has_request_context() else None
+
+    def emit_changes():
+        for week, week_cells in by_week.items():
+            socketio.emit(SCHEDULE_CHANGED, {
+                'week': week,
+                'cells': week_cells,
+                'source': source
+            }, to=ROOM_PREFIX + week)
+
+    PostgresDBManager.get_instance().on_commit(emit_changes)
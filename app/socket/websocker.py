@@ -2,6 +2,7 @@ from flask import Blueprint, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from flask_socketio import disconnect, emit, join_room, leave_room
 from app.extensions import socketio
+from app.socket.schedule_events import week_room
 import datetime
 
 from app.routes.auth import logout_with_cookies
@@ -125,4 +126,27 @@ def handle_private_chat(data):
             'message': message,
             'timestamp': datetime.datetime.now().isoformat()
         }, room=request.sid)  # Just echoing back for demo
-        print(f'💌 {current_user} sent private message to {target_user}')
\ No newline at end of file
+        print(f'💌 {current_user} sent private message to {target_user}')
+
+# 單次最多訂閱的週數（例如月表最多跨 6 週）
+MAX_WEEK_SUBSCRIPTIONS = 12
+
+@socketio.on('subscribe_weeks')
+@jwt_required()
+def handle_subscribe_weeks(data):
+    """訂閱排班週房間：{'weeks': ['2026-W42', ...]}，之後收到這些週的 schedule_changed 事件"""
+    weeks = (data or {}).get('weeks') or []
+    rooms = [room for room in (week_room(week) for week in weeks[:MAX_WEEK_SUBSCRIPTIONS]) if room]
+    for room in rooms:
+        join_room(room)
+    emit('weeks_subscribed', {'rooms': rooms})
+
+@socketio.on('unsubscribe_weeks')
+@jwt_required()
+def handle_unsubscribe_weeks(data):
+    """取消訂閱排班週房間"""
+    weeks = (data or {}).get('weeks') or []
+    rooms = [room for room in (week_room(week) for week in weeks) if room]
+    for room in rooms:
+        leave_room(room)
+    emit('weeks_unsubscribed', {'rooms': rooms})
@@ -1,8 +1,13 @@
 # utils/auth_utils.py
+from functools import wraps
+
 from flask import json, jsonify, session
-from flask_jwt_extended import create_access_token, set_access_cookies
+from flask_jwt_extended import create_access_token, get_jwt_identity, set_access_cookies
 from app.database import PostgresDBManager
 
+# 管理員的 role_level
+ADMIN_ROLE_LEVEL = 5
+
 def authenticate_and_login_user(username, password=None, is_sso=False):
     """共享的用戶認證和登入邏輯"""
     db_manager = PostgresDBManager.get_instance()
@@ -10,21 +15,10 @@ def authenticate_and_login_user(username, password=None, is_sso=False):
     try:
         if is_sso:
             # SSO 登入：只驗證用戶名和狀態（狀態不能是1）
-            result = db_manager.execute_query("""
-                SELECT userID, username, nickname, role_level, status, last_login 
-                FROM users 
-                WHERE username = %s 
-                AND status != 1
-            """, (username,))
+            result = db_manager.execute_named('auth.user_by_username', (username,))
         else:
             # 密碼登入：驗證用戶名、密碼和狀態（狀態不能是1）
-            result = db_manager.execute_query("""
-                SELECT userID, username, nickname, role_level, status, last_login 
-                FROM users 
-                WHERE username = %s 
-                AND password_hash = crypt(%s, password_hash)
-                AND status != 1
-            """, (username, password))
+            result = db_manager.execute_named('auth.user_by_password', (username, password))
         
         if not result or len(result) == 0:
             return None, "用戶不存在、密碼錯誤或帳號已停用"
@@ -162,3 +156,26 @@ def reset_user_password(user_id, new_password):
         traceback.print_exc()
         return None, f"重設密碼錯誤: {str(e)}"
 
+def current_identity():
+    """將 JWT identity（JSON 字串）解析為字典；不是 JSON 時只含 username"""
+    identity = get_jwt_identity()
+    if isinstance(identity, dict):
+        return identity
+    if isinstance(identity, str):
+        try:
+            return json.loads(identity)
+        except json.JSONDecodeError:
+            return {'username': identity}
+    return {}
+
+def admin_required(view):
+    """只允許管理員呼叫的路由（放在 @jwt_required() 之下）"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_identity().get('role_level') != ADMIN_ROLE_LEVEL:
+            return jsonify({
+                'success': False,
+                'message': '未授權的操作'
+            }), 401
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,81 @@
+# utils/lock_calendar.py
+# 排班鎖定日曆：鎖定只取決於日期、當前時間和 SCHEDULE_* 配置，在進程內計算，
+# 不再每次寫入都呼叫 get_schedule_lock_status()。
+#
+# 規則：ISO 週（週一 M）在 M 前 days_before_lock 天的 lock_time 鎖定，之前的週一律已鎖定；
+# 超過本週之後 weeks_ahead 週的排班不檢查（不鎖定）。鎖定隨時間單調推進，
+# 因此只需緩存「已鎖定到哪一週」，到下一個鎖定時間點（或跨日）再重新計算。
+from datetime import datetime, time, timedelta
+
+
+def week_start(day):
+    """日期所在 ISO 週的週一"""
+    return day - timedelta(days=day.weekday())
+
+
+class LockCalendar:
+    """Schedule lock windows keyed by ISO week, cached until the next lock boundary"""
+
+    def __init__(self, days_before_lock, lock_time, weeks_ahead, clock=datetime.now):
+        self.days_before_lock = days_before_lock
+        self.lock_time = lock_time if isinstance(lock_time, time) else time.fromisoformat(str(lock_time))
+        self.weeks_ahead = weeks_ahead
+        self._clock = clock
+        # (已鎖定的最後一個週一, 緩存有效期)
+        self._cache = None
+
+    def lock_at(self, monday):
+        """該週的鎖定時間"""
+        return datetime.combine(monday - timedelta(days=self.days_before_lock), self.lock_time)
+
+    def _locked_through(self):
+        """已鎖定的最後一個週一（該週及之前的週都已鎖定）"""
+        now = self._clock()
+        cache = self._cache
+        if cache is not None and now < cache[1]:
+            return cache[0]
+
+        today = now.date()
+        monday = week_start(today + timedelta(days=self.days_before_lock))
+        if now < self.lock_at(monday):
+            monday -= timedelta(weeks=1)
+        # 超出檢查範圍的週不鎖定
+        monday = min(monday, week_start(today) + timedelta(weeks=self.weeks_ahead))
+
+        # 有效到下一週的鎖定時間，或明天零時（檢查範圍隨日期推進）
+        valid_until = min(self.lock_at(monday + timedelta(weeks=1)),
+                          datetime.combine(today + timedelta(days=1), time()))
+        self._cache = (monday, valid_until)
+        return monday
+
+    def is_locked(self, day):
+        """排班日期是否已鎖定"""
+        return week_start(day) <= self._locked_through()
+
+    def locked_dates(self, days):
+        """返回 days 中已鎖定的日期集合"""
+        locked_through = self._locked_through()
+        return {day for day in days if week_start(day) <= locked_through}
+
+    def week_status(self, monday, locked_through=None):
+        """一個 ISO 週（以週一表示）的鎖定狀態"""
+        if locked_through is None:
+            locked_through = self._locked_through()
+        year, week, _ = monday.isocalendar()
+        return {
+            'week': f'{year}-W{week:02d}',
+            'week_start': monday,
+            'week_end': monday + timedelta(days=6),
+            'lock_at': self.lock_at(monday),
+            'is_locked': monday <= locked_through
+        }
+
+    def range_status(self, start, end):
+        """start 到 end 之間每個 ISO 週的鎖定狀態"""
+        locked_through = self._locked_through()
+        monday = week_start(start)
+        weeks = []
+        while monday <= end:
+            weeks.append(self.week_status(monday, locked_through))
+            monday += timedelta(weeks=1)
+        return weeks
@@ -0,0 +1,28 @@
+# utils/serializers.py
+# JSON 序列化：Flask 默認把 date / datetime 輸出為 HTTP 日期格式（RFC 822），app.json 保持默認，
+# 既有接口的日期格式不變。直接返回 dict_row 查詢結果的路由（用戶 / 班別列表、排班列表、增量同步、
+# 複製 / 週編輯預覽、模板列表）以 iso_jsonify / iso_dumps 輸出 ISO 8601，不必逐欄 isoformat()
+from datetime import date, datetime, time
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+
+class ISOJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes date, datetime and time values with isoformat()"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date, time)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+def iso_dumps(obj):
+    """json.dumps with ISO 8601 dates for the current app"""
+    return ISOJSONProvider(current_app._get_current_object()).dumps(obj)
+
+
+def iso_jsonify(*args, **kwargs):
+    """jsonify with ISO 8601 dates, for routes returning dict_row results"""
+    return ISOJSONProvider(current_app._get_current_object()).response(*args, **kwargs)
@@ -0,0 +1,34 @@
+# utils/streaming.py
+from flask import Response, current_app, stream_with_context
+
+_END = object()
+
+
+def stream_json_response(items, head=None, key='data', tail=None, status=200, dumps=None):
+    """以串流方式輸出 {**head, key: [...], **tail(count)}，不在記憶體中組裝整個列表
+
+    items 可以是任何迭代器（例如 PostgresDBManager.stream_query 的結果）。
+    第一筆資料會在建立響應前先取出，讓查詢錯誤仍能在路由中以 500 返回。
+    dumps 默認為 app.json.dumps（例如需要 ISO 8601 日期時傳入 serializers.iso_dumps）。
+    """
+    iterator = iter(items)
+    first = next(iterator, _END)
+
+    def generate():
+        encode = dumps or current_app.json.dumps
+        # head 的最後一個 "}" 去掉，接上數據數組
+        prefix = encode(head or {})[:-1]
+        yield prefix + (', ' if head else '') + encode(key) + ': ['
+
+        count = 0
+        if first is not _END:
+            yield encode(first)
+            count = 1
+            for item in iterator:
+                yield ', ' + encode(item)
+                count += 1
+
+        suffix = encode(tail(count) if tail else {})[1:]
+        yield ']' + (', ' + suffix if suffix != '}' else suffix)
+
+    return Response(stream_with_context(generate()), status=status, mimetype='application/json')
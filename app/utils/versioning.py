@@ -0,0 +1,50 @@
+# utils/versioning.py
+# 排班範圍的版本戳與條件請求：版本來自 schedule_week_versions（見 migrations/m0002），
+# 查詢只讀幾行小表，If-None-Match 命中時無需執行 JOIN 和序列化。
+import hashlib
+
+from flask import Response, request
+from psycopg import errors
+
+# 瀏覽器每次都回來驗證，但未變更時只需一個 304
+CACHE_CONTROL = 'private, no-cache'
+
+
+def schedule_range_version(db_manager, start_date, end_date):
+    """
+    範圍內各週及維度的 (key, version, row_count) 列表；版本表尚未建立時返回 None。
+    應在 db_manager.using(snapshot_connection()) 中呼叫，與響應的數據讀自同一個快照，
+    SAVEPOINT 也建立在該連線上（版本表不存在時不會使快照事務失效）。
+    """
+    try:
+        with db_manager.savepoint():
+            return db_manager.execute_named(
+                'schedules.range_version', (start_date, end_date), read_only=True
+            )
+    except errors.UndefinedTable:
+        print("⚠️ schedule_week_versions missing, run `flask db-migrate` to enable ETags")
+        return None
+
+
+def versions_etag(versions, scope, start_date, end_date, *extra):
+    """以版本戳 + 請求參數計算 ETag（scope 區分列表 / 網格等不同輸出）"""
+    if versions is None:
+        return None
+    digest = hashlib.sha1(repr((scope, str(start_date), str(end_date), extra, versions)).encode())
+    return digest.hexdigest()[:32]
+
+
+def not_modified(etag):
+    """If-None-Match 命中時返回 304 響應，否則返回 None"""
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    return with_etag(response, etag)
+
+
+def with_etag(response, etag):
+    """為響應加上弱 ETag 與 Cache-Control"""
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -0,0 +1,145 @@
+# utils/week_snapshots.py
+# 已鎖定週的排班行快照（見 migrations/m0008）：鎖定後的排班幾乎不再變更，
+# 每個已鎖定的完整 ISO 週只查詢並序列化一次；之後任何包含該週的範圍（例如整月）都按週取回快照，
+# 只有其餘（未鎖定或不完整的週）日期需要查詢。
+# 快照以該週自己的 ETag（週版本 + 維度版本）為鍵：排班寫入（含請假審批、管理員直接修改）會遞增週版本，
+# 舊快照不再命中。
+import json
+import zlib
+from datetime import timedelta
+
+from psycopg import errors
+
+from app.utils.lock_calendar import week_start
+from app.utils.serializers import iso_dumps
+from app.utils.versioning import versions_etag
+
+
+def snapshot_weeks(start, end):
+    """start..end 完整包含的各 ISO 週的週一"""
+    monday = week_start(start)
+    if monday < start:
+        monday += timedelta(weeks=1)
+    mondays = []
+    while monday + timedelta(days=6) <= end:
+        mondays.append(monday)
+        monday += timedelta(weeks=1)
+    return mondays
+
+
+def week_etags(versions, scope, mondays):
+    """由範圍的版本列表（schedule_range_version）計算各週自己的 ETag；沒有版本表時返回空字典"""
+    if versions is None:
+        return {}
+    weeks = {key: (key, version, row_count) for key, version, row_count in versions if key[:1].isdigit()}
+    dimensions = [tuple(row) for row in versions if not row[0][:1].isdigit()]
+    etags = {}
+    for monday in mondays:
+        week = weeks.get(monday.isoformat())
+        etags[monday] = versions_etag(([week] if week else []) + dimensions,
+                                      scope, monday, monday + timedelta(days=6))
+    return etags
+
+
+def load_week_snapshots(db_manager, scope, etags):
+    """返回 {週一: 排班行}，只含快照與 etags 中該週 ETag 相符的週"""
+    if not etags:
+        return {}
+    mondays = sorted(etags)
+    try:
+        with db_manager.savepoint():
+            rows = db_manager.execute_query(
+                """
+                SELECT week_start, payload FROM schedule_week_snapshots
+                WHERE scope = %s
+                AND (week_start, etag) IN (SELECT * FROM unnest(%s::date[], %s::text[]))
+                """,
+                (scope, mondays, [etags[monday] for monday in mondays]),
+                read_only=True
+            )
+    except errors.UndefinedTable:
+        return {}
+    return {monday: json.loads(zlib.decompress(payload)) for monday, payload in rows}
+
+
+def save_week_snapshots(db_manager, scope, weeks):
+    """
+    保存（覆蓋）多個週的快照，weeks 為 {週一: (etag, 排班行)}；失敗只記錄日誌，不影響本次響應。
+    快照是可重建的緩存，寫入不算作客戶端的寫入（不把之後的讀取固定到主庫）。
+    """
+    mondays = sorted(monday for monday, (etag, _) in weeks.items() if etag is not None)
+    if not mondays:
+        return
+    payloads = [zlib.compress(iso_dumps(weeks[monday][1]).encode(), 6) for monday in mondays]
+    try:
+        with db_manager.savepoint():
+            db_manager.execute_query(
+                """
+                INSERT INTO schedule_week_snapshots (week_start, scope, etag, row_count, payload)
+                SELECT w.week_start, %s, w.etag, w.row_count, w.payload
+                FROM unnest(%s::date[], %s::text[], %s::integer[], %s::bytea[])
+                    AS w(week_start, etag, row_count, payload)
+                ON CONFLICT (week_start, scope) DO UPDATE
+                    SET etag = EXCLUDED.etag,
+                        row_count = EXCLUDED.row_count,
+                        payload = EXCLUDED.payload,
+                        created_at = now()
+                """,
+                (scope, mondays, [weeks[monday][0] for monday in mondays],
+                 [len(weeks[monday][1]) for monday in mondays], payloads),
+                fetch=False,
+                mark_write=False
+            )
+    except errors.UndefinedTable:
+        print("⚠️ schedule_week_snapshots missing, run `flask db-migrate` to enable week snapshots")
+    except Exception as e:
+        print(f"⚠️ 保存週快照失敗 ({scope} {mondays[0]}..{mondays[-1]}): {e}")
+
+
+def compose_week_rows(db_manager, scope, start, end, etags, load_rows, day_of, restore=None):
+    """
+    返回 (start..end 的排班行, 待保存的快照)：
+    etags 為已鎖定完整週的 {週一: ETag}，快照相符的週直接取回（restore 把 JSON 行還原為查詢行的形式），
+    其餘日期按連續區段以 load_rows(起, 訖) 查詢；沒有快照的已鎖定週從查詢結果中取出（day_of 取行的日期），
+    以 {週一: (etag, 排班行)} 返回，由呼叫方在響應生成後以 save_week_snapshots 保存。
+    行的順序為快照週在前、查詢結果在後，需要時由呼叫方排序。
+    """
+    cached = load_week_snapshots(db_manager, scope, etags)
+
+    rows = []
+    for monday in sorted(cached):
+        rows.extend(map(restore, cached[monday]) if restore else cached[monday])
+
+    # 未被快照覆蓋的連續日期區段
+    segments = []
+    first = start
+    for monday in sorted(cached):
+        if first < monday:
+            segments.append((first, monday - timedelta(days=1)))
+        first = monday + timedelta(days=7)
+    if first <= end:
+        segments.append((first, end))
+
+    pending = {monday: (etag, []) for monday, etag in etags.items() if monday not in cached}
+    for segment_start, segment_end in segments:
+        for row in load_rows(segment_start, segment_end):
+            week = pending.get(week_start(day_of(row)))
+            if week is not None:
+                week[1].append(row)
+            rows.append(row)
+    return rows, pending
+
+
+def invalidate_week_snapshots(db_manager, days):
+    """刪除 days 所在各週的快照（與寫入在同一事務中提交）"""
+    mondays = sorted({week_start(day) for day in days})
+    if not mondays:
+        return 0
+    try:
+        with db_manager.savepoint():
+            return db_manager.execute_query(
+                "DELETE FROM schedule_week_snapshots WHERE week_start = ANY(%s::date[])",
+                (mondays,)
+            )
+    except errors.UndefinedTable:
+        return 0
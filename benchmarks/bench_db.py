@@ -0,0 +1,113 @@
+# 數據庫層基準測試（需要本地 PostgreSQL，連線參數讀取 config.Config / .env）
+#
+#   python benchmarks/bench_db.py cooperative [並發數] [每個查詢秒數]
+#   python benchmarks/bench_db.py pipeline [語句數] [重複次數]
+#   python benchmarks/bench_db.py stats [用戶數] [天數]（只測統計運算，使用隨機排班，不需要數據庫）
+#
+import eventlet
+
+eventlet.monkey_patch()
+
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from app.database import PostgresDBManager
+
+
+def make_db_manager():
+    app = Flask(__name__)
+    app.config.from_object('config.Config')
+    PostgresDBManager.init_app(app)
+    return PostgresDBManager.get_instance()
+
+
+def bench_cooperative(concurrency=10, sleep_seconds=0.2):
+    """Run N concurrent pg_sleep queries in each cooperative mode and compare wall time"""
+    db_manager = make_db_manager()
+
+    for mode in ('off', 'tpool'):
+        db_manager._init_cooperative_mode(mode)
+        pool = eventlet.GreenPool(concurrency)
+
+        started = time.perf_counter()
+        for _ in range(concurrency):
+            pool.spawn(db_manager.execute_query, "SELECT pg_sleep(%s)", (sleep_seconds,))
+        pool.waitall()
+        elapsed = time.perf_counter() - started
+
+        serial = concurrency * sleep_seconds
+        print(f"[{mode:>5}] {concurrency} x pg_sleep({sleep_seconds}) -> {elapsed:.3f}s "
+              f"(serial would be {serial:.3f}s, overlap {serial / elapsed:.1f}x)")
+
+
+def bench_pipeline(statements=3, rounds=200):
+    """Compare N sequential execute_query calls against one execute_batch pipeline"""
+    db_manager = make_db_manager()
+    db_manager._init_cooperative_mode('off')
+    batch = [("SELECT %s::int", (i,)) for i in range(statements)]
+
+    def sequential():
+        # 同一條連線上逐條發送，只比較往返次數的差異
+        with db_manager:
+            for query, params in batch:
+                db_manager.execute_query(query, params)
+
+    def pipelined():
+        with db_manager:
+            db_manager.execute_batch(batch)
+
+    for name, func in (('sequential', sequential), ('pipeline', pipelined)):
+        func()  # 預熱連線
+        started = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        elapsed = time.perf_counter() - started
+        print(f"[{name:>10}] {statements} statements x {rounds} rounds -> "
+              f"{elapsed / rounds * 1000:.3f} ms per round")
+
+
+def bench_stats(users=1000, days=365):
+    """Build the users x days matrix and compute /api/schedules/stats reports from random cells"""
+    from app import analytics
+
+    start = date.today().replace(month=1, day=1)
+    end = start + timedelta(days=days - 1)
+    mondays = analytics.week_mondays(start, end)
+    shifts = ['早班', '中班', '晚班', '夜班']
+    rows = [
+        (user_id, offset, random.choice(shifts))
+        for offset in range((end - mondays[0]).days + 1)
+        for user_id in range(1, users + 1)
+        if random.random() < 0.7
+    ]
+
+    for label, locked in (('cold', set()), ('all weeks cached', set(mondays))):
+        cache = analytics.WeekCellCache()
+        analytics.load_week_cells(lambda first, last: rows, mondays, {}, locked, cache)
+
+        started = time.perf_counter()
+        weeks = analytics.load_week_cells(lambda first, last: rows, mondays, {}, locked, cache)
+        user_ids, names, matrix = analytics.build_matrix(weeks, start, end)
+        analytics.schedule_stats(names, matrix, start, {'夜班': 10}, {'夜班'})
+        elapsed = time.perf_counter() - started
+        print(f"[{label:>16}] {len(rows)} cells, {users} users x {days} days -> {elapsed * 1000:.1f} ms")
+
+
+BENCHMARKS = {
+    'cooperative': bench_cooperative,
+    'pipeline': bench_pipeline,
+    'stats': bench_stats,
+}
+
+
+if __name__ == '__main__':
+    name = sys.argv[1] if len(sys.argv) > 1 else 'cooperative'
+    args = [float(a) if '.' in a else int(a) for a in sys.argv[2:]]
+    BENCHMARKS[name](*args)
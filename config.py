@@ -34,7 +34,61 @@ class Config:
     POSTGRES_PORT = os.environ.get('POSTGRES_PORT') or '5432'
     POSTGRES_MIN_CONN = os.environ.get('POSTGRES_MIN_CONN') or 1
     POSTGRES_MAX_CONN = os.environ.get('POSTGRES_MAX_CONN') or 20
+    
+    # 連線池背壓：取得連線最多等待秒數、等待隊列上限（0 = 不限制），超過時返回 503 並帶 Retry-After
+    POSTGRES_CHECKOUT_TIMEOUT = float(os.environ.get('POSTGRES_CHECKOUT_TIMEOUT') or 5)
+    POSTGRES_MAX_WAITING = int(os.environ.get('POSTGRES_MAX_WAITING') or 40)
+    POSTGRES_RETRY_AFTER = int(os.environ.get('POSTGRES_RETRY_AFTER') or 2)
+    
+    # 只讀副本（可選）：'host[:port],host[:port]'，標記 read_only 的查詢會分流到副本
+    POSTGRES_REPLICA_HOSTS = os.environ.get('POSTGRES_REPLICA_HOSTS') or ''
+    POSTGRES_REPLICA_MIN_CONN = int(os.environ.get('POSTGRES_REPLICA_MIN_CONN') or 1)
+    POSTGRES_REPLICA_MAX_CONN = int(os.environ.get('POSTGRES_REPLICA_MAX_CONN') or 10)
+    # 客戶端寫入後多少秒內的讀取仍走主庫（讀到自己的寫入）
+    POSTGRES_REPLICA_STICKY_SECONDS = float(os.environ.get('POSTGRES_REPLICA_STICKY_SECONDS') or 5)
+    
+    # 協作模式：auto（eventlet 已 patch 時用線程池執行查詢）/ tpool / off
+    POSTGRES_COOPERATIVE_MODE = os.environ.get('POSTGRES_COOPERATIVE_MODE') or 'auto'
+    
+    # 慢查詢閾值（毫秒），超過時輸出 SQL 指紋、參數結構和來源路由
+    POSTGRES_SLOW_QUERY_MS = float(os.environ.get('POSTGRES_SLOW_QUERY_MS') or 500)
+    
+    # 連線持有超過此秒數視為疑似洩漏（輸出取得連線時的調用棧）
+    POSTGRES_LEAK_THRESHOLD_SECONDS = float(os.environ.get('POSTGRES_LEAK_THRESHOLD_SECONDS') or 30)
+    
+    # 請求級連線：同一請求共用一條連線，請求結束時統一提交 / 回滾
+    POSTGRES_REQUEST_SCOPED = (os.environ.get('POSTGRES_REQUEST_SCOPED') or 'true').lower() == 'true'
 
+    # 排班列表串流輸出時，每次從服務端游標取回的行數
+    SCHEDULE_STREAM_ITERSIZE = int(os.environ.get('SCHEDULE_STREAM_ITERSIZE') or 2000)
+    
+    # 排班列表分頁（帶 limit / cursor 時）默認每頁行數
+    SCHEDULE_LIST_PAGE_SIZE = int(os.environ.get('SCHEDULE_LIST_PAGE_SIZE') or 500)
+    
+    # 批量創建排班的單次上限
+    SCHEDULE_BATCH_MAX = int(os.environ.get('SCHEDULE_BATCH_MAX') or 5000)
+    
+    # 增量同步（/api/schedules/changes）單次返回的最大變更數
+    SCHEDULE_CHANGES_PAGE_SIZE = int(os.environ.get('SCHEDULE_CHANGES_PAGE_SIZE') or 1000)
+    
+    # 變更日誌保留天數（flask db-prune-changes），更早的游標需重新載入整個範圍
+    SCHEDULE_CHANGES_RETENTION_DAYS = int(os.environ.get('SCHEDULE_CHANGES_RETENTION_DAYS') or 7)
+    
+    # 排班分區：flask db-partitions 預先建立的月分區數（從本月起算）
+    SCHEDULE_PARTITION_MONTHS_AHEAD = int(os.environ.get('SCHEDULE_PARTITION_MONTHS_AHEAD') or 3)
+    
+    # 冷數據歸檔（flask db-archive）：排班保留最近幾個月（不含本月）在熱表，請假令牌保留天數
+    SCHEDULE_ARCHIVE_AFTER_MONTHS = int(os.environ.get('SCHEDULE_ARCHIVE_AFTER_MONTHS') or 12)
+    LEAVE_TOKEN_ARCHIVE_AFTER_DAYS = int(os.environ.get('LEAVE_TOKEN_ARCHIVE_AFTER_DAYS') or 90)
+    
+    # 排班統計（/api/schedules/stats）：班別工時 '早班:8,夜班:10'（未列出的班別使用默認工時）、
+    # 夜班班別（逗號分隔）、連續上班超過幾天列入提醒、進程內緩存的已鎖定週數
+    SCHEDULE_SHIFT_HOURS = os.environ.get('SCHEDULE_SHIFT_HOURS') or ''
+    SCHEDULE_DEFAULT_SHIFT_HOURS = float(os.environ.get('SCHEDULE_DEFAULT_SHIFT_HOURS') or 8)
+    SCHEDULE_NIGHT_SHIFTS = os.environ.get('SCHEDULE_NIGHT_SHIFTS') or '夜班'
+    SCHEDULE_STREAK_ALERT_DAYS = int(os.environ.get('SCHEDULE_STREAK_ALERT_DAYS') or 6)
+    SCHEDULE_STATS_CACHE_WEEKS = int(os.environ.get('SCHEDULE_STATS_CACHE_WEEKS') or 260)
+    
     # 提前天數：在目標周一前幾天鎖定（默認 3 天）
     SCHEDULE_DAYS_BEFORE_LOCK = int(os.environ.get('SCHEDULE_DAYS_BEFORE_LOCK') or 3)
     
@@ -43,6 +97,10 @@ class Config:
     
     # 提前周數：提前多少周開始檢查鎖定狀態（默認 2 周）
     SCHEDULE_WEEKS_AHEAD = int(os.environ.get('SCHEDULE_WEEKS_AHEAD') or 1)
+    
+    # 鎖定狀態以數據庫函數 get_schedule_lock_status 為準，進程內的鎖定日曆同時計算並在不一致時輸出警告；
+    # 確認兩者規則一致後才可設為 false，只使用進程內計算
+    SCHEDULE_LOCK_DB_CHECK = (os.environ.get('SCHEDULE_LOCK_DB_CHECK') or 'true').lower() == 'true'
 
     # Synology Chat 配置
     Synology_Chat_URL = os.environ.get('Synology_Chat_URL') or 'https://creationnas.com:2053/webapi/entry.cgi'
@@ -0,0 +1,59 @@
+# tests/conftest.py
+# 路由測試不連接數據庫：預先建立沒有連線池的 PostgresDBManager 單例，
+# 測試以 monkeypatch 替換路由用到的查詢方法；未替換的數據庫訪問直接失敗。
+import json
+from contextlib import contextmanager
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.database import PostgresDBManager
+
+
+@pytest.fixture(scope='session')
+def app():
+    if PostgresDBManager._instance is None:
+        PostgresDBManager._instance = PostgresDBManager()
+    from app import create_app
+    app = create_app('config.DevelopmentConfig')
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app, monkeypatch):
+    """The app's PostgresDBManager; any call that would check out a real connection fails the test"""
+    db_manager = PostgresDBManager.get_instance()
+
+    def no_connection(*args, **kwargs):
+        raise AssertionError('unexpected database access')
+
+    @contextmanager
+    def savepoint():
+        yield
+
+    monkeypatch.setattr(db_manager, 'get_connection', no_connection)
+    monkeypatch.setattr(db_manager, 'snapshot_connection', no_connection)
+    monkeypatch.setattr(db_manager, 'savepoint', savepoint)
+    return db_manager
+
+
+@pytest.fixture
+def login_as(app, client):
+    """Set a JWT cookie for a user with the given role_level"""
+    def login(role_level=1, nickname='tester', userID='T001'):
+        with app.app_context():
+            token = create_access_token(identity=json.dumps({
+                'username': nickname,
+                'userID': userID,
+                'nickname': nickname,
+                'role_level': role_level,
+                'status': 2,
+            }))
+        client.set_cookie(app.config['JWT_ACCESS_COOKIE_NAME'], token)
+    return login
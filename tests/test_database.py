@@ -0,0 +1,102 @@
+# PostgresDBManager 的連線選擇與請求事務（不連接數據庫）
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Response, g
+
+from app.database import PostgresDBManager
+
+
+def test_read_stays_on_bound_request_connection(app):
+    db_manager = PostgresDBManager()
+    db_manager.replica_pools = [object()]
+
+    with app.test_request_context('/'):
+        assert db_manager._use_replica(True)
+        g._db_conn = object()
+        try:
+            assert not db_manager._use_replica(True)
+        finally:
+            g.pop('_db_conn')
+
+
+def test_read_stays_on_bound_block_connection(app):
+    db_manager = PostgresDBManager()
+    db_manager.replica_pools = [object()]
+
+    with app.test_request_context('/'):
+        db_manager._current_conn = object()
+        assert not db_manager._use_replica(True)
+
+
+def request_scope_manager(monkeypatch):
+    """A manager whose request connection is a mock and whose connections are not pooled"""
+    db_manager = PostgresDBManager()
+    conn = MagicMock()
+    monkeypatch.setattr(db_manager, 'get_connection', lambda: conn)
+    monkeypatch.setattr(db_manager, 'return_connection', lambda conn: None)
+    return db_manager, conn
+
+
+@pytest.mark.parametrize('status, committed', [(200, True), (400, True), (409, True), (500, False)])
+def test_request_transaction_commits_unless_server_error(app, monkeypatch, status, committed):
+    db_manager, conn = request_scope_manager(monkeypatch)
+
+    with app.test_request_context('/'):
+        db_manager._bound_connection()
+        db_manager._finish_request_scope(Response(status=status))
+
+    assert conn.commit.called is committed
+    assert conn.rollback.called is not committed
+
+
+def test_rollback_request_discards_writes_of_a_success_response(app, monkeypatch):
+    db_manager, conn = request_scope_manager(monkeypatch)
+
+    with app.test_request_context('/'):
+        db_manager.rollback_request()
+        db_manager._bound_connection()
+        db_manager._finish_request_scope(Response(status=200))
+
+    assert not conn.commit.called
+    assert conn.rollback.called
+
+
+def test_transaction_without_request_scope_uses_its_own_transaction(app, monkeypatch):
+    db_manager, conn = request_scope_manager(monkeypatch)
+    db_manager.request_scoped = False
+
+    with app.test_request_context('/'):
+        with db_manager.transaction():
+            assert db_manager._current_conn is conn
+        assert db_manager._current_conn is None
+
+    assert conn.commit.called
+
+
+def test_cooperative_mode_offloads_pool_and_stream_calls(monkeypatch):
+    import app.database as database
+
+    offloaded = []
+
+    class FakeTpool:
+        @staticmethod
+        def execute(func, *args, **kwargs):
+            offloaded.append(getattr(func, '__name__', func))
+            return func(*args, **kwargs)
+
+    monkeypatch.setattr(database, 'tpool', FakeTpool)
+    db_manager = PostgresDBManager()
+    db_manager.cooperative_mode = 'tpool'
+    db_manager.connection_pool = MagicMock()
+    conn = MagicMock()
+    conn.cursor.return_value.fetchmany.side_effect = [[(1,)], []]
+    db_manager.connection_pool.getconn.return_value = conn
+    db_manager.connection_pool.getconn.__name__ = 'getconn'
+    db_manager.connection_pool.putconn.__name__ = 'putconn'
+    for name in ('execute', 'fetchmany', 'close'):
+        getattr(conn.cursor.return_value, name).__name__ = name
+    conn.rollback.__name__ = 'rollback'
+
+    assert list(db_manager.stream_query("SELECT 1")) == [(1,)]
+    assert offloaded == ['getconn', 'execute', 'fetchmany', 'fetchmany', 'close', 'rollback', 'putconn']
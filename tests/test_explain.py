@@ -0,0 +1,14 @@
+# db-explain：檢查的是路由實際執行的語句
+from app.migrations.explain import route_queries
+from app.queries import NAMED_QUERIES
+
+
+def test_explain_checks_registered_queries():
+    queries = route_queries()
+    for name, query, _ in queries:
+        key = name.split(' ')[0]
+        if key in NAMED_QUERIES:
+            assert query == NAMED_QUERIES[key]
+        else:
+            assert key == 'users.list_search'
+    assert 'leave.validate_token' in {name for name, _, _ in queries}
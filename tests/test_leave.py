@@ -0,0 +1,21 @@
+# 請假審批：審批與排班寫入在同一個事務中（請求級連線關閉時也一樣）
+from unittest.mock import MagicMock
+
+
+def test_approve_runs_in_explicit_transaction_without_request_scope(client, db, monkeypatch):
+    conn = MagicMock()
+    bound = []
+    monkeypatch.setattr(db, 'request_scoped', False)
+    monkeypatch.setattr(db, 'get_connection', lambda: conn)
+    monkeypatch.setattr(db, 'return_connection', lambda conn: None)
+
+    def execute_returning(query, params=None):
+        bound.append(db._current_conn)
+        return None
+
+    monkeypatch.setattr(db, 'execute_returning', execute_returning)
+    response = client.post('/api/leave/approve/unknown-token')
+
+    assert response.status_code == 400
+    assert bound == [conn]
+    assert conn.commit.called
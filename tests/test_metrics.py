@@ -0,0 +1,25 @@
+# /api/metrics：查詢 SQL、連線池調用棧只對管理員開放
+
+
+import pytest
+
+
+@pytest.mark.parametrize('method, path', [
+    ('get', '/api/metrics/'),
+    ('get', '/api/metrics/pool'),
+    ('delete', '/api/metrics/'),
+])
+def test_metrics_require_admin(client, db, login_as, method, path):
+    login_as(role_level=1)
+    response = getattr(client, method)(path)
+
+    assert response.status_code == 401
+    assert response.get_json()['success'] is False
+
+
+def test_admin_can_reset_metrics(client, db, login_as):
+    login_as(role_level=5)
+    response = client.delete('/api/metrics/')
+
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
@@ -0,0 +1,43 @@
+# POST /api/schedules/batch：格式檢查失敗時返回逐筆的 failed 列表，不查數據庫
+
+
+def test_batch_all_invalid_returns_failed_list(client, db, login_as):
+    login_as()
+    response = client.post('/api/schedules/batch', json={'schedules': [
+        {'userID': 'A001', 'schedule_date': '2026-10-19'},
+        {'userID': 'A001', 'schedule_date': '19/10/2026', 'shift_name': '早班'},
+        'not-an-object',
+        {'userID': 'A002', 'schedule_date': '2026-10-19', 'shift_name': 7},
+    ]})
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['success'] is False
+    failed = body['data']['failed']
+    assert [item['index'] for item in failed] == [0, 1, 2, 3]
+    assert '缺少必要欄位' in failed[0]['error']
+    assert failed[2]['data'] == 'not-an-object'
+
+
+def test_batch_format_failure_rejects_whole_batch_before_querying(client, db, login_as):
+    login_as()
+    response = client.post('/api/schedules/batch', json={'schedules': [
+        {'userID': 'A001', 'schedule_date': '2026-10-19', 'shift_name': '早班'},
+        {'userID': 'A001', 'schedule_date': '2026-10-19', 'shift_name': '晚班'},
+    ]})
+
+    assert response.status_code == 400
+    failed = response.get_json()['data']['failed']
+    assert failed == [{
+        'index': 1,
+        'data': {'userID': 'A001', 'schedule_date': '2026-10-19', 'shift_name': '晚班'},
+        'error': '批次中重複的用戶和日期',
+    }]
+
+
+def test_batch_requires_an_array(client, db, login_as):
+    login_as()
+    response = client.post('/api/schedules/batch', json={'schedules': {'userID': 'A001'}})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'schedules 必須為數組'
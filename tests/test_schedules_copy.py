@@ -0,0 +1,103 @@
+# 複製排班 / 保存模板：欄位類型錯誤在查詢之前返回 400；預覽與寫入的參數和推送
+from datetime import date
+
+import pytest
+
+import app.routes.schedules as schedules
+
+
+@pytest.mark.parametrize('path', ['/api/schedules/copy', '/api/schedules/templates'])
+@pytest.mark.parametrize('body, error', [
+    ({'template_id': '1'}, 'template_id 必須為整數'),
+    ({'template_id': True}, 'template_id 必須為整數'),
+    ({'department_id': '2'}, 'department_id 必須為整數'),
+    ({'users': 'A0001'}, 'users 必須為 userID 字串的數組'),
+    ({'users': ['A0001', 2]}, 'users 必須為 userID 字串的數組'),
+    ({'users': [{'userID': 'A0001'}]}, 'users 必須為 userID 字串的數組'),
+])
+def test_invalid_field_types(client, db, login_as, path, body, error):
+    login_as(role_level=5)
+    body = dict(body, target_start='2099-01-05', source_start='2099-01-05', name='模板')
+    response = client.post(path, json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'INVALID_FIELD'
+    assert response.get_json()['error'] == error
+
+
+def test_non_object_body(client, db, login_as):
+    login_as(role_level=5)
+    response = client.post('/api/schedules/copy', json=['A0001'])
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == '請求內容必須為 JSON 物件'
+
+
+def fake_named(locked=(), template=None, cells=None, inserted=None, calls=None):
+    """Fake execute_named for the copy route; records (key, params) in calls"""
+    def execute_named(key, params=None, **kwargs):
+        if calls is not None:
+            calls.append((key, params))
+        if key == 'schedules.lock_status_many':
+            return [(day, None, None, None, None, None, day in locked) for day in params[0]]
+        if key == 'schedules.template_by_id':
+            return [template] if template else []
+        if key == 'schedules.copy_preview':
+            return cells
+        if key == 'schedules.copy_apply':
+            return inserted
+        raise AssertionError(key)
+    return execute_named
+
+
+def test_dry_run_summarizes_cells(client, db, login_as, monkeypatch):
+    cells = [
+        {'userID': 'A001', 'schedule_date': date(2099, 1, 12), 'action': 'insert'},
+        {'userID': 'A001', 'schedule_date': date(2099, 1, 13), 'action': 'locked'},
+        {'userID': 'A002', 'schedule_date': date(2099, 1, 12), 'action': 'exists'},
+    ]
+    calls = []
+    monkeypatch.setattr(db, 'execute_named', fake_named(cells=cells, calls=calls))
+    login_as()
+    response = client.post('/api/schedules/copy', json={
+        'source_start': '2099-01-07', 'target_start': '2099-01-12', 'users': ['A001', 'A002'],
+        'dry_run': True,
+    })
+
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['summary'] == {'insert': 1, 'exists': 1, 'locked': 1, 'invalid_shift': 0}
+    assert data['cells'][0]['schedule_date'] == '2099-01-12'
+    key, params = calls[-1]
+    assert key == 'schedules.copy_preview'
+    # 來源與目標都對齊到週一
+    assert params['source_start'] == date(2099, 1, 5)
+    assert params['target_end'] == date(2099, 1, 18)
+    assert params['user_codes'] == ['A001', 'A002']
+
+
+def test_apply_publishes_inserted_rows(client, db, login_as, monkeypatch):
+    published = []
+    monkeypatch.setattr(db, 'execute_named', fake_named(
+        template=(3, '兩週輪班', 2),
+        inserted=[(21, 1, date(2099, 1, 12), '早班'), (22, 2, date(2099, 1, 13), '晚班')],
+    ))
+    monkeypatch.setattr(schedules, 'publish_schedule_changes', published.extend)
+    login_as()
+    response = client.post('/api/schedules/copy', json={'template_id': 3, 'target_start': '2099-01-12'})
+
+    assert response.status_code == 201
+    assert response.get_json()['data'] == {
+        'inserted': 2,
+        'target_range': {'start_date': '2099-01-12', 'end_date': '2099-01-25'}
+    }
+    assert [cell['id'] for cell in published] == [21, 22]
+
+
+def test_unknown_template(client, db, login_as, monkeypatch):
+    monkeypatch.setattr(db, 'execute_named', fake_named())
+    login_as()
+    response = client.post('/api/schedules/copy', json={'template_id': 99, 'target_start': '2099-01-12'})
+
+    assert response.status_code == 404
+    assert response.get_json()['code'] == 'TEMPLATE_NOT_FOUND'
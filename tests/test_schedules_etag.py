@@ -0,0 +1,49 @@
+# 條件請求：版本戳與數據在同一條快照連線上讀取，If-None-Match 命中時返回 304
+import pytest
+
+
+@pytest.fixture
+def snapshot(db, monkeypatch):
+    """Record which connection each named query runs on; versions come from a fixed list"""
+    conn = object()
+    calls = []
+    released = []
+
+    def execute_named(key, params=None, **kwargs):
+        calls.append((key, db._current_conn))
+        if key == 'schedules.range_version':
+            return [('2099-01-05', 3, 1), ('users', 1, 0)]
+        return []
+
+    monkeypatch.setattr(db, 'snapshot_connection', lambda read_only=True: conn)
+    monkeypatch.setattr(db, 'release_snapshot', released.append)
+    monkeypatch.setattr(db, 'execute_named', execute_named)
+    return conn, calls, released
+
+
+@pytest.mark.parametrize('path', ['/api/schedules/grid', '/api/schedules/stats'])
+def test_versions_and_rows_share_the_snapshot_connection(client, login_as, snapshot, path):
+    conn, calls, released = snapshot
+    login_as()
+    response = client.get(f'{path}?start_date=2099-01-05&end_date=2099-01-11')
+
+    assert response.status_code == 200
+    assert response.headers.get('ETag')
+    assert calls[0][0] == 'schedules.range_version'
+    assert all(bound is conn for _, bound in calls)
+    assert released == [conn]
+
+
+@pytest.mark.parametrize('path', ['/api/schedules/grid', '/api/schedules/stats'])
+def test_matching_etag_returns_304(client, login_as, snapshot, path):
+    conn, calls, released = snapshot
+    login_as()
+    url = f'{path}?start_date=2099-01-05&end_date=2099-01-11'
+    etag = client.get(url).headers['ETag']
+
+    del calls[:]
+    response = client.get(url, headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert [key for key, _ in calls] == ['schedules.range_version']
+    assert released[-1] is conn
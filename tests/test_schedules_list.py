@@ -0,0 +1,28 @@
+# 排班列表：keyset 游標與快照合併後的排序
+from datetime import date
+
+from app.routes.schedules import decode_list_cursor, encode_list_cursor, nickname_ranks
+
+
+def test_cursor_keeps_missing_nickname():
+    row = {'nickname': None, 'schedule_date': date(2099, 1, 5), 'id': 7}
+    assert decode_list_cursor(encode_list_cursor(row)) == (None, date(2099, 1, 5), 7)
+
+    row = {'nickname': '阿明', 'schedule_date': date(2099, 1, 5), 'id': 8}
+    assert decode_list_cursor(encode_list_cursor(row)) == ('阿明', date(2099, 1, 5), 8)
+
+
+def test_nickname_ranks_follow_database_order(db, monkeypatch):
+    queries = []
+
+    def execute_query(query, params=None, **kwargs):
+        queries.append(params)
+        # 數據庫排序規則下 'b' 在 'B' 之前（與 Python 的碼位順序相反）
+        return [('b',), ('B',)]
+
+    monkeypatch.setattr(db, 'execute_query', execute_query)
+    ranks = nickname_ranks(db, ['B', None, 'b', 'B'])
+
+    assert ranks == {'b': 0, 'B': 1}
+    assert sorted(queries[0][0]) == ['B', 'b']
+    assert nickname_ranks(db, [None]) == {}
@@ -0,0 +1,37 @@
+# 排班鎖定：默認以數據庫函數 get_schedule_lock_status 的結果為準
+from datetime import date
+
+from app.routes.schedules import find_locked_dates
+from config import Config
+
+
+def lock_rows(locked):
+    """schedules.lock_status_many 的結果：第 1 欄為日期，第 7 欄為 is_locked"""
+    def execute_named(key, params=None, **kwargs):
+        assert key == 'schedules.lock_status_many'
+        return [(day, None, None, None, None, None, day in locked) for day in params[0]]
+    return execute_named
+
+
+def test_database_check_is_on_by_default():
+    assert Config.SCHEDULE_LOCK_DB_CHECK is True
+
+
+def test_database_lock_status_wins_over_calendar(app, db, monkeypatch):
+    far_future = date(2099, 1, 5)
+    monkeypatch.setattr(db, 'execute_named', lock_rows({far_future}))
+
+    with app.test_request_context('/'):
+        assert find_locked_dates([far_future, date(2099, 1, 12)]) == {far_future}
+
+
+def test_week_edit_rejects_week_locked_by_database(client, db, login_as, monkeypatch):
+    monday = date.fromisocalendar(2099, 2, 1)
+    monkeypatch.setattr(db, 'execute_named', lock_rows({monday}))
+    login_as()
+    response = client.put('/api/schedules/week/2099-W02', json={'cells': [
+        {'userID': 'A001', 'schedule_date': monday.isoformat(), 'shift_name': '早班'},
+    ]})
+
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'SCHEDULE_LOCKED'
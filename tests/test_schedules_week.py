@@ -0,0 +1,93 @@
+# 週編輯：格子驗證、預覽差異、未知用戶不寫入；清空帶請假備註的格子只清除班別，以 upsert 推送
+from datetime import date
+
+import app.routes.schedules as schedules
+
+
+def test_clearing_leave_row_keeps_it(client, db, login_as, monkeypatch):
+    monday = date.fromisocalendar(2099, 2, 1)
+    calls = []
+    published = []
+
+    def execute_named(key, params=None, **kwargs):
+        calls.append(key)
+        if key == 'schedules.lock_status_many':
+            return [(day, None, None, None, None, None, False) for day in params[0]]
+        if key == 'schedules.week_apply':
+            assert params['shifts'] == [None, None]
+            return [('clear', 11, 1, monday, None), ('delete', 12, 1, monday.replace(day=6), None)]
+        if key == 'schedules.week_version':
+            return [(4, 9)]
+        raise AssertionError(key)
+
+    monkeypatch.setattr(db, 'execute_named', execute_named)
+    monkeypatch.setattr(db, 'execute_batch', lambda statements, **kwargs: [[('A001',)], []])
+    monkeypatch.setattr(schedules, 'publish_schedule_changes', published.extend)
+    login_as()
+    response = client.put('/api/schedules/week/2099-W02', json={'cells': [
+        {'userID': 'A001', 'schedule_date': monday.isoformat(), 'shift_name': ''},
+        {'userID': 'A001', 'schedule_date': '2099-01-06', 'shift_name': None},
+    ]})
+
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert (data['cleared'], data['deleted'], data['upserted']) == (1, 1, 0)
+    assert calls == ['schedules.lock_status_many', 'schedules.week_apply', 'schedules.week_version']
+    assert published == [
+        {'op': 'upsert', 'schedule_date': monday.isoformat(), 'id': 11, 'user_id': 1, 'shift_name': None},
+        {'op': 'delete', 'schedule_date': '2099-01-06', 'id': 12, 'user_id': 1},
+    ]
+
+
+def unlocked(key, params=None, **kwargs):
+    assert key == 'schedules.lock_status_many'
+    return [(day, None, None, None, None, None, False) for day in params[0]]
+
+
+def test_dry_run_returns_diff(client, db, login_as, monkeypatch):
+    monday = date.fromisocalendar(2099, 2, 1)
+    diff = [{'action': 'insert', 'id': None, 'user_id': 1, 'schedule_date': monday,
+             'old_shift_name': None, 'shift_name': '早班'}]
+
+    def execute_named(key, params=None, **kwargs):
+        if key == 'schedules.week_diff':
+            assert (params['week_start'], params['week_end']) == (monday, date(2099, 1, 11))
+            assert params['scope_users'] == ['A002'] and params['replace'] is True
+            return diff
+        return unlocked(key, params)
+
+    monkeypatch.setattr(db, 'execute_named', execute_named)
+    monkeypatch.setattr(db, 'execute_batch', lambda statements, **kwargs: [[('A001',), ('A002',)], [('早班',)]])
+    login_as()
+    response = client.put('/api/schedules/week/2099-W02', json={
+        'cells': [{'userID': 'A001', 'schedule_date': monday.isoformat(), 'shift_name': '早班'}],
+        'users': ['A002'], 'replace': True, 'dry_run': True,
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['data']['diff'][0]['schedule_date'] == '2099-01-05'
+
+
+def test_unknown_user_writes_nothing(client, db, login_as, monkeypatch):
+    monday = date.fromisocalendar(2099, 2, 1)
+    monkeypatch.setattr(db, 'execute_named', unlocked)
+    monkeypatch.setattr(db, 'execute_batch', lambda statements, **kwargs: [[], [('早班',)]])
+    login_as()
+    response = client.put('/api/schedules/week/2099-W02', json={'cells': [
+        {'userID': 'NOPE', 'schedule_date': monday.isoformat(), 'shift_name': '早班'},
+    ]})
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['code'] == 'USER_NOT_FOUND'
+    assert body['data']['unknown_users'] == ['NOPE']
+
+
+def test_cell_outside_week(client, db, login_as):
+    login_as()
+    response = client.put('/api/schedules/week/2099-W02', json={'cells': [
+        {'userID': 'A001', 'schedule_date': '2099-01-12', 'shift_name': '早班'},
+    ]})
+
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'INVALID_CELL'
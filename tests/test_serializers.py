@@ -0,0 +1,11 @@
+# 日期格式：app.json 保持 Flask 默認，只有 dict_row 路由以 ISO 8601 輸出
+from datetime import date
+
+from app.utils.serializers import iso_dumps, iso_jsonify
+
+
+def test_iso_only_where_requested(app):
+    with app.test_request_context():
+        assert app.json.dumps({'d': date(2099, 1, 5)}) == '{"d": "Mon, 05 Jan 2099 00:00:00 GMT"}'
+        assert iso_dumps({'d': date(2099, 1, 5)}) == '{"d": "2099-01-05"}'
+        assert iso_jsonify({'d': date(2099, 1, 5)}).get_json() == {'d': '2099-01-05'}
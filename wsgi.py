@@ -1,8 +1,11 @@
-import os
-from app import create_app, socketio
 import eventlet
 
+# 必須在導入其他模組（psycopg、threading、socket）之前 patch，否則連線池仍使用阻塞的原生鎖
 eventlet.monkey_patch()
+
+import os
+from app import create_app, socketio
+
 # 创建应用实例
 app = create_app()
 